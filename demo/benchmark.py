@@ -0,0 +1,288 @@
+#!/usr/bin/python
+""" Benchmarks of the engine, graph and messaging hot paths.
+
+Every benchmark is timed with `timeit`: the number of calls per measurement
+is calibrated so that a measurement takes at least `--min-time` seconds, and
+the best of `--repeat` measurements is reported as the time per call.
+
+Usage
+-----
+    # run all benchmarks and store the results
+    python demo/benchmark.py --output baseline.json
+
+    # compare a later run against the stored results
+    python demo/benchmark.py --compare baseline.json
+
+    # only run the benchmarks whose name contains 'graph'
+    python demo/benchmark.py graph
+
+When comparing, every benchmark which is slower than the baseline by more
+than `--threshold` is flagged and the script exits with status 1.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import random
+import socket
+import sys
+import threading
+import timeit
+
+from pelita.datamodel import create_CTFUniverse, TeamWins
+from pelita.game_master import UniverseNoiser
+from pelita.graph import AdjacencyList
+from pelita.messaging.json_convert import json_converter
+from pelita.messaging.remote.jsonconnection import JsonSocketConnection,\
+        FRAMING_EOT, FRAMING_LENGTH
+from pelita.layout import bundled_layouts
+
+# the layout used by all benchmarks which do not run on every layout
+DEFAULT_LAYOUT = "02_demo"
+
+# list of (name, setup) pairs; `setup()` returns the callable to be timed
+BENCHMARKS = []
+
+def benchmark(name):
+    """ Registers a setup function under `name`. """
+    def wrapper(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return wrapper
+
+def default_universe():
+    return create_CTFUniverse(dict(bundled_layouts())[DEFAULT_LAYOUT], 4)
+
+def register_layout_benchmarks():
+    for layout_name, layout in bundled_layouts():
+        benchmark("datamodel.create_CTFUniverse[%s]" % layout_name)(
+            lambda layout=layout: lambda: create_CTFUniverse(layout, 4))
+
+register_layout_benchmarks()
+
+def random_moves(universe, rounds, seed=0):
+    """ A reproducible list of (bot_index, move) pairs of a random game. """
+    rand = random.Random(seed)
+    universe = universe.copy()
+    moves = []
+    for round_ in range(rounds):
+        for bot in universe.bots:
+            move = rand.choice(sorted(
+                universe.get_legal_moves(bot.current_pos).keys()))
+            moves.append((bot.index, move))
+            if TeamWins in universe.move_bot(bot.index, move):
+                return moves
+    return moves
+
+@benchmark("datamodel.move_bot[100 rounds]")
+def bench_move_bot():
+    universe = default_universe()
+    moves = random_moves(universe, 100)
+    def run():
+        game = universe.copy()
+        for bot_index, move in moves:
+            game.move_bot(bot_index, move)
+    return run
+
+def search(universe, bot_indices, depth, with_undo):
+    """ Visits all move sequences of the given depth. """
+    if depth == 0:
+        return 1
+    bot_index = bot_indices[depth % len(bot_indices)]
+    nodes = 0
+    for move in universe.legal_moves(bot_index):
+        if with_undo:
+            universe.move_bot(bot_index, move)
+            nodes += search(universe, bot_indices, depth - 1, with_undo)
+            universe.undo()
+        else:
+            child = universe.copy()
+            child.move_bot(bot_index, move)
+            nodes += search(child, bot_indices, depth - 1, with_undo)
+    return nodes
+
+@benchmark("datamodel.move_bot+undo[search depth 4]")
+def bench_search_undo():
+    universe = default_universe()
+    return lambda: search(universe, [0, 1], 4, with_undo=True)
+
+@benchmark("datamodel.move_bot+copy[search depth 4]")
+def bench_search_copy():
+    universe = default_universe()
+    return lambda: search(universe, [0, 1], 4, with_undo=False)
+
+@benchmark("datamodel.CTFUniverse.copy")
+def bench_copy():
+    return default_universe().copy
+
+@benchmark("graph.AdjacencyList")
+def bench_adjacency():
+    universe = default_universe()
+    return lambda: AdjacencyList(universe)
+
+@benchmark("graph.AdjacencyList.bfs")
+def bench_bfs():
+    universe = default_universe()
+    adjacency = AdjacencyList(universe)
+    queries = [(bot.current_pos, universe.enemy_food(bot.team_index))
+               for bot in universe.bots]
+    def run():
+        for initial, targets in queries:
+            adjacency.bfs(initial, targets)
+    return run
+
+@benchmark("graph.AdjacencyList.a_star")
+def bench_a_star():
+    universe = default_universe()
+    adjacency = AdjacencyList(universe)
+    rand = random.Random(0)
+    positions = sorted(adjacency.keys())
+    pairs = [(rand.choice(positions), rand.choice(positions))
+             for i in range(20)]
+    def run():
+        for initial, target in pairs:
+            adjacency.a_star(initial, target)
+    return run
+
+@benchmark("game_master.UniverseNoiser.uniform_noise")
+def bench_noise():
+    universe = default_universe()
+    noiser = UniverseNoiser(universe)
+    def run():
+        for bot in universe.bots:
+            noiser.uniform_noise(universe.copy(), bot.index)
+    return run
+
+@benchmark("json_convert.dumps[universe]")
+def bench_dumps():
+    universe = default_universe()
+    return lambda: json_converter.dumps(universe)
+
+@benchmark("json_convert.loads[universe]")
+def bench_loads():
+    data = json_converter.dumps(default_universe())
+    return lambda: json_converter.loads(data)
+
+def socket_round_trip(obj, framing=FRAMING_EOT):
+    sender, receiver = socket.socketpair()
+    sender = JsonSocketConnection(sender, framing)
+    receiver = JsonSocketConnection(receiver, framing)
+    def run():
+        sender.send(obj)
+        receiver.read()
+    return run
+
+@benchmark("JsonSocketConnection.round_trip[message]")
+def bench_socket_message():
+    return socket_round_trip({"jsonrpc": "2.0", "method": "play_now",
+                              "params": [0], "id": 1})
+
+@benchmark("JsonSocketConnection.round_trip[universe]")
+def bench_socket_universe():
+    return socket_round_trip(default_universe())
+
+@benchmark("JsonSocketConnection.round_trip[universe, length framing]")
+def bench_socket_universe_length():
+    return socket_round_trip(default_universe(), FRAMING_LENGTH)
+
+@benchmark("JsonSocketConnection.send_many[10 universes]")
+def bench_socket_send_many():
+    sender, receiver = socket.socketpair()
+    sender = JsonSocketConnection(sender, FRAMING_LENGTH)
+    receiver = JsonSocketConnection(receiver, FRAMING_LENGTH)
+    universes = [default_universe()] * 10
+    def send():
+        sender.send_many(universes)
+    def run():
+        thread = threading.Thread(target=send)
+        thread.start()
+        for universe in universes:
+            receiver.read()
+        thread.join()
+    return run
+
+def time_benchmark(run, repeat, min_time):
+    """ Calibrates the number of calls and returns the best time per call. """
+    timer = timeit.Timer(run)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1e6:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+    times = [elapsed] + timer.repeat(repeat - 1, number)
+    times = sorted(t / number for t in times)
+    return {"best": times[0], "median": times[len(times) // 2],
+            "number": number, "repeat": repeat}
+
+def run_benchmarks(patterns=(), repeat=5, min_time=0.1, out=sys.stdout):
+    results = {}
+    for name, setup in BENCHMARKS:
+        if patterns and not any(p in name for p in patterns):
+            continue
+        results[name] = time_benchmark(setup(), repeat, min_time)
+        print >>out, "%-60s %10.1fus" % (name, results[name]["best"] * 1e6)
+    return results
+
+def compare(results, baseline, threshold, out=sys.stdout):
+    """ Prints the speed relative to `baseline` and returns the names of
+    all benchmarks which are slower than `threshold`.
+    """
+    regressions = []
+    print >>out
+    print >>out, "%-60s %11s %11s %7s" % ("benchmark", "baseline", "current",
+                                         "ratio")
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        before = baseline[name]["best"]
+        after = results[name]["best"]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print >>out, "%-60s %9.1fus %9.1fus %6.2fx%s" % (name, before * 1e6,
+                after * 1e6, ratio, flag)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("patterns", nargs="*",
+                        help="only run benchmarks containing one of these")
+    parser.add_argument("--output", "-o",
+                        help="write the results as JSON to this file")
+    parser.add_argument("--compare", "-c",
+                        help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="flag benchmarks slower than this ratio "
+                             "(default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1)
+    parser.add_argument("--list", action="store_true",
+                        help="list the available benchmarks")
+    args = parser.parse_args(argv)
+    # the messaging loggers are only needed when debugging
+    logging.getLogger("pelita").addHandler(logging.NullHandler())
+
+    if args.list:
+        for name, setup in BENCHMARKS:
+            print name
+        return 0
+
+    results = run_benchmarks(args.patterns, args.repeat, args.min_time)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": platform.python_version(),
+                       "results": results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/python
+""" Compares the list based graph searches with the current implementation
+on all bundled layouts.
+"""
+
+import heapq
+import random
+import timeit
+from collections import deque
+
+from pelita.datamodel import create_CTFUniverse, manhattan_dist
+from pelita.graph import AdjacencyList, NoPathException
+from pelita.layout import bundled_layouts
+
+def old_bfs(adjacency, initial, targets):
+    """ The original `AdjacencyList.bfs` which keeps `seen` as a list. """
+    to_visit = deque([initial])
+    seen = []
+    found = False
+    while to_visit:
+        current = to_visit.popleft()
+        if current in seen:
+            continue
+        elif current in targets:
+            found = True
+            break
+        else:
+            seen.append(current)
+            to_visit.extend(adjacency[current])
+    if not found:
+        raise NoPathException()
+    path = [current]
+    while seen:
+        next_ = seen.pop()
+        if next_ in adjacency[current]:
+            path.append(next_)
+            current = next_
+    return path[:-1]
+
+def old_a_star(adjacency, initial, target):
+    """ The original `AdjacencyList.a_star` which keeps `seen` as a list. """
+    to_visit = []
+    seen = []
+    heapq.heappush(to_visit, (0, (initial)))
+    while to_visit:
+        man_dist, current = heapq.heappop(to_visit)
+        if current in seen:
+            continue
+        elif current == target:
+            break
+        else:
+            seen.append(current)
+            for pos in adjacency[current]:
+                heapq.heappush(to_visit, (manhattan_dist(target, pos), (pos)))
+    path = [current]
+    while seen:
+        next_ = seen.pop()
+        if next_ in adjacency[current]:
+            path.append(next_)
+            current = next_
+    return path[:-1]
+
+def benchmark_layout(layout, number=3):
+    universe = create_CTFUniverse(layout, 4)
+    adjacency = AdjacencyList(universe)
+    rand = random.Random(42)
+    positions = sorted(adjacency.keys())
+    pairs = [(rand.choice(positions), rand.choice(positions))
+             for i in range(20)]
+    bfs_queries = [(bot.current_pos, universe.enemy_food(bot.team_index))
+                   for bot in universe.bots]
+
+    # both implementations must agree
+    for initial, targets in bfs_queries:
+        assert old_bfs(adjacency, initial, targets) == \
+               adjacency.bfs(initial, targets)
+
+    def run_bfs(bfs):
+        for initial, targets in bfs_queries:
+            bfs(initial, targets)
+
+    def run_a_star(a_star):
+        for initial, target in pairs:
+            a_star(initial, target)
+
+    timer = lambda fun: min(timeit.repeat(fun, number=1, repeat=number))
+    return (timer(lambda: run_bfs(lambda i, t: old_bfs(adjacency, i, t))),
+            timer(lambda: run_bfs(adjacency.bfs)),
+            timer(lambda: run_a_star(lambda i, t: old_a_star(adjacency, i, t))),
+            timer(lambda: run_a_star(adjacency.a_star)))
+
+if __name__ == '__main__':
+    print "%-24s %10s %10s %8s %10s %10s %8s" % ("layout",
+            "bfs old", "bfs new", "speedup",
+            "a* old", "a* new", "speedup")
+    for name, layout in bundled_layouts():
+        bfs_old, bfs_new, a_star_old, a_star_new = benchmark_layout(layout)
+        print "%-24s %9.2fms %9.2fms %7.1fx %9.2fms %9.2fms %7.1fx" % (name,
+                bfs_old * 1000, bfs_new * 1000, bfs_old / bfs_new,
+                a_star_old * 1000, a_star_new * 1000, a_star_old / a_star_new)
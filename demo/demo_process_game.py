@@ -0,0 +1,23 @@
+#!/usr/bin/python
+from pelita.game_master import GameMaster
+from pelita.player import BFSPlayer, NQRandomPlayer, SimpleTeam
+from pelita.process_team import ProcessTeamPlayer
+from pelita.viewer import AsciiViewer
+
+if __name__ == '__main__':
+    layout = (
+        """ ##################
+            #0#.  .  # .     #
+            #2#####    #####1#
+            #     . #  .  .#3#
+            ################## """)
+    gm = GameMaster(layout, 4, 200)
+    # each team plays in a process of its own
+    teams = [ProcessTeamPlayer(SimpleTeam(BFSPlayer(), NQRandomPlayer())),
+             ProcessTeamPlayer(SimpleTeam(NQRandomPlayer(), BFSPlayer()))]
+    for team in teams:
+        gm.register_team(team)
+    gm.register_viewer(AsciiViewer())
+    gm.play()
+    for team in teams:
+        team.stop()
@@ -6,26 +6,95 @@
 
 import sys
 import Queue
+import itertools
+from multiprocessing.pool import ThreadPool
 
 from pelita.messaging import DispatchingActor, expose, actor_registry, actor_of, RemoteConnection, DeadConnection, ActorNotRunning
 
 from pelita.game_master import GameMaster, PlayerTimeout, PlayerDisconnected
+from pelita.datamodel import UniverseDelta
+from pelita.tournament import Match, ResultViewer, RoundRobinScheduler, standings
 
 import logging
 
 __docformat__ = "restructuredtext"
 
 _logger = logging.getLogger("pelita")
-_logger.setLevel(logging.DEBUG)
 
 TIMEOUT = 3
 
+# reply of a client which needs the full universe
+RESYNC = "resync"
+
+class _TeamSession(object):
+    """ The client side of a single game: the team which plays it
+    and the last universe received from the server.
+    """
+    def __init__(self, team):
+        self.team = team
+        self.universe = None
+
+    def set_bot_ids(self, bot_ids):
+        return self.team._set_bot_ids(bot_ids)
+
+    def set_initial(self, universe):
+        self.universe = universe
+        return self.team._set_initial(universe)
+
+    def play_now(self, bot_index, universe):
+        self.universe = universe
+        return self.team._get_move(bot_index, universe)
+
+    def play_delta(self, bot_index, delta):
+        """ Applies `delta` to the last universe and asks for a move.
+        Returns `RESYNC`, if that is not possible.
+        """
+        if self.universe is None:
+            return RESYNC
+        # the team may still hold a reference to the previous universe
+        universe = self.universe.copy()
+        try:
+            delta.apply(universe)
+        except (ValueError, IndexError):
+            _logger.info("Universe has diverged. Requesting a resync.")
+            return RESYNC
+        return self.play_now(bot_index, universe)
+
 class _ClientActor(DispatchingActor):
     """ Actor used to communicate with the Server.
+
+    The client either plays a single game at a time with the team given
+    to `register_team`, or, after `register_team_factory`, several games
+    at the same time. In the latter case, all messages for a game are
+    wrapped in `game` messages with the id of the game, and every game
+    is played by a new team.
     """
     def on_start(self):
         self.team = None
+        self.team_factory = None
+        self.games = 1
         self.server_actor = None
+        # the state of every game by its id; None is the id of a game
+        # which is not multiplexed
+        self.sessions = {}
+
+    @property
+    def universe(self):
+        """ The last universe received from the server. """
+        session = self.sessions.get(None)
+        return session and session.universe
+
+    def _session(self, game_id):
+        session = self.sessions.get(game_id)
+        if session is None:
+            if game_id is None and self.team is not None:
+                team = self.team
+            elif self.team_factory is not None:
+                team = self.team_factory()
+            else:
+                raise ValueError("No team available for game %r." % game_id)
+            session = self.sessions[game_id] = _TeamSession(team)
+        return session
 
     @expose
     def register_team(self, team):
@@ -36,6 +105,14 @@ def register_team(self, team):
         # Also: investigate how to deal with concurrency issues
         self.team = team
 
+    @expose
+    def register_team_factory(self, team_factory, games):
+        """ Lets the client play up to `games` games at the same time.
+        Each game is played by a team returned from `team_factory()`.
+        """
+        self.team_factory = team_factory
+        self.games = games
+
     @expose
     def say_hello(self, main_actor, team_name, host=None, port=None):
         """ Opens a connection to the remote main_actor,
@@ -57,7 +134,10 @@ def say_hello(self, main_actor, team_name, host=None, port=None):
             return
 
         try:
-            if self.server_actor.query("hello", [team_name, self.ref.uuid]).get(2) == "ok":
+            params = [team_name, self.ref.uuid]
+            if self.team_factory is not None:
+                params.append(self.games)
+            if self.server_actor.query("hello", params).get(2) == "ok":
                 _logger.info("Connection accepted")
                 self.ref.reply("ok")
         except Queue.Empty:
@@ -70,21 +150,50 @@ def say_hello(self, main_actor, team_name, host=None, port=None):
     def set_bot_ids(self, *bot_ids):
         """ Called by the server. This method sets the available bot_ids for this team.
         """
-        self.ref.reply(self.team._set_bot_ids(bot_ids))
+        self.ref.reply(self._session(None).set_bot_ids(bot_ids))
 
     @expose
     def set_initial(self, universe):
         """ Called by the server. This method tells us the initial universe.
         """
-        self.ref.reply(self.team._set_initial(universe))
+        self.ref.reply(self._session(None).set_initial(universe))
 
     @expose
     def play_now(self, bot_index, universe):
         """ Called by the server. This message requests a new move
         from the bot with index `bot_index`.
         """
-        move = self.team._get_move(bot_index, universe)
-        self.ref.reply(move)
+        self.ref.reply(self._session(None).play_now(bot_index, universe))
+
+    @expose
+    def play_delta(self, bot_index, delta):
+        """ Called by the server. Same as `play_now` but instead of the
+        universe, only the changes since the last universe are sent.
+
+        If the changes do not lead to the expected universe, we reply
+        `RESYNC` and the server sends the full universe with `play_now`.
+        """
+        self.ref.reply(self._session(None).play_delta(bot_index, delta))
+
+    @expose
+    def game(self, game_id, method, params):
+        """ Called by the server. Calls `method` ("set_bot_ids",
+        "set_initial", "play_now" or "play_delta") with `params` for the
+        game with the given id and replies the result.
+
+        The method "end_game" forgets about the game.
+        """
+        if method == "end_game":
+            self.sessions.pop(game_id, None)
+            return
+        if method not in ("set_bot_ids", "set_initial", "play_now", "play_delta"):
+            self.ref.reply("Not found: method '%r'" % method)
+            return
+        session = self._session(game_id)
+        if method == "set_bot_ids":
+            self.ref.reply(session.set_bot_ids(params))
+        else:
+            self.ref.reply(getattr(session, method)(*params))
 
 
 class ClientActor(object):
@@ -117,6 +226,19 @@ def register_team(self, team):
         """
         self.actor_ref.notify("register_team", [team])
 
+    def register_team_factory(self, team_factory, games):
+        """ Lets the client play several games at the same time over
+        a single connection. Must be called before connecting.
+
+        Parameters
+        ----------
+        team_factory : callable
+            Returns a new PlayerTeam for every game.
+        games : int
+            The maximum number of simultaneous games.
+        """
+        self.actor_ref.notify("register_team_factory", [team_factory, games])
+
     def connect_local(self, main_actor):
         """ Tells our local actor to establish a local connection
         with other local actor `main_actor`.
@@ -149,6 +271,38 @@ def connect(self, main_actor, host="", port=50007):
         return False
 
 
+class GameReference(object):
+    """ Addresses a single game of a client which plays several games
+    over one connection, see `_ClientActor.game`.
+
+    It can be used in place of the client's reference in a
+    `RemoteTeamPlayer`.
+
+    Parameters
+    ----------
+    reference : ActorReference
+        A reference to the local or remote client actor.
+    game_id : int
+        The id of the game, which must be unique for the client.
+    """
+    def __init__(self, reference, game_id):
+        self.ref = reference
+        self.game_id = game_id
+
+    @property
+    def _remote_mailbox(self):
+        return getattr(self.ref, "_remote_mailbox", None)
+
+    def query(self, method, params=None):
+        return self.ref.query("game", [self.game_id, method, params])
+
+    def end_game(self):
+        """ Tells the client that the game is over. """
+        try:
+            self.ref.notify("game", [self.game_id, "end_game", None])
+        except (DeadConnection, ActorNotRunning):
+            pass
+
 class RemoteTeamPlayer(object):
     """ This class is registered with the GameMaster and
     relays all get_move requests to the given ActorReference.
@@ -156,23 +310,49 @@ class RemoteTeamPlayer(object):
 
     It also does some basic checks for correct return values.
 
+    The full universe is only sent with `set_initial`. Afterwards, each
+    `play_delta` query only contains the `UniverseDelta` to the universe
+    which has been sent before. If the actor cannot apply it, the full
+    universe is sent again with `play_now`. Actors which do not know
+    `play_delta` at all get the full universe with `play_now` from then on.
+
     Paramters
     ---------
     reference : ActorReference
         A reference to the local or remote actor.
+    timeout : float, optional
+        The number of seconds to wait for a reply. Default: TIMEOUT.
     """
-    def __init__(self, reference):
+    def __init__(self, reference, timeout=TIMEOUT):
         self.ref = reference
+        self.timeout = timeout
+        # the last universe which has been sent to the actor
+        self._universe = None
+        # False, if the actor does not understand play_delta
+        self._deltas = True
 
     def _set_bot_ids(self, bot_ids):
-        return self.ref.query("set_bot_ids", bot_ids).get(TIMEOUT)
+        return self.ref.query("set_bot_ids", bot_ids).get(self.timeout)
 
     def _set_initial(self, universe):
-        return self.ref.query("set_initial", [universe]).get(TIMEOUT)
+        self._universe = universe.copy()
+        return self.ref.query("set_initial", [universe]).get(self.timeout)
 
     def _get_move(self, bot_idx, universe):
         try:
-            result = self.ref.query("play_now", [bot_idx, universe]).get(TIMEOUT)
+            if self._universe is None or not self._deltas:
+                result = RESYNC
+            else:
+                delta = UniverseDelta.between(self._universe, universe)
+                result = self.ref.query("play_delta", [bot_idx, delta]).get(self.timeout)
+                if isinstance(result, basestring) and result != RESYNC:
+                    # an error message from an older client
+                    _logger.info("Client does not support play_delta: %r", result)
+                    self._deltas = False
+                    result = RESYNC
+            if result == RESYNC:
+                result = self.ref.query("play_now", [bot_idx, universe]).get(self.timeout)
+            self._universe = universe.copy()
             return tuple(result)
         except TypeError:
             # if we could not convert into a tuple (e.g. bad reply)
@@ -184,6 +364,11 @@ def _get_move(self, bot_idx, universe):
             # if the remote connection is closed
             raise PlayerDisconnected()
 
+def _is_connected(team_ref):
+    """ False, if the remote connection of `team_ref` has been closed. """
+    return (not getattr(team_ref, "_remote_mailbox", None) or
+            team_ref._remote_mailbox.is_alive())
+
 class ServerActor(DispatchingActor):
     """ Actor which is used to handle all incoming requests,
     assigns each team a RemoteTeamPlayer and registers this with
@@ -207,8 +392,7 @@ def initialize_game(self, layout, number_bots, game_time):
     def _remove_dead_teams(self):
         # check, if previously added teams are still alive:
         zipped = [(team, name) for team, name in zip(self.teams, self.team_names)
-                               if not getattr(team, "_remote_mailbox", None) or
-                               team._remote_mailbox.outbox.thread.is_alive()]
+                               if _is_connected(team)]
 
         if zipped:
             teams, team_names = zip(*zipped)
@@ -216,8 +400,10 @@ def _remove_dead_teams(self):
             self.team_names = list(team_names)
 
     @expose
-    def hello(self, team_name, actor_uuid):
+    def hello(self, team_name, actor_uuid, games=1):
         """ Register the actor with address `actor_uuid` as team `team_name`.
+
+        The server plays only one game, so `games` is ignored.
         """
         _logger.info("Received 'hello' from '%s'." % team_name)
 
@@ -262,3 +448,178 @@ def check_for_start(self):
 
             self.ref.notify("start_game")
 
+def _play_league_match(match, number_bots, game_time, noise):
+    """ Plays `match` with the RemoteTeamPlayers of its teams.
+    Called on a worker thread of the `LeagueServerActor`.
+    """
+    try:
+        gm = GameMaster(match.layout, number_bots, game_time, noise=noise)
+        for team_name, team_ref in match.teams:
+            gm.register_team(RemoteTeamPlayer(team_ref), team_name=team_name)
+        viewer = ResultViewer()
+        gm.register_viewer(viewer)
+        gm.play()
+        return viewer.result(match.index, [name for name, ref in match.teams],
+                             match.layout_name, gm.universe)
+    except Exception as e:
+        _logger.exception("Match %i failed: %r", match.index, e)
+        return None
+    finally:
+        for team_name, team_ref in match.teams:
+            if isinstance(team_ref, GameReference):
+                team_ref.end_game()
+
+class LeagueServerActor(DispatchingActor):
+    """ Actor which pairs all connected teams and runs many games
+    at the same time.
+
+    Every team which says `hello` is put into a queue. Whenever teams
+    are waiting, the scheduler pairs them and each pairing is played by
+    its own GameMaster on a pool of worker threads. After a game, both
+    teams are put back into the queue (unless they have disconnected),
+    so that a client plays one game after the other over the same
+    connection.
+
+    A client which says `hello` with a number of `games` larger than one
+    is registered as that many teams. Their games are multiplexed over
+    the client's connection with a `GameReference` per game.
+
+    The league starts with `initialize_league`. Teams may connect
+    before and after that.
+    """
+    def on_start(self):
+        # the reference of every team by its (unique) name
+        self.teams = {}
+        # the names of teams whose games are multiplexed
+        self.multiplexed = set()
+        self.waiting = []
+        self.results = []
+        self.scheduler = None
+        self.result_sink = None
+        self._pool = None
+        self._match_counter = itertools.count()
+        # both teams of a match may be played by the same client
+        self._game_id_counter = itertools.count()
+
+    def on_stop(self):
+        # running games are finished; their results are dropped
+        if self._pool:
+            self._pool.close()
+
+    @expose
+    def initialize_league(self, layouts, number_bots, game_time, noise=True,
+            scheduler=None, max_games=4, result_sink=None):
+        """ Starts the league.
+
+        Parameters
+        ----------
+        layouts : list of (name, layout) pairs
+            the layouts which are played on in turn
+        number_bots : int
+            the total number of bots
+        game_time : int
+            the maximum number of rounds per game
+        noise : boolean, optional
+            should enemy positions be noisy. Default: True.
+        scheduler : Scheduler, optional
+            decides about the pairings. Default: RoundRobinScheduler().
+        max_games : int, optional
+            the maximum number of games at the same time. Default: 4.
+        result_sink : callable, optional
+            is called with the `GameResult` of every finished game
+        """
+        self._layouts = itertools.cycle(layouts)
+        self._game_settings = (number_bots, game_time, noise)
+        self.scheduler = scheduler or RoundRobinScheduler()
+        self.result_sink = result_sink
+        self._pool = ThreadPool(max_games)
+        self._schedule()
+
+    @expose
+    def hello(self, team_name, actor_uuid, games=1):
+        """ Register the actor with address `actor_uuid` as team `team_name`.
+
+        If the name is already taken, a number is appended.
+        If the actor can play several `games` at the same time, it is
+        registered as that many teams.
+        """
+        _logger.info("Received 'hello' from '%s'.", team_name)
+
+        if self.ref.remote:
+            team_ref = self.ref.remote.create_proxy(actor_uuid)
+        else:
+            team_ref = actor_registry.get_by_uuid(actor_uuid)
+
+        for _ in range(games):
+            name = team_name
+            for number in itertools.count(2):
+                if name not in self.teams:
+                    break
+                name = "%s (%i)" % (team_name, number)
+
+            self.teams[name] = team_ref
+            if games > 1:
+                self.multiplexed.add(name)
+            self.waiting.append(name)
+        self.ref.reply("ok")
+
+        self._schedule()
+
+    @expose
+    def standings(self):
+        """ Replies the standings of all teams, see `pelita.tournament.standings`. """
+        self.ref.reply(standings(self.results, self.teams.keys()))
+
+    @expose
+    def game_finished(self, team_names, result):
+        """ Called when a game has been played. """
+        for name in team_names:
+            if _is_connected(self.teams[name]):
+                self.waiting.append(name)
+            else:
+                _logger.info("Team '%s' has disconnected.", name)
+                del self.teams[name]
+                self.multiplexed.discard(name)
+
+        if result is not None:
+            self.results.append(result)
+            self.scheduler.record(result)
+            if self.result_sink:
+                self.result_sink(result)
+
+        self._schedule()
+
+    def _schedule(self):
+        """ Starts a game for every pairing of the scheduler. """
+        if self._pool is None:
+            return
+
+        for name in list(self.waiting):
+            if not _is_connected(self.teams[name]):
+                self.waiting.remove(name)
+                del self.teams[name]
+                self.multiplexed.discard(name)
+
+        for pairing in self.scheduler.pair(self.waiting):
+            for name in pairing:
+                self.waiting.remove(name)
+            layout_name, layout = next(self._layouts)
+            index = next(self._match_counter)
+            teams = []
+            for name in pairing:
+                team_ref = self.teams[name]
+                if name in self.multiplexed:
+                    team_ref = GameReference(team_ref, next(self._game_id_counter))
+                teams.append((name, team_ref))
+            match = Match(index, teams, layout_name, layout, None)
+            _logger.info("Starting match %i: %s vs %s.", match.index, *pairing)
+
+            def finished(result, team_names=list(pairing)):
+                try:
+                    self.ref.notify("game_finished", [team_names, result])
+                except ActorNotRunning:
+                    pass
+
+            self._pool.apply_async(_play_league_match,
+                                   (match,) + self._game_settings,
+                                   callback=finished)
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+
+""" Vectorised simulation of many independent games at once.
+
+The `BatchUniverse` holds the state of many games of Capture The Flag which
+all start from the same `CTFUniverse`. Moving a bot moves it in every game
+at once using NumPy array operations, which is much faster than stepping
+through many `CTFUniverse` objects when running parameter sweeps.
+
+This module needs NumPy, which is otherwise not required by pelita.
+"""
+
+import numpy as np
+
+from pelita.containers import TypeAwareList
+from pelita.datamodel import moves, create_CTFUniverse, Free,\
+        UniverseEvent, BotMoves, BotDestroyed, BotEats, FoodEaten,\
+        TeamScoreChange, TeamWins, IllegalMoveException
+
+__docformat__ = "restructuredtext"
+
+#: the x and y components of `datamodel.moves`, indexed by move index
+MOVE_X = np.array([move[0] for move in moves])
+MOVE_Y = np.array([move[1] for move in moves])
+
+
+def _pos(x, y):
+    """ Converts array elements to a position tuple of Python ints. """
+    return (int(x), int(y))
+
+
+class BatchEvents(object):
+    """ The events of a single `BatchUniverse.move_bot()` call in all games.
+
+    The events are stored as arrays over all games. Use `for_game()` to
+    obtain the list of `UniverseEvent` objects for a single game, which is
+    the same list that `CTFUniverse.move_bot()` would have returned.
+
+    Attributes
+    ----------
+    bot_index : int
+        the index of the moved bot
+    active : ndarray of bool, shape (number_games,)
+        the games which were not over before the move; the other games
+        have no events
+    team_index : int
+        the team of the moved bot
+    old_pos, new_pos : ndarray of int, shape (number_games, 2)
+        the positions before and after the move
+    destroyed : list of tuples
+        one entry `(mask, harvester_index, harvester_old_pos,
+        harvester_new_pos, harvester_reset, destroyer_index,
+        destroyer_old_pos, destroyer_new_pos)` for each checked collision
+    eats : ndarray of bool, shape (number_games,)
+        the games in which the bot has eaten food
+    scores : ndarray of int, shape (number_games,)
+        the score of the team after the move
+    wins : ndarray of bool, shape (number_games,)
+        the games which have been won with this move
+
+    """
+    def __init__(self, bot_index, team_index, active, old_pos, new_pos):
+        self.bot_index = bot_index
+        self.active = active
+        self.team_index = team_index
+        self.old_pos = old_pos
+        self.new_pos = new_pos
+        self.destroyed = []
+        self.eats = None
+        self.scores = None
+        self.wins = None
+
+    def for_game(self, game):
+        """ The events in a single game.
+
+        Parameters
+        ----------
+        game : int
+            the index of the game
+
+        Returns
+        -------
+        events : TypeAwareList of UniverseEvent objects
+            the events that happened during the move
+
+        """
+        events = TypeAwareList(base_class=UniverseEvent)
+        if not self.active[game]:
+            return events
+        events.append(BotMoves(self.bot_index, _pos(*self.old_pos[game]),
+                               _pos(*self.new_pos[game])))
+        for (mask, harvester, harvester_old, harvester_new, harvester_reset,
+                destroyer, destroyer_old, destroyer_new) in self.destroyed:
+            if mask[game]:
+                events.append(BotDestroyed(harvester,
+                    _pos(*harvester_old[game]), _pos(*harvester_new[game]),
+                    harvester_reset, destroyer,
+                    _pos(*destroyer_old[game]), _pos(*destroyer_new[game])))
+        if self.eats[game]:
+            food_pos = _pos(*self.new_pos[game])
+            events.append(BotEats(self.bot_index, food_pos))
+            events.append(FoodEaten(food_pos))
+            events.append(TeamScoreChange(self.team_index, 1,
+                                          int(self.scores[game])))
+            if self.wins[game]:
+                events.append(TeamWins(self.team_index))
+        return events
+
+
+class BatchUniverse(object):
+    """ Many independent games of Capture The Flag, stepped together.
+
+    All games start from the state of `universe`. The maze is shared by all
+    games, whereas food, bot positions and scores are kept per game.
+
+    Moves are given as indices into `datamodel.moves`. Once a game has
+    been won, it does not change any more.
+
+    Parameters
+    ----------
+    universe : CTFUniverse
+        the initial state of every game
+    number_games : int
+        the number of games
+
+    Attributes
+    ----------
+    free : ndarray of bool, shape (height, width)
+        the free positions of the maze
+    food : ndarray of bool, shape (number_games, height, width)
+        the food in every game
+    bot_x, bot_y : ndarray of int, shape (number_games, number_bots)
+        the current bot positions in every game
+    scores : ndarray of int, shape (number_games, number_teams)
+        the scores in every game
+    winners : ndarray of int, shape (number_games,)
+        the index of the team which has won a game or -1
+
+    """
+    def __init__(self, universe, number_games):
+        self.number_games = number_games
+        self._universe = universe.copy()
+        maze = universe.maze
+        self.free = np.zeros((maze.height, maze.width), dtype=bool)
+        for x, y in maze.pos_of(Free):
+            self.free[y, x] = True
+        food = np.zeros((maze.height, maze.width), dtype=bool)
+        for x, y in universe.food_list:
+            food[y, x] = True
+        self.food = np.repeat(food[np.newaxis], number_games, axis=0)
+
+        bots = universe.bots
+        self.bot_x = np.tile([bot.current_pos[0] for bot in bots],
+                             (number_games, 1))
+        self.bot_y = np.tile([bot.current_pos[1] for bot in bots],
+                             (number_games, 1))
+        self._initial_pos = [bot.initial_pos for bot in bots]
+        self._bot_team = [bot.team_index for bot in bots]
+        self._homezones = [bot.homezone for bot in bots]
+        self._enemies = [[enemy.index
+                          for enemy in universe.enemy_bots(bot.team_index)]
+                         for bot in bots]
+
+        teams = universe.teams
+        self.scores = np.tile([team.score for team in teams],
+                              (number_games, 1))
+        # the team which owns the food in each column of the maze
+        self._zone_owner = np.zeros(maze.width, dtype=int) - 1
+        for team in teams:
+            self._zone_owner[team.zone[0]:team.zone[1] + 1] = team.index
+        self._team_food = np.tile([len(universe.team_food(team.index))
+                                   for team in teams], (number_games, 1))
+        self._total_food = np.zeros(number_games, dtype=int) + \
+                           len(universe.food_list)
+        self.winners = np.zeros(number_games, dtype=int) - 1
+        self._games = np.arange(number_games)
+
+    @classmethod
+    def from_layout(cls, layout_str, number_bots, number_games,
+            team_names=None):
+        """ Creates a BatchUniverse using `create_CTFUniverse()`.
+
+        Parameters
+        ----------
+        layout_str : str
+            the string encoding the maze layout
+        number_bots : int
+            the number of bots in the game
+        number_games : int
+            the number of games
+        team_names : length 2 list of strings, optional
+            the names of the playing teams
+
+        """
+        universe = create_CTFUniverse(layout_str, number_bots, team_names)
+        return cls(universe, number_games)
+
+    def _in_own_zone(self, bot_index, x):
+        homezone = self._homezones[bot_index]
+        return (homezone[0] <= x) & (x <= homezone[1])
+
+    def legal_moves(self, bot_index):
+        """ The legal moves of a bot in every game.
+
+        Parameters
+        ----------
+        bot_index : int
+            the index of the bot
+
+        Returns
+        -------
+        legal_moves : ndarray of bool, shape (number_games, len(moves))
+            True, if the respective move is legal in a game
+
+        """
+        new_x = self.bot_x[:, bot_index, np.newaxis] + MOVE_X
+        new_y = self.bot_y[:, bot_index, np.newaxis] + MOVE_Y
+        return self.free[new_y, new_x]
+
+    def move_bot(self, bot_index, move_indices):
+        """ Moves a bot in every game.
+
+        Parameters
+        ----------
+        bot_index : int
+            the index of the bot
+        move_indices : array_like of int, shape (number_games,)
+            the index of the move in `datamodel.moves` for every game;
+            it is ignored in the games which are over
+
+        Returns
+        -------
+        events : BatchEvents
+            the events that happened during the move
+
+        Raises
+        ------
+        IllegalMoveException
+            if the move is not possible in any of the running games
+
+        """
+        move_indices = np.asarray(move_indices, dtype=int)
+        if ((move_indices < 0) | (move_indices >= len(moves))).any():
+            raise IllegalMoveException(
+                'Illegal move_id from bot %i: %r' % (bot_index, move_indices))
+        active = self.winners < 0
+        old_x = self.bot_x[:, bot_index].copy()
+        old_y = self.bot_y[:, bot_index].copy()
+        new_x = np.where(active, old_x + MOVE_X[move_indices], old_x)
+        new_y = np.where(active, old_y + MOVE_Y[move_indices], old_y)
+        legal = self.free[new_y, new_x]
+        if not legal.all():
+            raise IllegalMoveException(
+                'Illegal move from bot %i in games %r'
+                % (bot_index, np.flatnonzero(~legal).tolist()))
+        self.bot_x[:, bot_index] = new_x
+        self.bot_y[:, bot_index] = new_y
+        old_pos = np.column_stack((old_x, old_y))
+        new_pos = np.column_stack((new_x, new_y))
+        team_index = self._bot_team[bot_index]
+        events = BatchEvents(bot_index, team_index, active, old_pos, new_pos)
+
+        # check for destruction
+        for enemy in self._enemies[bot_index]:
+            bot_x = self.bot_x[:, bot_index]
+            bot_y = self.bot_y[:, bot_index]
+            enemy_pos = np.column_stack((self.bot_x[:, enemy],
+                                         self.bot_y[:, enemy]))
+            same_pos = ((bot_x == enemy_pos[:, 0]) &
+                        (bot_y == enemy_pos[:, 1]) & active)
+            bot_is_destroyer = self._in_own_zone(bot_index, bot_x)
+            enemy_is_destroyer = self._in_own_zone(enemy, enemy_pos[:, 0])
+
+            bot_destroyed = same_pos & enemy_is_destroyer & ~bot_is_destroyer
+            if bot_destroyed.any():
+                self._reset(bot_index, bot_destroyed)
+                events.destroyed.append((bot_destroyed, bot_index,
+                    old_pos, new_pos, self._initial_pos[bot_index],
+                    enemy, enemy_pos, enemy_pos))
+
+            enemy_destroyed = same_pos & ~enemy_is_destroyer & bot_is_destroyer
+            if enemy_destroyed.any():
+                self._reset(enemy, enemy_destroyed)
+                events.destroyed.append((enemy_destroyed, enemy,
+                    enemy_pos, enemy_pos, self._initial_pos[enemy],
+                    bot_index, old_pos, new_pos))
+
+        # check for food being eaten
+        bot_x = self.bot_x[:, bot_index]
+        bot_y = self.bot_y[:, bot_index]
+        eats = (self.food[self._games, bot_y, bot_x] &
+                ~self._in_own_zone(bot_index, bot_x) & active)
+        games = self._games[eats]
+        food_x = bot_x[eats]
+        self.food[games, bot_y[eats], food_x] = False
+        owner = self._zone_owner[food_x]
+        self._team_food[games[owner >= 0], owner[owner >= 0]] -= 1
+        self._total_food[games] -= 1
+        self.scores[games, team_index] += 1
+        # only games which were running can be won
+        wins = eats & (self._total_food == self._team_food[:, team_index])
+        self.winners[wins] = team_index
+
+        events.eats = eats
+        events.scores = self.scores[:, team_index].copy()
+        events.wins = wins
+        return events
+
+    def _reset(self, bot_index, mask):
+        """ Resets a bot to its initial position in the masked games. """
+        initial_x, initial_y = self._initial_pos[bot_index]
+        self.bot_x[mask, bot_index] = initial_x
+        self.bot_y[mask, bot_index] = initial_y
+
+    def universe(self, game):
+        """ The state of a single game as a `CTFUniverse`.
+
+        Parameters
+        ----------
+        game : int
+            the index of the game
+
+        Returns
+        -------
+        universe : CTFUniverse
+            the universe of this game
+
+        """
+        universe = self._universe.copy()
+        for x, y in universe.food_list:
+            if not self.food[game, y, x]:
+                universe._remove_food((x, y))
+        for bot in universe.bots:
+            bot.current_pos = _pos(self.bot_x[game, bot.index],
+                                   self.bot_y[game, bot.index])
+        for team in universe.teams:
+            team.score = int(self.scores[game, team.index])
+        universe.reset_history()
+        return universe
@@ -2,7 +2,11 @@
 
 """ The datamodel. """
 
+import base64
+import binascii
 import copy
+import random
+import zlib
 from pelita.layout import Layout
 from pelita.containers import Mesh, TypeAwareList
 from pelita.messaging.json_convert import serializable
@@ -291,12 +295,26 @@ def _from_json_dict(cls, item):
         return cls(**item)
 
 class UniverseEvent(object):
-    """ Base class for all events in a Universe. """
+    """ Base class for all events in a Universe.
+
+    As with `MazeComponent`, every subclass must be decorated with
+    `@serializable` itself.
+    """
 
     def __eq__(self, other):
         return self.__dict__ == other.__dict__
 
+    def _to_json_dict(self):
+        return self.__dict__
+
+    @classmethod
+    def _from_json_dict(cls, item):
+        # need to convert the json lists (i.e. positions) to tuples
+        return cls(**dict((str(key), tuple(value) if isinstance(value, list) else value)
+                          for key, value in item.iteritems()))
 
+
+@serializable
 class BotMoves(UniverseEvent):
     """ Signifies that a bot has moved.
 
@@ -316,6 +334,7 @@ def __repr__(self):
             % (self.bot_index, self.old_pos, self.new_pos))
 
 
+@serializable
 class BotEats(UniverseEvent):
     """ Signifies that a bot has eaten food.
 
@@ -333,6 +352,7 @@ def __repr__(self):
         return ('BotEats(%i, %r)'
             % (self.bot_index, self.food_pos))
 
+@serializable
 class FoodEaten(UniverseEvent):
     """ Signifies that food has been eaten.
 
@@ -348,6 +368,7 @@ def __init__(self, food_pos):
     def __repr__(self):
         return 'FoodEaten(%s)' % repr(self.food_pos)
 
+@serializable
 class TeamScoreChange(UniverseEvent):
     """ Signifies that the score of a Team has changed.
 
@@ -369,6 +390,7 @@ def __repr__(self):
         return ('TeamScoreChange(%i, %i, %i)' %
             (self.team_index, self.score_change, self.new_score))
 
+@serializable
 class BotDestroyed(UniverseEvent):
     """ Signifies that a bot has been destroyed.
 
@@ -408,6 +430,7 @@ def __repr__(self):
                 self.destroyer_index, self.destroyer_old_pos,
                 self.destroyer_new_pos))
 
+@serializable
 class TimeoutEvent(UniverseEvent):
     """ Signify that a timeout has occurred.
 
@@ -424,6 +447,7 @@ def __repr__(self):
         return "TimeoutEvent(%i)" % self.team_index
 
 
+@serializable
 class TeamWins(UniverseEvent):
     """ Signify that a team has eaten all enemy food.
 
@@ -492,31 +516,208 @@ def __repr__(self):
 maze_components = [Food, Free, Wall]
 mapped_components = dict((C.char, C) for C in maze_components)
 
+# translation tables between layers (one byte per position) and strings of
+# binary digits
+_layer_to_bits = "".join(chr(i) for i in range(256)).replace("\x00", "0", 1)\
+                                                    .replace("\x01", "1", 1)
+_bits_to_layer = "".join(chr(i) for i in range(256)).replace("0", "\x00", 1)\
+                                                    .replace("1", "\x01", 1)
+
+def _pack_layer(layer):
+    """ Encodes a layer of a Maze as a base64 bitset. """
+    if not layer:
+        return ""
+    bits = str(layer).translate(_layer_to_bits)
+    bits += "0" * (-len(bits) % 8)
+    packed = "%0*x" % (len(bits) // 4, int(bits, 2))
+    return base64.b64encode(packed.decode("hex"))
+
+def _unpack_layer(encoded, length):
+    """ Decodes a base64 bitset into a layer of `length` positions.
+
+    Raises
+    ------
+    ValueError
+        if `encoded` is no valid bitset of the given length
+    """
+    try:
+        packed = base64.b64decode(encoded)
+    except (TypeError, binascii.Error):
+        raise ValueError("Invalid base64 data in Maze layer.")
+    if len(packed) != (length + 7) // 8:
+        raise ValueError("Maze layer has wrong length: %i bytes, expected: %i"
+                         % (len(packed), (length + 7) // 8))
+    if not packed:
+        return bytearray()
+    bits = bin(int(packed.encode("hex"), 16))[2:].rjust(8 * len(packed), "0")
+    return bytearray(bits[:length].translate(_bits_to_layer))
+
 @serializable
 class Maze(Mesh):
-    """ A Mesh of TypeAwareLists of MazeComponent representations.
+    """ A Mesh of MazeComponent representations.
 
     This is a container class to represent a game maze. It is a two-dimensional
     structure (Mesh) which contains a representation of MazeComponents at
-    each position. (Internally, this is implemented with strings.)
+    each position.
+
+    Internally, each type of MazeComponent is kept in a separate `bytearray`
+    which is indexed by the linear index of the Mesh. A non-zero entry means
+    that the component is present at this position. This way, checking for a
+    single component (`has_at()`) does not need to allocate any objects.
+
+    Copies of a Maze (`copy()`) share these arrays with the original until
+    one of them is modified (copy-on-write). As the walls of a maze do not
+    change during a game, taking a copy is therefore very cheap.
+
+    Parameters
+    ----------
+    width : int
+        desired width for Maze
+    height : int
+        desired height for Maze
+    data : list of str, optional
+        the components at each position, given as strings of their `char`
+        attributes (e.g. `' .'` for a free position with food)
 
     """
 
+    # the order in which components are listed for a single position
+    _component_order = (Wall, Free, Food)
+
+    # the version of the format written by `_to_json_dict()`
+    _json_version = 1
+
     def __init__(self, width, height, data=None):
+        self.width = width
+        self.height = height
         if not data:
             data = ["" for i in range(width*height)]
-        elif not all(isinstance(s, basestring) for s in data):
+        self._set_data(data)
+
+    def _set_data(self, new_data):
+        """ Set the components of this Maze from a list of strings.
+
+        Parameters
+        ----------
+        new_data : list of str
+            the components at each position
+
+        Raises
+        ------
+        TypeError
+            if new_data is not a list of strings
+        ValueError
+            if new_data has inappropriate length or an unknown character
+
+        """
+        if (not isinstance(new_data, list) or
+                not all(isinstance(s, basestring) for s in new_data)):
             raise TypeError("Maze keyword argument 'data' should be list of " +\
-                            "strings, not: %r" % data)
-        super(Maze, self).__init__(width, height, data)
+                            "strings, not: %r" % new_data)
+        if len(new_data) != len(self):
+            raise ValueError(
+                'The new_data has wrong length: %i, expected: %i'
+                % (len(new_data), len(self)))
+
+        layers = dict((C, bytearray(len(new_data)))
+                      for C in self._component_order)
+        for index, chars in enumerate(new_data):
+            for char in chars:
+                try:
+                    layers[mapped_components[char]][index] = 1
+                except KeyError:
+                    raise ValueError("%r is not a valid MazeComponent char."
+                                     % char)
+        self._layers = layers
+        # the components whose layers may be shared with other mazes
+        self._shared = set()
+
+    def _writable_layer(self, type_):
+        """ Returns the layer of a component for modification.
+
+        If the layer is shared with another Maze, it is copied first.
+        """
+        if type_ in self._shared:
+            self._layers[type_] = bytearray(self._layers[type_])
+            self._shared.discard(type_)
+        return self._layers[type_]
+
+    @property
+    def _data(self):
+        """ The string representation of all positions (row-based). """
+        return [self._chars_at(index) for index in range(len(self))]
+
+    def _chars_at(self, index_linear):
+        return "".join(C.char for C in self._component_order
+                       if self._layers[C][index_linear])
 
     def __getitem__(self, index):
-        chars = super(Maze, self).__getitem__(index)
-        return [mapped_components[char] for char in chars]
+        index_linear = self._index_tuple_to_linear(index)
+        return [C for C in self._component_order
+                if self._layers[C][index_linear]]
 
     def __setitem__(self, key, value):
-        chars = "".join(val.char for val in value)
-        super(Maze, self).__setitem__(key, chars)
+        index_linear = self._index_tuple_to_linear(key)
+        chars = set(val.char for val in value)
+        for C in self._component_order:
+            present = int(C.char in chars)
+            if self._layers[C][index_linear] != present:
+                self._writable_layer(C)[index_linear] = present
+
+    def __eq__(self, other):
+        if isinstance(other, Maze):
+            return (self.shape == other.shape and
+                    self._layers == other._layers)
+        return super(Maze, self).__eq__(other)
+
+    def __repr__(self):
+        return ('Maze(%i, %i, data=%r)'
+            % (self.width, self.height, self._data))
+
+    def copy(self):
+        """ Returns a copy of this Maze which shares its data copy-on-write.
+
+        Returns
+        -------
+        maze : Maze
+            the copy
+
+        """
+        maze = Maze.__new__(Maze)
+        maze.width = self.width
+        maze.height = self.height
+        maze._layers = dict(self._layers)
+        self._shared = set(self._layers)
+        maze._shared = set(self._layers)
+        return maze
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def _to_json_dict(self):
+        # every component is sent as a bitset of all positions
+        return {"version": self._json_version,
+                "width": self.width,
+                "height": self.height,
+                "layers": dict((C.char, _pack_layer(self._layers[C]))
+                               for C in self._component_order)}
+
+    @classmethod
+    def _from_json_dict(cls, item):
+        if "version" not in item:
+            # the original format with one string per position
+            return cls(**item)
+        if item["version"] != cls._json_version:
+            raise ValueError("Unknown Maze format version: %r"
+                             % item["version"])
+        maze = cls.__new__(cls)
+        maze.width = item["width"]
+        maze.height = item["height"]
+        layers = item["layers"]
+        maze._layers = dict((C, _unpack_layer(layers[C.char], len(maze)))
+                            for C in cls._component_order)
+        maze._shared = set()
+        return maze
 
     def has_at(self, type_, pos):
         """ Check if objects of a given type are present at position.
@@ -534,7 +735,10 @@ def has_at(self, type_, pos):
             True if objects of the given type are present and False otherwise.
 
         """
-        return type_ in self[pos]
+        layer = self._layers.get(type_)
+        if layer is None:
+            return False
+        return layer[self._index_tuple_to_linear(pos)] != 0
 
     def get_at(self, type_, pos):
         """ Get all objects of a given type at certain position.
@@ -565,11 +769,28 @@ def remove_at(self, type_, pos):
             the position to look at
 
         """
-        if type_ in self[pos]:
-            self[pos] = [item for item in self[pos] if item != type_]
+        layer = self._layers.get(type_)
+        index_linear = self._index_tuple_to_linear(pos)
+        if layer is not None and layer[index_linear]:
+            self._writable_layer(type_)[index_linear] = 0
         else:
             raise ValueError
 
+    def add_at(self, type_, pos):
+        """ Add an object of a given type at a certain position.
+
+        Parameters
+        ----------
+        type_ : type
+            the type of object to add
+        pos : tuple of (int, int)
+            the position to add it at
+
+        """
+        index_linear = self._index_tuple_to_linear(pos)
+        if not self._layers[type_][index_linear]:
+            self._writable_layer(type_)[index_linear] = 1
+
     @property
     def positions(self):
         """ The indices of positions in the Maze.
@@ -584,7 +805,12 @@ def positions(self):
 
     def pos_of(self, type_):
         """ The indices of positions which have a MazeComponent. """
-        return [pos for pos in self.positions if self.has_at(type_, pos)]
+        layer = self._layers.get(type_)
+        if layer is None:
+            return []
+        to_tuple = self._index_linear_to_tuple
+        return [to_tuple(index) for index, present in enumerate(layer)
+                if present]
 
 
 def create_maze(layout_mesh):
@@ -601,15 +827,46 @@ def create_maze(layout_mesh):
         the Maze
 
     """
-    maze = Maze(layout_mesh.width, layout_mesh.height)
-    for index in maze.iterkeys():
-        if layout_mesh[index] == Wall.char:
-            maze[index] = maze[index] + [Wall]
+    data = []
+    for char in layout_mesh.itervalues():
+        if char == Wall.char:
+            data.append(Wall.char)
+        elif char == Food.char:
+            data.append(Free.char + Food.char)
         else:
-            maze[index] = maze[index] + [Free]
-        if layout_mesh[index] == Food.char:
-            maze[index] = maze[index] + [Food]
-    return maze
+            data.append(Free.char)
+    return Maze(layout_mesh.width, layout_mesh.height, data=data)
+
+
+def _maze_order(pos):
+    """ Sort key which orders positions row-based, like `Maze.positions`. """
+    return (pos[1], pos[0])
+
+
+class _ZobristKeys(object):
+    """ The random 64 bit keys for the `state_hash` of universes with
+    a maze of `size` positions and `number_bots` bots.
+
+    The keys are always the same for the same arguments, so that
+    hashes may be compared between processes.
+    """
+    _SEED = 0x7a6f6272697374
+
+    def __init__(self, size, number_bots):
+        rand = random.Random(self._SEED)
+        self.food = [rand.getrandbits(64) for index in range(size)]
+        self.bots = [[rand.getrandbits(64) for index in range(size)]
+                     for bot in range(number_bots)]
+
+_zobrist_keys_cache = {}
+
+def _zobrist_keys(size, number_bots):
+    """ The (cached) `_ZobristKeys` for the given numbers. """
+    try:
+        return _zobrist_keys_cache[size, number_bots]
+    except KeyError:
+        keys = _zobrist_keys_cache[size, number_bots] = _ZobristKeys(size, number_bots)
+        return keys
 
 
 def extract_initial_positions(mesh, number_bots):
@@ -725,6 +982,23 @@ class CTFUniverse(object):
     food_list : list of tuple of ints (x, y), property
         the positions of all edible food
 
+    Notes
+    -----
+    The positions of the food are indexed per team when the Universe is
+    created and the index is updated by `move_bot()`. If food is removed
+    from the maze by other means, `_init_food_index()` must be called
+    afterwards.
+
+    Every `move_bot()` can be taken back with `undo()`. Players which
+    search through the possible moves may thus change a single universe
+    back and forth instead of taking a `copy()` for every move.
+
+    The `state_hash` is updated by `move_bot()` and `undo()` as well. If
+    the bots or the food are changed by other means (like applying a
+    `UniverseDelta` or adding noise), `reset_history()` must be called
+    afterwards. It forgets all moves, so that `undo()` raises until the
+    next `move_bot()`.
+
     """
 
 
@@ -733,6 +1007,64 @@ def __init__(self, maze, teams, bots):
         # TODO make a deepcopy here, so that we can big_bang
         self.teams = teams
         self.bots = bots
+        # one (bot_id, old_pos, reset_bots, eaten_food) per move_bot()
+        self._undo_stack = []
+        self._init_food_index()
+
+    def _init_food_index(self):
+        """ (Re-)Builds the index of all food and of the food per team. """
+        self._food = set(self.maze.pos_of(Food))
+        self._team_food = [set(pos for pos in self._food if team.in_zone(pos))
+                           for team in self.teams]
+        self._init_hash()
+
+    @property
+    def _zobrist(self):
+        # not an attribute, so that the keys are not copied with the universe
+        return _zobrist_keys(self.maze.width * self.maze.height, len(self.bots))
+
+    def _init_hash(self):
+        """ (Re-)Computes the `state_hash` from the current state. """
+        keys = self._zobrist
+        width = self.maze.width
+        state_hash = 0
+        for bot_keys, bot in zip(keys.bots, self.bots):
+            x, y = bot.current_pos
+            state_hash ^= bot_keys[x + y * width]
+        for x, y in self._food:
+            state_hash ^= keys.food[x + y * width]
+        self._hash = state_hash
+
+    def _hash_bot_move(self, keys, bot_index, old_pos, new_pos):
+        """ Updates the `state_hash` for a bot that has changed its position. """
+        width = self.maze.width
+        bot_keys = keys.bots[bot_index]
+        self._hash ^= (bot_keys[old_pos[0] + old_pos[1] * width] ^
+                       bot_keys[new_pos[0] + new_pos[1] * width])
+
+    @property
+    def state_hash(self):
+        """ A 64 bit Zobrist hash of the bot positions and the food.
+
+        Equal universes have equal hashes, no matter which moves led to
+        them. Like the equality of universes, the hash does not include
+        which bot moves next. Hashes are comparable between universes with
+        the same number of bots and mazes of the same size.
+
+        Returns
+        -------
+        state_hash : int
+            the hash
+
+        """
+        return self._hash
+
+    def _remove_food(self, pos):
+        """ Removes food from the maze and from the food index. """
+        self.maze.remove_at(Food, pos)
+        self._food.discard(pos)
+        for team_food in self._team_food:
+            team_food.discard(pos)
 
     @property
     def bot_positions(self):
@@ -755,7 +1087,7 @@ def food_list(self):
             the positions of all food
 
         """
-        return self.maze.pos_of(Food)
+        return sorted(self._food, key=_maze_order)
 
     def team_food(self, team_index):
         """ Food that is owned by a team
@@ -766,8 +1098,7 @@ def team_food(self, team_index):
             food owned by team
 
         """
-        return [pos for pos in self.food_list
-                if self.teams[team_index].in_zone(pos)]
+        return sorted(self._team_food[team_index], key=_maze_order)
 
     def enemy_food(self, team_index):
         """ Food that is edible by a team
@@ -778,8 +1109,19 @@ def enemy_food(self, team_index):
             food edible by team
 
         """
-        return [pos for pos in self.food_list
-                if not self.teams[team_index].in_zone(pos)]
+        return sorted(self._food - self._team_food[team_index],
+                      key=_maze_order)
+
+    def has_enemy_food(self, team_index):
+        """ Check if there is food left which is edible by a team.
+
+        Returns
+        -------
+        has_enemy_food : boolean
+            True if there is edible food left, False otherwise
+
+        """
+        return len(self._food) > len(self._team_food[team_index])
 
     def other_team_bots(self, bot_index):
         """ Obtain other bots on team.
@@ -894,6 +1236,9 @@ def move_bot(self, bot_id, move):
         bot.current_pos =  legal_moves_dict[move]
         new_pos = bot.current_pos
         events.append(BotMoves(bot_id, old_pos, new_pos))
+        # the enemies which have been reset, with their previous positions
+        reset_bots = []
+        eaten_food = None
         # check for destruction
         for enemy in self.enemy_bots(bot.team_index):
             if enemy.current_pos == bot.current_pos:
@@ -905,25 +1250,105 @@ def move_bot(self, bot_id, move):
                 elif enemy.is_harvester and bot.is_destroyer:
                     new_old_pos = enemy.current_pos
                     enemy._reset()
+                    reset_bots.append((enemy.index, new_old_pos))
                     events.append(BotDestroyed(
                        enemy.index, new_old_pos, new_old_pos, enemy.initial_pos,
                        bot.index, old_pos, new_pos))
         # check for food being eaten
         if self.maze.has_at(Food, bot.current_pos) and not bot.in_own_zone:
             team = self.teams[bot.team_index]
-            self.maze.remove_at(Food, bot.current_pos)
+            eaten_food = bot.current_pos
+            self._remove_food(bot.current_pos)
             team._score_point()
             events.append(BotEats(bot_id, bot.current_pos))
             events.append(FoodEaten(bot.current_pos))
             events.append(TeamScoreChange(team.index, 1, team.score))
-            if not self.enemy_food(team.index):
+            if not self.has_enemy_food(team.index):
                 events.append(TeamWins(team.index))
 
+        keys = self._zobrist
+        self._hash_bot_move(keys, bot_id, old_pos, bot.current_pos)
+        for index, pos in reset_bots:
+            self._hash_bot_move(keys, index, pos, self.bots[index].current_pos)
+        if eaten_food is not None:
+            self._hash ^= keys.food[eaten_food[0] + eaten_food[1] * self.maze.width]
+
+        self._undo_stack.append((bot_id, old_pos, tuple(reset_bots), eaten_food))
         return events
 
         # TODO:
         # check for state change
 
+    def undo(self):
+        """ Takes back the last `move_bot()`.
+
+        The bots, the scores and the food are restored to the state
+        before the move.
+
+        Raises
+        ------
+        UniverseException
+            if there is no move to take back
+
+        """
+        try:
+            bot_id, old_pos, reset_bots, eaten_food = self._undo_stack.pop()
+        except IndexError:
+            raise UniverseException("There is no move to undo.")
+        bot = self.bots[bot_id]
+        keys = self._zobrist
+        if eaten_food is not None:
+            self.maze.add_at(Food, eaten_food)
+            self._food.add(eaten_food)
+            for team, team_food in zip(self.teams, self._team_food):
+                if team.in_zone(eaten_food):
+                    team_food.add(eaten_food)
+            self.teams[bot.team_index].score -= 1
+            self._hash ^= keys.food[eaten_food[0] + eaten_food[1] * self.maze.width]
+        for index, pos in reset_bots:
+            self._hash_bot_move(keys, index, self.bots[index].current_pos, pos)
+            self.bots[index].current_pos = pos
+        self._hash_bot_move(keys, bot_id, bot.current_pos, old_pos)
+        bot.current_pos = old_pos
+
+    def reset_history(self):
+        """ Forgets all moves and recomputes the `state_hash`.
+
+        This must be called after the bots or the food have been changed
+        without `move_bot()`, because these changes cannot be taken back
+        with `undo()`.
+
+        """
+        self._undo_stack = []
+        self._init_hash()
+
+    def legal_moves(self, bot_id):
+        """ The moves which are possible for a bot.
+
+        Parameters
+        ----------
+        bot_id : int
+            index of the bot
+
+        Returns
+        -------
+        legal_moves : list of tuple of (int, int)
+            the legal moves (including `stop`) in the order of `moves`
+
+        """
+        x, y = self.bots[bot_id].current_pos
+        has_at = self.maze.has_at
+        return [move for move in moves
+                if has_at(Free, (x + move[0], y + move[1]))]
+
+    @property
+    def is_terminal(self):
+        """ True, if a team has eaten all of its enemy food.
+
+        Further rounds may still be played, if this is not the case.
+        """
+        return any(not self.has_enemy_food(team.index) for team in self.teams)
+
     def get_legal_moves(self, position):
         """ Obtain legal moves and where they lead.
 
@@ -948,8 +1373,17 @@ def __repr__(self):
         return ("CTFUniverse(%r, %r, %r)" %
             (self.maze, self.teams, self.bots))
 
+    # the attributes which only depend on the moves which led to a universe
+    _history_attributes = ("_undo_stack", "_hash")
+
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        # the moves which led to a universe do not matter
+        if not isinstance(other, CTFUniverse):
+            return False
+        return (dict((key, value) for key, value in self.__dict__.iteritems()
+                     if key not in self._history_attributes) ==
+                dict((key, value) for key, value in other.__dict__.iteritems()
+                     if key not in self._history_attributes))
 
     @property
     def _char_mesh(self):
@@ -970,7 +1404,29 @@ def __str__(self):
         return str(self._char_mesh)
 
     def copy(self):
-        return copy.deepcopy(self)
+        """ Returns a copy of this universe.
+
+        Only the bots, the teams and the food index are copied. The maze is
+        shared with the copy until either one is changed (see `Maze.copy()`),
+        so the cost of a copy does not depend on the size of the maze.
+        Moves of the original cannot be taken back in the copy.
+
+        Returns
+        -------
+        universe : CTFUniverse
+            the copy
+
+        """
+        universe = copy.copy(self)
+        universe.maze = self.maze.copy()
+        universe.teams = [copy.copy(team) for team in self.teams]
+        for team in universe.teams:
+            team.bots = list(team.bots)
+        universe.bots = [copy.copy(bot) for bot in self.bots]
+        universe._food = set(self._food)
+        universe._team_food = [set(team_food) for team_food in self._team_food]
+        universe._undo_stack = []
+        return universe
 
     @property
     def compact_str(self):
@@ -1027,6 +1483,24 @@ def neighbourhood(self, position):
         """
         return dict([(move, new_pos(position, move)) for move in moves])
 
+    @property
+    def checksum(self):
+        """ A checksum of the parts of the universe which change in a game.
+
+        These are the bot positions and noise flags, the scores and the
+        food. Used to detect diverging copies of a universe.
+
+        Returns
+        -------
+        checksum : int
+            an unsigned 32 bit checksum
+
+        """
+        state = ([(bot.current_pos, bot.noisy) for bot in self.bots],
+                 [team.score for team in self.teams],
+                 self.food_list)
+        return zlib.crc32(repr(state)) & 0xffffffff
+
     def _to_json_dict(self):
         return {"maze": self.maze,
                 "teams": self.teams,
@@ -1036,3 +1510,106 @@ def _to_json_dict(self):
     def _from_json_dict(cls, item):
         return cls(**item)
 
+@serializable
+class UniverseDelta(object):
+    """ The changes between two states of a `CTFUniverse`.
+
+    Only the things which change during a game are tracked: the bot
+    positions and noise flags, the eaten food and the scores. This allows
+    to keep a remote copy of a universe up to date without sending the
+    whole maze every time.
+
+    Parameters
+    ----------
+    bots : list of (int, (int, int), boolean)
+        index, current position and noise flag of every changed bot
+    food_eaten : list of tuple of (int, int)
+        the positions of the food which has been eaten
+    scores : list of (int, int)
+        index and score of every changed team
+    checksum : int
+        the `checksum` of the new universe
+
+    """
+    def __init__(self, bots, food_eaten, scores, checksum):
+        self.bots = bots
+        self.food_eaten = food_eaten
+        self.scores = scores
+        self.checksum = checksum
+
+    @classmethod
+    def between(cls, old, new):
+        """ The changes which turn universe `old` into universe `new`.
+
+        Parameters
+        ----------
+        old : CTFUniverse
+            the previous state
+        new : CTFUniverse
+            the current state
+
+        Returns
+        -------
+        delta : UniverseDelta
+            the changes
+
+        """
+        bots = [(new_bot.index, new_bot.current_pos, new_bot.noisy)
+                for old_bot, new_bot in zip(old.bots, new.bots)
+                if old_bot.current_pos != new_bot.current_pos or
+                   old_bot.noisy != new_bot.noisy]
+        food_eaten = sorted(old._food - new._food, key=_maze_order)
+        scores = [(new_team.index, new_team.score)
+                  for old_team, new_team in zip(old.teams, new.teams)
+                  if old_team.score != new_team.score]
+        return cls(bots, food_eaten, scores, new.checksum)
+
+    def apply(self, universe):
+        """ Applies the changes to a universe in place.
+
+        Parameters
+        ----------
+        universe : CTFUniverse
+            the universe to change; it should be equal to the `old`
+            universe of `between()`
+
+        Raises
+        ------
+        ValueError
+            if the universe is not in the expected state afterwards
+
+        """
+        for index, current_pos, noisy in self.bots:
+            bot = universe.bots[index]
+            bot.current_pos = current_pos
+            bot.noisy = noisy
+        for pos in self.food_eaten:
+            universe._remove_food(pos)
+        for index, score in self.scores:
+            universe.teams[index].score = score
+        universe.reset_history()
+        if universe.checksum != self.checksum:
+            raise ValueError("Universe does not match the checksum of the delta.")
+
+    def __eq__(self, other):
+        return self.__dict__ == other.__dict__
+
+    def __repr__(self):
+        return ('UniverseDelta(%r, %r, %r, %r)' %
+                (self.bots, self.food_eaten, self.scores, self.checksum))
+
+    def _to_json_dict(self):
+        return {"bots": self.bots,
+                "food_eaten": self.food_eaten,
+                "scores": self.scores,
+                "checksum": self.checksum}
+
+    @classmethod
+    def _from_json_dict(cls, item):
+        # need to convert the json lists to tuples
+        item["bots"] = [(index, tuple(current_pos), noisy)
+                        for index, current_pos, noisy in item["bots"]]
+        item["food_eaten"] = [tuple(pos) for pos in item["food_eaten"]]
+        item["scores"] = [tuple(score) for score in item["scores"]]
+        return cls(**item)
+
@@ -2,16 +2,20 @@
 
 """ The controller """
 
-import copy
+import math
 import random
+import time
+import logging
 from pelita.containers import TypeAwareList
 from pelita import datamodel
 from pelita.player import AbstractPlayer
 from pelita.viewer import AbstractViewer
-from pelita.graph import AdjacencyList
+from pelita.graph import DistanceMatrix, NoPathException
 
 __docformat__ = "restructuredtext"
 
+_logger = logging.getLogger("pelita.game_master")
+
 class PlayerTimeout(Exception):
     pass
 
@@ -34,6 +38,13 @@ class GameMaster(object):
         the total permitted number of rounds
     noise : boolean
         should enemy positions be noisy
+    distance_cache : str, optional
+        directory in which the maze distances for the noiser are cached,
+        see `DistanceMatrix.from_universe`
+    move_budget : float, optional
+        the number of seconds a bot may take for a single move
+    team_budget : float, optional
+        the number of seconds a team may take for all its moves in the game
 
     Attributes
     ----------
@@ -41,17 +52,27 @@ class GameMaster(object):
         the game state
     noiser : UniverseNoiser or None
         object to add noise to enemy positions
+    timings : MoveTimings
+        the time every move has taken
     player_teams : list
         the participating player teams
     viewers : list of subclasses of AbstractViewer
         the viewers that are observing this game
 
     """
-    def __init__(self, layout, number_bots, game_time, noise=True):
+    def __init__(self, layout, number_bots, game_time, noise=True,
+            distance_cache=None, move_budget=None, team_budget=None):
         self.universe = datamodel.create_CTFUniverse(layout, number_bots)
         self.number_bots = number_bots
         self.game_time = game_time
-        self.noiser = UniverseNoiser(self.universe) if noise else None
+        self.move_budget = move_budget
+        self.team_budget = team_budget
+        self.timings = MoveTimings(self.universe)
+        if noise:
+            self.noiser = UniverseNoiser(self.universe,
+                    distance_cache=distance_cache)
+        else:
+            self.noiser = None
         self.player_teams = []
         self.viewers = []
 
@@ -110,7 +131,39 @@ def play(self):
                 % (len(self.player_teams), len(self.universe.teams)))
         for gt in range(self.game_time):
             if not self.play_round(gt):
-                return
+                break
+
+        _logger.info("Move times:\n%s", self.timings.report(
+                [team.name for team in self.universe.teams]))
+
+    def _get_timed_move(self, bot, universe):
+        """ Asks the team of `bot` for its move and records the time.
+
+        Raises
+        ------
+        PlayerTimeout
+            if the move or all moves of the team took longer than
+            their budget
+        """
+        team_index = bot.team_index
+        if (self.team_budget is not None and
+                self.timings.team_wall_time[team_index] > self.team_budget):
+            # the team is not asked anymore
+            raise PlayerTimeout()
+
+        wall_start = time.time()
+        cpu_start = time.clock()
+        try:
+            move = self.player_teams[team_index]._get_move(bot.index, universe)
+        finally:
+            wall_time = time.time() - wall_start
+            self.timings.record(bot.index, wall_time, time.clock() - cpu_start)
+
+        if ((self.move_budget is not None and wall_time > self.move_budget) or
+            (self.team_budget is not None and
+             self.timings.team_wall_time[team_index] > self.team_budget)):
+            raise PlayerTimeout()
+        return move
 
     def play_round(self, current_game_time):
         """ Play only a single round.
@@ -124,12 +177,11 @@ def play_round(self, current_game_time):
 
         """
         for i, bot in enumerate(self.universe.bots):
-            player_team = self.player_teams[bot.team_index]
             try:
                 universe_copy = self.universe.copy()
                 if self.noiser:
                     universe_copy = self.noiser.uniform_noise(universe_copy, i)
-                move = player_team._get_move(bot.index, universe_copy)
+                move = self._get_timed_move(bot, universe_copy)
                 events = self.universe.move_bot(i, move)
             except (datamodel.IllegalMoveException, PlayerTimeout):
                 moves = self.universe.get_legal_moves(bot.current_pos).keys()
@@ -151,11 +203,98 @@ def play_round(self, current_game_time):
                 # team.score -= 1
 
             for v in self.viewers:
-                v.observe(current_game_time, i, self.universe.copy(), copy.deepcopy(events))
+                # the events themselves are never modified, so a new list
+                # is sufficient for each viewer
+                events_copy = TypeAwareList(events,
+                        base_class=datamodel.UniverseEvent)
+                v.observe(current_game_time, i, self.universe.copy(), events_copy)
             if datamodel.TeamWins in events:
                 return False
         return True
 
+class MoveTimings(object):
+    """ The wall-clock and CPU times of all moves of a game.
+
+    The CPU time is that of the process of the GameMaster. For a local
+    team, it includes the time its players have taken; for a remote team
+    only the time needed to exchange the messages.
+
+    Parameters
+    ----------
+    universe : CTFUniverse
+        the universe of the game
+
+    Attributes
+    ----------
+    wall_times : list of lists of float
+        the wall-clock time of every move, per bot
+    cpu_times : list of lists of float
+        the CPU time of every move, per bot
+    team_wall_time : list of float
+        the sum of the wall-clock times, per team
+
+    """
+    def __init__(self, universe):
+        self.bot_teams = [bot.team_index for bot in universe.bots]
+        self.wall_times = [[] for bot in universe.bots]
+        self.cpu_times = [[] for bot in universe.bots]
+        self.team_wall_time = [0.0] * len(universe.teams)
+
+    def record(self, bot_index, wall_time, cpu_time):
+        """ Adds the times of a move of bot `bot_index`. """
+        self.wall_times[bot_index].append(wall_time)
+        self.cpu_times[bot_index].append(cpu_time)
+        self.team_wall_time[self.bot_teams[bot_index]] += wall_time
+
+    def team_times(self, team_index, times=None):
+        """ The sorted times of all moves of the bots of a team.
+
+        Parameters
+        ----------
+        team_index : int
+            the index of the team
+        times : list of lists of float, optional
+            `wall_times` (default) or `cpu_times`
+        """
+        if times is None:
+            times = self.wall_times
+        return sorted(time_ for bot_index, team in enumerate(self.bot_teams)
+                      if team == team_index for time_ in times[bot_index])
+
+    def percentiles(self, team_index, percentiles=(50, 90, 99), times=None):
+        """ The percentiles of the move times of a team.
+
+        Uses the nearest-rank method, so each value is the time of
+        an actual move.
+
+        Returns
+        -------
+        values : list of float or None
+            the time for each of the percentiles, or None if the team
+            has not moved yet
+        """
+        team_times = self.team_times(team_index, times)
+        if not team_times:
+            return [None] * len(percentiles)
+        return [team_times[max(0, int(math.ceil(p / 100.0 * len(team_times))) - 1)]
+                for p in percentiles]
+
+    def report(self, team_names):
+        """ A table of the move times of all teams in milliseconds. """
+        lines = ["%-20s %6s %8s %8s %8s %8s %9s" %
+                 ("team", "moves", "p50", "p90", "p99", "max", "cpu total")]
+        for team_index, name in enumerate(team_names):
+            team_times = self.team_times(team_index)
+            if not team_times:
+                lines.append("%-20s %6i" % (name, 0))
+                continue
+            values = self.percentiles(team_index, (50, 90, 99, 100))
+            cpu_total = sum(self.team_times(team_index, self.cpu_times))
+            lines.append("%-20s %6i %8.2f %8.2f %8.2f %8.2f %9.2f" %
+                         tuple([name, len(team_times)] +
+                               [value * 1000 for value in values + [cpu_total]]))
+        return "\n".join(lines)
+
 class UniverseNoiser(object):
     """ Class to make bot positions noisy.
 
@@ -171,16 +310,24 @@ class UniverseNoiser(object):
         the radius for the uniform noise
     sight_distance : int, optional, default: 5
         the distance at which noise is no longer applied.
+    distance_cache : str, optional
+        directory in which the maze distances are cached,
+        see `DistanceMatrix.from_universe`
 
     Attributes
     ----------
     adjacency : AdjacencyList
         adjacency list representation of the Maze
+    distances : DistanceMatrix
+        the maze distances between all positions
 
     """
 
-    def __init__(self, universe, noise_radius=5, sight_distance=5):
-        self.adjacency = AdjacencyList(universe)
+    def __init__(self, universe, noise_radius=5, sight_distance=5,
+            distance_cache=None):
+        self.distances = DistanceMatrix.from_universe(universe,
+                cache_dir=distance_cache)
+        self.adjacency = self.distances.adjacency
         self.noise_radius = noise_radius
         self.sight_distance = sight_distance
 
@@ -212,11 +359,17 @@ def uniform_noise(self, universe, bot_index):
         for b in bots_to_noise:
             # Check that the distance between this bot and the enemy is larger
             # than `sight_distance`.
-            if len(self.adjacency.a_star(bot.current_pos, b.current_pos)) > self.sight_distance:
+            try:
+                distance = self.distances.distance(bot.current_pos, b.current_pos)
+            except NoPathException:
+                # an unreachable bot is always out of sight
+                distance = None
+            if distance is None or distance > self.sight_distance:
                 # If so then alter the position of the enemy
                 possible_positions = list(self.adjacency.pos_within(b.current_pos,
                     self.noise_radius))
                 b.current_pos = random.choice(possible_positions)
                 b.noisy = True
+        universe.reset_history()
         return universe
 
@@ -2,9 +2,13 @@
 
 """ Basic graph module """
 
+import os
+import hashlib
+import tempfile
+from array import array
 from collections import deque
 import heapq
-from pelita.datamodel import Maze, Free, manhattan_dist
+from pelita.datamodel import Free
 
 __docformat__ = "restructuredtext"
 
@@ -14,13 +18,227 @@ class NoPathException(Exception):
 class NoPositionException(Exception):
     pass
 
+class MazeGraph(object):
+    """ Compact graph representation of a Maze with integer node ids.
+
+    All positions are numbered from `0` to `N - 1`. The neighbours of all
+    nodes are stored as integer ids in a flat `array` together with an
+    array of offsets (compressed sparse row format), so that the neighbours
+    of node `i` are `neighbours[offsets[i]:offsets[i + 1]]`.
+
+    All searches work on node ids and avoid hashing position tuples. Use
+    `id_of()` and `positions` to convert between positions and ids.
+
+    Parameters
+    ----------
+    adjacency : mapping of positions to lists of positions
+        the reachable neighbours of every position; neighbours which
+        are not in the mapping themselves are left out
+
+    Attributes
+    ----------
+    positions : list of tuple of (int, int)
+        the position for every node id
+    offsets : array of 'i'
+        the offsets of the neighbours of every node
+    neighbours : array of 'i'
+        the neighbours of all nodes
+    expanded : int
+        the number of nodes expanded by the last call to `a_star()`
+
+    """
+    def __init__(self, adjacency):
+        self.positions = sorted(adjacency.keys())
+        self._ids = dict((pos, idx) for idx, pos in enumerate(self.positions))
+        self.offsets = array('i', [0])
+        self.neighbours = array('i')
+        for pos in self.positions:
+            # a position is never its own neighbour
+            self.neighbours.extend(self._ids[other] for other in adjacency[pos]
+                                   if other != pos and other in self._ids)
+            self.offsets.append(len(self.neighbours))
+        # the searches are faster with the neighbours as tuples
+        self._neighbours = [tuple(self.neighbours_of(node))
+                            for node in range(len(self))]
+        self.expanded = 0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def id_of(self, position):
+        """ The node id of a position.
+
+        Parameters
+        ----------
+        position : tuple of (int, int)
+            the position
+
+        Returns
+        -------
+        id : int
+            the node id
+
+        Raises
+        ------
+        NoPositionException
+            if the position does not exist
+
+        """
+        try:
+            return self._ids[position]
+        except (KeyError, TypeError):
+            raise NoPositionException("Position %s does not exist." %
+                    repr(position))
+
+    def neighbours_of(self, node):
+        """ The ids of the neighbours of a node. """
+        return self.neighbours[self.offsets[node]:self.offsets[node + 1]]
+
+    def _backtrack(self, parents, current):
+        """ Follows `parents` from `current` back to the start.
+
+        Returns the path without the start node, i.e. `current` is the
+        first element.
+        """
+        path = []
+        while parents[current] != -1:
+            path.append(current)
+            current = parents[current]
+        return path
+
+    def pos_within(self, node, distance):
+        """ Node ids within a certain distance (`<`) of `node`.
+
+        See `AdjacencyList.pos_within`.
+        """
+        nodes = set([node])
+        to_visit = [node]
+        for i in range(distance - 1):
+            local_to_visit = []
+            for current in to_visit:
+                for neighbour in self._neighbours[current]:
+                    if neighbour not in nodes:
+                        nodes.add(neighbour)
+                        local_to_visit.append(neighbour)
+            to_visit = local_to_visit
+        return nodes
+
+    def bfs(self, initial, targets):
+        """ Breadth first search from node `initial` to the closest node in
+        `targets`.
+
+        See `AdjacencyList.bfs`.
+        """
+        is_target = [False] * len(self)
+        for target in targets:
+            is_target[target] = True
+        neighbours = self._neighbours
+        # `parents` holds the node we came from for every node
+        # we have seen (and -1 otherwise)
+        parents = [-1] * len(self)
+        depths = [-1] * len(self)
+        depths[initial] = 0
+        to_visit = deque([initial])
+        while to_visit:
+            current = to_visit.popleft()
+            if is_target[current]:
+                return self._backtrack(parents, current)
+            depth = depths[current] + 1
+            for node in neighbours[current]:
+                if depths[node] == -1:
+                    depths[node] = depth
+                    parents[node] = current
+                    to_visit.append(node)
+                elif depths[node] == depth:
+                    # Of all shortest paths, we prefer the one via the
+                    # most recently visited node.
+                    parents[node] = current
+        raise NoPathException("BFS: No path from %r to %r."
+                % (self.positions[initial],
+                   [self.positions[target] for target in targets]))
+
+    def a_star(self, initial, target):
+        """ A* search from node `initial` to node `target`.
+
+        See `AdjacencyList.a_star`.
+        """
+        self.expanded = 0
+        positions = self.positions
+        neighbours = self._neighbours
+        target_x, target_y = positions[target]
+        def heuristic(node):
+            x, y = positions[node]
+            return abs(x - target_x) + abs(y - target_y)
+        # the heap holds tuples of (estimated total cost, estimated remaining
+        # cost, node), so ties are broken by the remaining cost
+        to_visit = [(heuristic(initial), heuristic(initial), initial)]
+        parents = [-1] * len(self)
+        # the cost of the cheapest known path to a node
+        costs = [-1] * len(self)
+        costs[initial] = 0
+        # the nodes which have already been expanded
+        closed = [False] * len(self)
+        while to_visit:
+            estimate, remaining, current = heapq.heappop(to_visit)
+            if current == target:
+                return self._backtrack(parents, current)
+            if closed[current]:
+                continue
+            closed[current] = True
+            self.expanded += 1
+            cost = costs[current] + 1
+            for node in neighbours[current]:
+                if closed[node] or (costs[node] != -1 and costs[node] <= cost):
+                    continue
+                costs[node] = cost
+                parents[node] = current
+                remaining = heuristic(node)
+                heapq.heappush(to_visit, (cost + remaining, remaining, node))
+        raise NoPathException("A*: No path from %r to %r."
+                % (positions[initial], positions[target]))
+
+    def distances_from(self, initial):
+        """ The maze distances from node `initial` to all nodes.
+
+        Parameters
+        ----------
+        initial : int
+            the start node
+
+        Returns
+        -------
+        distances : list of int
+            the distance to every node or -1 if it cannot be reached
+
+        """
+        neighbours = self._neighbours
+        distances = [-1] * len(self)
+        distances[initial] = 0
+        to_visit = deque([initial])
+        while to_visit:
+            current = to_visit.popleft()
+            next_dist = distances[current] + 1
+            for node in neighbours[current]:
+                if distances[node] == -1:
+                    distances[node] = next_dist
+                    to_visit.append(node)
+        return distances
+
 class AdjacencyList(dict):
     """ Adjacency list [1] representation of a Maze.
 
-    Implemented by inheriting from `dict`.
+    Implemented by inheriting from `dict`. The searches are delegated to
+    a `MazeGraph` which works on integer ids (`graph`). The graph is built
+    again after the dict has been changed. The lists of neighbours must not
+    be changed in place, though; assign a new list instead.
 
     [1] http://en.wikipedia.org/wiki/Adjacency_list
 
+    Attributes
+    ----------
+    graph : MazeGraph
+        the compact graph used for all searches
+
     """
     def __init__(self, universe):
         # Get the list of all free positions.
@@ -29,6 +247,50 @@ def __init__(self, universe):
         self.update(dict((pos, universe.get_legal_moves(pos).values())
                 for pos in free_pos))
 
+    @property
+    def graph(self):
+        # built on first use after every change
+        graph = self.__dict__.get("_graph")
+        if graph is None:
+            graph = self._graph = MazeGraph(self)
+        return graph
+
+    def _changed(self):
+        self._graph = None
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._changed()
+
+    def pop(self, *args):
+        self._changed()
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self._changed()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        self._changed()
+        return dict.setdefault(self, key, default)
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
+
+    @property
+    def expanded(self):
+        """ The number of nodes expanded by the last call to `a_star()`. """
+        return self.graph.expanded
+
     def pos_within(self, position, distance):
         """ Position within a certain distance.
 
@@ -55,19 +317,9 @@ def pos_within(self, position, distance):
             if either `initial` or `targets` does not exist
 
         """
-        if position not in self.keys():
-            raise NoPositionException("Position %s does not exist." %
-                    repr(position))
-        positions = set([position])
-        to_visit = [position]
-        for i in range(distance):
-            local_to_visit = []
-            for pos in to_visit:
-                if pos not in positions:
-                    positions.add(pos)
-                local_to_visit.extend(self[pos])
-            to_visit = local_to_visit
-        return positions
+        positions = self.graph.positions
+        return set(positions[node] for node in
+                   self.graph.pos_within(self.graph.id_of(position), distance))
 
     def bfs(self, initial, targets):
         """ Breadth first search (bfs).
@@ -98,89 +350,243 @@ def bfs(self, initial, targets):
         [1] http://en.wikipedia.org/wiki/Breadth-first_search
 
         """
-        # First check that the arguments were valid.
-        for pos in [initial] + targets:
-            if pos not in self.keys():
-                raise NoPositionException("Position %s does not exist." %
-                        repr(pos))
-        # Initialise `to_visit` of type `deque` with current position.
-        # We use a `deque` since we need to extend to the right
-        # but pop from the left, i.e. its a fifo queue.
-        to_visit = deque([initial])
-        # `seen` is a list of nodes we have seen already
-        # We append to right and later pop from right, so a list will do.
-        # Order is important for the back-track later on, so don't use a set.
-        seen = []
-        found = False
-        while to_visit:
-            current = to_visit.popleft()
-            if current in seen:
-                # This node has been seen, ignore it.
-                continue
-            elif current in targets:
-                # We found some food, break and back-track path.
-                found = True
-                break
-            else:
-                # Otherwise keep going, i.e. add adjacent nodes to seen list.
-                seen.append(current)
-                to_visit.extend(self[current])
-        # if we did not find any food, we simply return a path with only the
-        # current position
-        if not found:
-            raise NoPathException("BFS: No path from %r to %r."
-                    % (initial, targets))
-        # Now back-track using seen to determine how we got here.
-        # Initialise the path with current node, i.e. position of food.
-        path = [current]
-        while seen:
-            # Pop the latest node in seen
-            next_ = seen.pop()
-            # If that's adjacent to the current node
-            # it's in the path
-            if next_ in self[current]:
-                # So add it to the path
-                path.append(next_)
-                # And continue back-tracking from there
-                current = next_
-        # The last element is the current position, we don't need that in our
-        # path, so don't include it.
-        return path[:-1]
+        id_of = self.graph.id_of
+        path = self.graph.bfs(id_of(initial), [id_of(pos) for pos in targets])
+        positions = self.graph.positions
+        return [positions[node] for node in path]
 
     def a_star(self, initial, target):
-        """ A* search. """
-        to_visit = []
-        # seen needs to be list since we use it for backtracking
-        # a set would make the lookup faster, but not enable backtracking
-        seen = []
-        # since its A* we use a heap que
-        # this ensures we always get the next node with to lowest manhatten
-        # distance to the current node
-        heapq.heappush(to_visit, (0, (initial)))
-        while to_visit:
-            man_dist, current = heapq.heappop(to_visit)
-            if current in seen:
-                continue
-            elif current == target:
-                break
-            else:
-                seen.append(current)
-                for pos in self[current]:
-                    heapq.heappush(to_visit, (manhattan_dist(target, pos), (pos)))
-
-        # Now back-track using seen to determine how we got here.
-        # Initialise the path with current node, i.e. position of food.
-        path = [current]
-        while seen:
-            # Pop the latest node in seen
-            next_ = seen.pop()
-            # If that's adjacent to the current node
-            # it's in the path
-            if next_ in self[current]:
-                # So add it to the path
-                path.append(next_)
-                # And continue back-tracking from there
-                current = next_
-        # The last element is the current position, we don't need that in our
-        # path, so don't include it.
-        return path[:-1]
+        """ A* search.
+
+        A* search [1] from `initial` to `target`, using the Manhattan
+        distance as heuristic. Nodes with the same estimated path length
+        are expanded in order of their distance to the target, so that the
+        search follows a single path whenever possible.
+
+        The number of nodes expanded during the search is stored in the
+        attribute `expanded`.
+
+        Parameters
+        ----------
+        initial : tuple of (int, int)
+            the first position
+        target : tuple of (int, int)
+            the target position
+
+        Returns
+        -------
+        path : list of tuple of (int, int)
+            a shortest path from `initial` to `target`, starting
+            with `target` and without `initial`
+
+        Raises
+        ------
+        NoPathException
+            if there is no path from `initial` to `target`
+        NoPositionException
+            if either `initial` or `target` does not exist
+
+        [1] http://en.wikipedia.org/wiki/A*_search_algorithm
+
+        """
+        id_of = self.graph.id_of
+        path = self.graph.a_star(id_of(initial), id_of(target))
+        positions = self.graph.positions
+        return [positions[node] for node in path]
+
+def layout_hash(maze):
+    """ A hash which identifies the topology of a maze.
+
+    Two mazes with the same shape and the same free positions have the same
+    hash, regardless of the food or bots they contain.
+
+    Parameters
+    ----------
+    maze : Maze
+        the maze
+
+    Returns
+    -------
+    layout_hash : str
+        hexadecimal sha1 digest
+
+    """
+    key = "%r %r" % (maze.shape, maze.pos_of(Free))
+    return hashlib.sha1(key).hexdigest()
+
+class DistanceMatrix(object):
+    """ Maze distances between all pairs of positions in an AdjacencyList.
+
+    The distances are computed once with a breadth first search from every
+    position and stored in a flat `array` of unsigned shorts. Afterwards,
+    the distance between two positions can be looked up in O(1).
+
+    Parameters
+    ----------
+    adjacency : AdjacencyList
+        the adjacency list of the maze
+    distances : array of 'H', optional
+        precomputed distances (e.g. as loaded from a file), for internal use
+
+    Attributes
+    ----------
+    adjacency : AdjacencyList
+        the adjacency list of the maze
+    graph : MazeGraph
+        the graph of the maze, which defines the node ids
+
+    """
+
+    #: value used in the array for positions without a path between them
+    UNREACHABLE = 0xFFFF
+
+    def __init__(self, adjacency, distances=None):
+        self.adjacency = adjacency
+        self.graph = adjacency.graph
+        if distances is None:
+            distances = self._compute()
+        elif len(distances) != len(self.graph) ** 2:
+            raise ValueError("Distances have wrong length: %i, expected: %i"
+                    % (len(distances), len(self.graph) ** 2))
+        self._distances = distances
+
+    def _compute(self):
+        """ Breadth first search from every position. """
+        distances = array('H')
+        for source in range(len(self.graph)):
+            distances.extend(self.UNREACHABLE if dist == -1 else dist
+                             for dist in self.graph.distances_from(source))
+        return distances
+
+    @classmethod
+    def from_universe(cls, universe, cache_dir=None):
+        """ Creates the DistanceMatrix for the maze of a universe.
+
+        If `cache_dir` is given, the distances are loaded from a file in
+        this directory which is named after the `layout_hash` of the maze.
+        If there is no such file or it cannot be read, the distances are
+        computed and saved there.
+
+        Parameters
+        ----------
+        universe : CTFUniverse
+            the universe
+        cache_dir : str, optional
+            directory for cached distance files
+
+        Returns
+        -------
+        distance_matrix : DistanceMatrix
+
+        """
+        adjacency = AdjacencyList(universe)
+        if cache_dir is None:
+            return cls(adjacency)
+
+        filename = os.path.join(cache_dir,
+                                "%s.dist" % layout_hash(universe.maze))
+        try:
+            return cls.load(adjacency, filename)
+        except (IOError, EOFError, ValueError):
+            distance_matrix = cls(adjacency)
+            try:
+                os.makedirs(cache_dir)
+            except OSError:
+                # another process may have created it in the meantime
+                if not os.path.isdir(cache_dir):
+                    raise
+            distance_matrix.save(filename)
+            return distance_matrix
+
+    def save(self, filename):
+        """ Saves the distances to a file.
+
+        The distances are written to a temporary file first, which then
+        replaces `filename`. This way, other processes never read a file
+        which is only partly written.
+
+        Parameters
+        ----------
+        filename : str
+            the file to write
+
+        """
+        file = tempfile.NamedTemporaryFile(dir=os.path.dirname(filename) or ".",
+                                           delete=False)
+        try:
+            with file:
+                file.write(self._distances.tostring())
+            os.rename(file.name, filename)
+        except (IOError, OSError):
+            os.remove(file.name)
+            raise
+
+    @classmethod
+    def load(cls, adjacency, filename):
+        """ Loads the distances for `adjacency` from a file.
+
+        Parameters
+        ----------
+        adjacency : AdjacencyList
+            the adjacency list the file has been created for
+        filename : str
+            the file to read
+
+        Returns
+        -------
+        distance_matrix : DistanceMatrix
+
+        Raises
+        ------
+        IOError
+            if the file cannot be read
+        EOFError
+            if the file is too short
+        ValueError
+            if the file is too long
+
+        """
+        size = len(adjacency) ** 2
+        distances = array('H')
+        with open(filename, "rb") as file:
+            distances.fromfile(file, size)
+            if file.read(1):
+                raise ValueError("File %s is too long." % filename)
+        return cls(adjacency, distances)
+
+    def distance(self, pos1, pos2):
+        """ The length of the shortest path between two positions.
+
+        Parameters
+        ----------
+        pos1 : tuple of (int, int)
+            the first position
+        pos2 : tuple of (int, int)
+            the second position
+
+        Returns
+        -------
+        distance : int
+            the maze distance
+
+        Raises
+        ------
+        NoPathException
+            if there is no path between the positions
+        NoPositionException
+            if either position does not exist
+
+        """
+        return self.distance_ids(self.graph.id_of(pos1),
+                                 self.graph.id_of(pos2))
+
+    def distance_ids(self, node1, node2):
+        """ The length of the shortest path between two node ids.
+
+        See `distance()`.
+        """
+        dist = self._distances[node1 * len(self.graph) + node2]
+        if dist == self.UNREACHABLE:
+            raise NoPathException("No path from %r to %r." %
+                    (self.graph.positions[node1], self.graph.positions[node2]))
+        return dist
@@ -13,12 +13,23 @@ class LayoutEncodingException(Exception):
     """ Signifies a problem with the encoding of a layout. """
     pass
 
+def bundled_layouts():
+    """ All layouts which are shipped with pelita.
+
+    Returns
+    -------
+    layouts : list of (name, layout) pairs
+        the decoded layouts, sorted by name
+    """
+    names = sorted(name for name in dir(layouts) if name.startswith('layout_'))
+    return [(name[len('layout_'):],
+             getattr(layouts, name).decode('base64').decode('zlib'))
+            for name in names]
+
 def get_random_layout():
-    # loop in layouts dictionary and look for layout strings
-    layouts_str = [item for item in dir(layouts) if item.startswith('layout_')]
-    layout = random.choice(layouts_str)
-    # decode and return this layout
-    return layouts.__dict__[layout].decode('base64').decode('zlib')
+    # pick one of the bundled layouts
+    name, layout = random.choice(bundled_layouts())
+    return layout
 
 
 class Layout(object):
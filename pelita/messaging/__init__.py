@@ -127,6 +127,26 @@ def hello(self, what):
 
     remote.stop()
 
+Actors on an event loop
+-----------------------
+
+Each actor above runs on a thread of its own. When many actors are needed
+(e.g. for many simultaneous games), they may instead share the thread of an
+`IOLoop`, on which they handle their messages one after the other::
+
+    loop = IOLoop()
+    loop.start()
+    my_actors = [actor_of(MyOtherActor, loop=loop) for i in range(1000)]
+
+The actors are used in the same way as before, but they must never block
+the loop, e.g. by waiting for a reply with `res.get()`. Instead, a callback
+is registered with `res.on_result(callback)`.
+
+A `SelectorRemoteConnection` can be given the same loop, so that the actors
+and all their remote connections run on a single thread::
+
+    remote = SelectorRemoteConnection(loop).start_listener("localhost", 50007)
+
 Acknowledgements
 ----------------
 
@@ -142,6 +162,7 @@ def hello(self, what):
 
 from pelita.messaging.messages import Query, Notification, Response, Error, BaseMessage
 from pelita.messaging.actor import Actor, BaseActorReference, ActorReference, DispatchingActor, expose, DeadConnection, StopProcessing, Request, actor_of, actor_registry, Exit, ActorNotRunning
-from pelita.messaging.remote_actor import RemoteActorReference, RemoteConnection
+from pelita.messaging.remote_actor import RemoteActorReference, RemoteConnection, SelectorRemoteConnection
+from pelita.messaging.remote.ioloop import IOLoop
 
 
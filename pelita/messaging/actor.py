@@ -7,14 +7,14 @@
 
 import Queue
 import logging
+import traceback
 import uuid
 import inspect
-from threading import Lock
+from threading import Lock, Event
 
 from pelita.utils import SuspendableThread, CloseThread
 
 _logger = logging.getLogger("pelita.actor")
-_logger.setLevel(logging.DEBUG)
 
 __docformat__ = "restructuredtext"
 
@@ -47,12 +47,40 @@ class Request(Channel):
     def __init__(self):
         self._queue = Queue.Queue(maxsize=1)
 
+        self._callbacks = []
+        self._callbacks_lock = Lock()
+        self._has_result = False
+        self._result = None
+
     def put(self, message, channel=None, remote=None):
         """ Sets the result of the Request to `message`.
 
         The other arguments will be discarded.
         """
+        with self._callbacks_lock:
+            self._has_result = True
+            self._result = message
+            callbacks, self._callbacks = self._callbacks, []
         self._queue.put(message)
+        for callback in callbacks:
+            callback(message)
+
+    def on_result(self, callback):
+        """ Calls `callback(result)` as soon as the result is available.
+
+        Other than `get`, this never blocks. Actors which run on an
+        event loop must use it to wait for a reply, as blocking would
+        also block all other actors on the loop.
+
+        The callback is called on the thread which replies or right away,
+        if the result is already there.
+        """
+        with self._callbacks_lock:
+            if not self._has_result:
+                self._callbacks.append(callback)
+                return
+            result = self._result
+        callback(result)
 
     def get(self, timeout=3):
         """ Returns the result of the Request (if it is there).
@@ -103,13 +131,41 @@ def __init__(self, sender, reason):
         self.sender = sender
         self.reason = reason
 
+class _LoopTask(object):
+    """ Stands in for the thread of an actor which runs on an event loop.
+    """
+    def __init__(self, name):
+        self.name = name
+        # the actor does not own a thread, so this has no effect
+        self.daemon = False
+        self._started = False
+        self._finished = Event()
+
+    def start(self):
+        self._started = True
+
+    def finish(self):
+        self._finished.set()
+
+    def is_alive(self):
+        return self._started and not self._finished.is_set()
+
+    def join(self, timeout=None):
+        if self._started:
+            self._finished.wait(timeout)
+
 class BaseActor(SuspendableThread):
     """ BaseActor is an actor with no pre-defined queue.
+
+    By default, every actor runs on its own thread. After `run_on(loop)`,
+    it instead handles its messages as callbacks on the given event loop,
+    which may be shared by any number of actors.
     """
     def __init__(self, **kwargs):
         super(BaseActor, self).__init__(**kwargs)
 
         self._ref = None
+        self._loop = None
 
         self._trap_exit = False
         self._linked_actors = []
@@ -190,12 +246,42 @@ def on_stop(self):
         """
         pass
 
+    def run_on(self, loop):
+        """ Lets the actor handle its messages on `loop` instead of
+        starting its own thread. Must be called before `start()`.
+
+        Parameters
+        ----------
+        loop : IOLoop
+            the event loop; only `call_soon()` is used
+        """
+        if self._running:
+            raise RuntimeError("Actor %r is already running." % self)
+        self._loop = loop
+        self._thread = _LoopTask(self._thread.name)
+
+    def _run_on_loop(self):
+        """ Processes the next message. Called on the thread of the loop.
+        """
+        if not self._running:
+            return
+        try:
+            self._run()
+        except CloseThread:
+            self.stop()
+        except Exception as e:
+            _logger.error("Unhandled exception %r in actor %r. Stopping.", e, self)
+            traceback.print_exc()
+            self.stop()
+
     def start(self):
         self.on_start()
         super(BaseActor, self).start()
 
     def stop(self):
         super(BaseActor, self).stop()
+        if self._loop:
+            self._thread.finish()
         self.on_stop()
 
     def handle_inbox(self):
@@ -208,10 +294,17 @@ def __init__(self, inbox=None, **kwargs):
 
         super(Actor, self).__init__(**kwargs)
 
+    def stop(self):
+        super(Actor, self).stop()
+        # wake up the thread, if it waits for a message
+        self._inbox.put({"message": StopProcessing})
+
     def handle_inbox(self):
         """ Reads the next item from the Queue or raises Queue.Empty
         """
-        msg = self._inbox.get(True, 3)
+        # on an event loop, there is a callback for every message,
+        # so we must never wait
+        msg = self._inbox.get(self._loop is None, 3)
         return (msg.get("message"),
                 msg.get("channel"),
                 msg.get("priority", 0),
@@ -225,6 +318,8 @@ def put(self, message, channel=None, remote=None):
             "priority": 0
         }
         self._inbox.put(msg)
+        if self._loop:
+            self._loop.call_soon(self._run_on_loop)
 
 class BaseActorReference(Channel):
     """ An `ActorReference` is used to send all requests and notifications
@@ -295,7 +390,7 @@ def put(self, message, channel=None, remote=None):
         """
         if not self.is_running:
             raise ActorNotRunning("Actor '%r' not running." % self._actor)
-        _logger.debug("Putting '%r' into '%r' (channel: %r)" % (message, self._actor, channel))
+        _logger.debug("Putting '%r' into '%r' (channel: %r)", message, self._actor, channel)
         self._actor.put(message, channel, remote)
 
     def link(self, other):
@@ -503,8 +598,22 @@ def on_unhandled(self, message):
         self.__reply_error("Not found: method '%r'" % message.get("method"))
 
 
-def actor_of(actor, name=None):
-    return actor_registry.register(actor, name)
+def actor_of(actor, name=None, loop=None):
+    """ Creates and registers an actor and returns its `ActorReference`.
+
+    Parameters
+    ----------
+    actor : class or Actor
+        the actor or its class
+    name : string, optional
+        a name under which the actor can be found in the registry
+    loop : IOLoop, optional
+        if given, the actor runs on this event loop instead of its own thread
+    """
+    ref = actor_registry.register(actor, name)
+    if loop is not None:
+        ref._actor.run_on(loop)
+    return ref
 
 def _check_actor_correctness(actor):
     methods = ["ref", "put", "_running", "_thread", "_trap_exit", "_linked_actors"]
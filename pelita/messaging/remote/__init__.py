@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
-from pelita.messaging.remote.jsonconnection import JsonSocketConnection, MessageSocketConnection
+from pelita.messaging.remote.jsonconnection import JsonSocketConnection, MessageSocketConnection, BufferedJsonSocketConnection
 from pelita.messaging.remote.tcpsocket import TcpSocket, TcpConnectingClient
 from pelita.messaging.remote.listener import TcpListeningSocket, TcpThreadedListeningServer
+from pelita.messaging.remote.ioloop import IOLoop
 __docformat__ = "restructuredtext"
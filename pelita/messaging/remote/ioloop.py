@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+""" A single-threaded event loop for non-blocking sockets. """
+
+import collections
+import errno
+import logging
+import select
+import socket
+import threading
+
+from pelita.utils.threading_helpers import _newname
+
+_logger = logging.getLogger("pelita.ioloop")
+
+__docformat__ = "restructuredtext"
+
+
+READ = 1
+WRITE = 2
+
+
+class _EpollPoller(object):
+    """ Polls with `select.epoll` (Linux). """
+    def __init__(self):
+        self._epoll = select.epoll()
+
+    def _mask(self, events):
+        mask = select.EPOLLERR | select.EPOLLHUP
+        if events & READ:
+            mask |= select.EPOLLIN
+        if events & WRITE:
+            mask |= select.EPOLLOUT
+        return mask
+
+    def register(self, fd, events):
+        self._epoll.register(fd, self._mask(events))
+
+    def modify(self, fd, events):
+        self._epoll.modify(fd, self._mask(events))
+
+    def unregister(self, fd):
+        self._epoll.unregister(fd)
+
+    def poll(self, timeout):
+        result = []
+        for fd, mask in self._epoll.poll(timeout):
+            events = 0
+            if mask & (select.EPOLLIN | select.EPOLLERR | select.EPOLLHUP):
+                events |= READ
+            if mask & select.EPOLLOUT:
+                events |= WRITE
+            result.append((fd, events))
+        return result
+
+    def close(self):
+        self._epoll.close()
+
+
+class _SelectPoller(object):
+    """ Polls with `select.select`, which is available everywhere. """
+    def __init__(self):
+        self._fds = {}
+
+    def register(self, fd, events):
+        self._fds[fd] = events
+
+    modify = register
+
+    def unregister(self, fd):
+        del self._fds[fd]
+
+    def poll(self, timeout):
+        readers = [fd for fd, events in self._fds.iteritems() if events & READ]
+        writers = [fd for fd, events in self._fds.iteritems() if events & WRITE]
+        readable, writable, _ = select.select(readers, writers, [], timeout)
+        result = dict((fd, READ) for fd in readable)
+        for fd in writable:
+            result[fd] = result.get(fd, 0) | WRITE
+        return result.items()
+
+    def close(self):
+        self._fds.clear()
+
+
+class IOLoop(object):
+    """ Runs the handlers of many non-blocking sockets on a single thread.
+
+    A handler must provide the following methods:
+
+    `fileno()`
+        the file descriptor to watch
+    `wants_write()`
+        True, if the handler has data which waits to be written
+    `handle_read()`, `handle_write()`
+        called when the socket is ready for reading or writing
+    `handle_close()`
+        called when the handler is removed from the loop
+
+    All handler methods are called on the thread of the loop. Other threads
+    interact with the handlers by scheduling functions with `call_soon()`.
+
+    Parameters
+    ----------
+    timeout : float, optional
+        the maximum time in seconds to block in a single poll
+    """
+    def __init__(self, timeout=1.0):
+        self.timeout = timeout
+        if hasattr(select, "epoll"):
+            self._poller = _EpollPoller()
+        else:
+            self._poller = _SelectPoller()
+        self._handlers = {}
+        self._events = {}
+
+        self._callbacks = collections.deque()
+        self._callbacks_lock = threading.Lock()
+
+        # writing to this socket pair wakes up the poll
+        self._waker, self._wakee = socket.socketpair()
+        self._waker.setblocking(0)
+        self._wakee.setblocking(0)
+        self._poller.register(self._wakee.fileno(), READ)
+
+        self._running = False
+        self._thread = threading.Thread(target=self.run,
+                                        name=_newname(self.__class__))
+
+    @property
+    def thread(self):
+        return self._thread
+
+    def start(self):
+        _logger.debug("Starting IOLoop %r", self)
+        self._running = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stops the loop and removes all handlers. """
+        _logger.debug("Stopping IOLoop %r", self)
+        self._running = False
+        self._wake()
+
+    def call_soon(self, callback, *args):
+        """ Schedules `callback(*args)` to be called on the thread of the loop.
+
+        This method may be called from any thread.
+        """
+        with self._callbacks_lock:
+            self._callbacks.append((callback, args))
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._waker.send("x")
+        except socket.error:
+            # the buffer is full, so the loop is going to wake up anyway
+            pass
+
+    def add_handler(self, handler):
+        """ Starts watching `handler`. Must be called on the loop thread
+        or before the loop is started.
+        """
+        fd = handler.fileno()
+        self._handlers[fd] = handler
+        self._events[fd] = self._events_of(handler)
+        self._poller.register(fd, self._events[fd])
+
+    def update_handler(self, handler):
+        """ Adapts the watched events after the handler has changed
+        its `wants_write()` state.
+        """
+        fd = handler.fileno()
+        if self._handlers.get(fd) is not handler:
+            return
+        events = self._events_of(handler)
+        if events != self._events[fd]:
+            self._events[fd] = events
+            self._poller.modify(fd, events)
+
+    def remove_handler(self, handler):
+        """ Stops watching `handler` and calls its `handle_close()`. """
+        for fd, registered in self._handlers.items():
+            if registered is handler:
+                del self._handlers[fd]
+                del self._events[fd]
+                self._poller.unregister(fd)
+                break
+        else:
+            return
+        try:
+            handler.handle_close()
+        except Exception as e:
+            _logger.exception(e)
+
+    def _events_of(self, handler):
+        if handler.wants_write():
+            return READ | WRITE
+        return READ
+
+    def run(self):
+        try:
+            while self._running:
+                try:
+                    ready = self._poller.poll(self.timeout)
+                except (select.error, IOError, OSError) as e:
+                    if e.args[0] == errno.EINTR:
+                        continue
+                    raise
+
+                for fd, events in ready:
+                    if fd == self._wakee.fileno():
+                        self._drain_waker()
+                        continue
+                    handler = self._handlers.get(fd)
+                    if handler is None:
+                        continue
+                    try:
+                        if events & READ:
+                            handler.handle_read()
+                        if events & WRITE and self._handlers.get(fd) is handler:
+                            handler.handle_write()
+                        self.update_handler(handler)
+                    except Exception as e:
+                        _logger.exception(e)
+                        self.remove_handler(handler)
+
+                self._run_callbacks()
+        finally:
+            for handler in self._handlers.values():
+                self.remove_handler(handler)
+            self._poller.close()
+            self._waker.close()
+            self._wakee.close()
+            _logger.debug("Ended IOLoop %r", self)
+
+    def _drain_waker(self):
+        try:
+            while self._wakee.recv(4096):
+                pass
+        except socket.error:
+            pass
+
+    def _run_callbacks(self):
+        with self._callbacks_lock:
+            callbacks = self._callbacks
+            self._callbacks = collections.deque()
+        for callback, args in callbacks:
+            try:
+                callback(*args)
+            except Exception as e:
+                _logger.exception(e)
+
+    def __repr__(self):
+        return "IOLoop(%i handlers)" % len(self._handlers)
@@ -3,16 +3,40 @@
 import socket
 import errno
 import logging
+import struct
+import threading
+import collections
 
 from pelita.messaging import Error, DeadConnection, BaseMessage
 from pelita.messaging.json_convert import json_converter
 
 _logger = logging.getLogger("pelita.jsonSocket")
-_logger.setLevel(logging.INFO)
 
 __docformat__ = "restructuredtext"
 
 
+#: frames are terminated with the `terminator` character
+FRAMING_EOT = "eot"
+#: frames are prefixed with their length as a 4 byte unsigned big-endian int
+FRAMING_LENGTH = "length"
+
+# the control messages for the negotiation of the framing;
+# they are always sent with EOT framing
+_FRAMING_KEY = "__framing__"
+_FRAMING_PREFIX = '{"%s"' % _FRAMING_KEY
+_FRAMING_OFFER = '{"%s": "offer", "modes": ["%s"]}' % (_FRAMING_KEY, FRAMING_LENGTH)
+_FRAMING_ACCEPT = '{"%s": "accept", "mode": "%s"}' % (_FRAMING_KEY, FRAMING_LENGTH)
+_FRAMING_SWITCH = '{"%s": "switch", "mode": "%s"}' % (_FRAMING_KEY, FRAMING_LENGTH)
+
+_length_prefix = struct.Struct("!I")
+
+# returned by `_pop_message()` for the messages of the framing negotiation
+_NO_MESSAGE = object()
+
+# errors of non-blocking sockets which only mean 'try again later'
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+
 class JsonSocketConnection(object):
     """ Implements JSON communication over a socket.
 
@@ -24,8 +48,31 @@ class JsonSocketConnection(object):
 
     By default, this character is EOT (= End of transmission, \x04),
     which of course must never occur in a JSON string.
+
+    Alternatively, each JSON string may be prefixed with its length
+    (`FRAMING_LENGTH`), which spares the receiver from scanning for the
+    terminator. As older peers only understand EOT framing, the length
+    framing is negotiated on the connection itself: one side calls
+    `offer_framing()`, and only if the peer accepts, both directions
+    switch to the length framing. A peer which does not know about the
+    negotiation simply drops the offer and the connection stays with
+    the EOT framing.
+
+    Parameters
+    ----------
+    socket : socket
+        the connected socket
+    framing : FRAMING_EOT or FRAMING_LENGTH, optional
+        the initial framing of both directions. Only use FRAMING_LENGTH
+        here, if the peer is known to do the same.
     """
-    def __init__(self, socket):
+    #: the initial and the maximum number of bytes received at once
+    min_read_size = 4096
+    max_read_size = 256 * 1024
+
+    def __init__(self, socket, framing=FRAMING_EOT):
+        if framing not in (FRAMING_EOT, FRAMING_LENGTH):
+            raise ValueError("Unknown framing %r." % framing)
         self.socket = socket
 
         # Set a timeout so that it is possible to interact with the socket
@@ -35,13 +82,24 @@ def __init__(self, socket):
         # also, it must be a one-byte character for easier parsing
         self._terminator = "\x04" # End of transmission
 
+        self.send_framing = framing
+        self.recv_framing = framing
+        # sending may happen from a different thread than reading,
+        # which answers the framing negotiation
+        self._send_lock = threading.Lock()
+
         # the buffer is used for complete JSON strings
         # which have not yet been popped by `read()`
-        self.buffer = []
+        self.buffer = collections.deque()
 
-        # the incoming string is used for the last incomplete JSON string
-        # which still waits for completion
-        self.incoming = ""
+        # the incoming data which has not yet been split into frames
+        self.incoming = bytearray()
+        # the position up to which `incoming` has been searched for the
+        # terminator
+        self._scanned = 0
+
+        self._read_size = self.min_read_size
+        self._chunk = bytearray(self._read_size)
 
     @property
     def terminator(self):
@@ -58,39 +116,83 @@ def terminator(self, value):
             raise ValueError("Terminator length must be 1.")
         self._terminator = value
 
+    def offer_framing(self):
+        """ Offers the peer to switch to the length framing.
+
+        The framing is switched later, when the answer has been
+        received by `read()`.
+        """
+        with self._send_lock:
+            self._send_eot(_FRAMING_OFFER)
+
     def send(self, obj):
         """ Converts `obj` to a json string and sends it.
         """
+        self.send_many([obj])
+
+    def send_many(self, objs):
+        """ Converts all objects in `objs` to json strings and sends
+        them with a single write.
+        """
         if self.socket:
-            json_string = json_converter.dumps(obj)
-            self._send(json_string)
+            self._send(*[json_converter.dumps(obj) for obj in objs])
         else:
             raise RuntimeError("Cannot send without a connection.")
 
-    def _send(self, json_string):
-        """ Takes a json_string, appends the termination character
-        and sends it.
+    def _send(self, *json_strings):
+        """ Takes json strings, frames them and sends them at once.
+        """
+        with self._send_lock:
+            # all frames are joined with a single copy
+            parts = []
+            for json_string in json_strings:
+                if isinstance(json_string, unicode):
+                    json_string = json_string.encode("utf-8")
+                if self.send_framing == FRAMING_LENGTH:
+                    parts.append(_length_prefix.pack(len(json_string)))
+                    parts.append(json_string)
+                else:
+                    if self.terminator in json_string:
+                        raise ValueError("JSON contains invalid termination character.")
+                    parts.append(json_string)
+                    parts.append(self.terminator)
+            self._send_raw("".join(parts))
+
+    def _send_eot(self, json_string):
+        """ Appends the termination character to json_string and sends it.
         """
         if self.terminator in json_string:
             raise ValueError("JSON contains invalid termination character.")
+        self._send_raw(json_string + self.terminator)
 
-        data = json_string + self.terminator
-
-        sent_bytes = 0
-        while sent_bytes < len(data):
-            _logger.info("Sending raw data %r", data[sent_bytes:])
-            sent_bytes += self.socket.send(data[sent_bytes:])
+    def _send_raw(self, data):
+        _logger.debug("Sending raw data %r", data)
+        self.socket.sendall(data)
 
     def read(self):
         """ This method waits until new data is available at the connection
         or in the buffer and returns it to the caller.
         """
-        # collect data until there is an object in buffer
-        while not self.buffer:
-            self._read()
+        while True:
+            # collect data until there is an object in buffer
+            while not self.buffer:
+                self._read()
+
+            message = self._pop_message()
+            if message is not _NO_MESSAGE:
+                return message
+
+    def _pop_message(self):
+        """ Decodes the first element of the buffer.
+
+        Messages of the framing negotiation are processed directly,
+        in which case `_NO_MESSAGE` is returned.
+        """
+        data = self.buffer.popleft()
+        if data.startswith(_FRAMING_PREFIX):
+            self._handle_framing(data)
+            return _NO_MESSAGE
 
-        # get the first element
-        data = self.buffer.pop(0)
         try:
             json_data = json_converter.loads(data)
             _logger.debug("Data read %r", json_data)
@@ -100,6 +202,33 @@ def read(self):
 
         return json_data
 
+    def _handle_framing(self, data):
+        """ Processes a message of the framing negotiation.
+
+        The offering side receives the acceptance: all following incoming
+        frames are length framed, and after confirming the switch, so
+        are the outgoing ones. The accepting side switches its outgoing
+        frames right after the acceptance and the incoming ones after
+        the confirmation.
+        """
+        message = json_converter.loads(data)
+        kind = message.get(_FRAMING_KEY)
+        _logger.debug("Received framing message %r", message)
+        with self._send_lock:
+            if kind == "offer" and FRAMING_LENGTH in message.get("modes", []):
+                self._send_eot(_FRAMING_ACCEPT)
+                self.send_framing = FRAMING_LENGTH
+            elif kind == "accept":
+                self.recv_framing = FRAMING_LENGTH
+                self._send_eot(_FRAMING_SWITCH)
+                self.send_framing = FRAMING_LENGTH
+            elif kind == "switch":
+                self.recv_framing = FRAMING_LENGTH
+            else:
+                _logger.warning("Ignoring unknown framing message %r", message)
+        # the data behind this message may use the new framing
+        self._split_frames()
+
     def _read(self):
         """ Waits until the next chunk of data can be received
         and processes it.
@@ -111,8 +240,8 @@ def _read(self):
         This is why we are collecting it in our buffers.
         """
         try:
-            data = self.socket.recv(4096)
-            _logger.debug("Got raw data %r", data)
+            received = self.socket.recv_into(self._chunk, self._read_size)
+            _logger.debug("Got %i bytes of raw data", received)
         except socket.timeout:
             _logger.debug("Socket timed out, repeating.")
             return
@@ -129,39 +258,70 @@ def _read(self):
             time.sleep(1)
             return
 
-        if not data:
+        self._received(received)
+
+    def _received(self, received):
+        """ Processes `received` bytes which have been read into the chunk.
+        """
+        if not received:
             # recv returns "", if the connection has been closed
             # this connection seems to be dead
             raise DeadConnection()
 
-        split_data = data.split(self.terminator)
-        # we split the data to get the following:
-        # [contd*, full*, incomplete]
-
-        # the last part is always incomplete or empty
-        incomplete = split_data[-1]
-        complete = split_data[:-1]
-
-        if complete:
-            # the first element of complete is the continued
-            # incoming object of the last _read
-            contd = complete.pop(0)
-            self.incoming += contd
-            self.buffer.append(self.incoming)
-            self.incoming = ""
-
-        if complete:
-            # if there is still something left in complete,
-            # move everything to the buffer
-            self.buffer += complete
-            # we throw away complete to make clear we have
-            # collected all data
-            complete = []
-
-        # append the incomplete data to the incoming string
-        self.incoming += incomplete
+        self.incoming += memoryview(self._chunk)[:received]
+
+        # adapt the size of the next read to the amount of incoming data
+        if received == self._read_size and self._read_size < self.max_read_size:
+            self._read_size = min(2 * self._read_size, self.max_read_size)
+            self._chunk = bytearray(self._read_size)
+
+        self._split_frames()
+
+    def _split_frames(self):
+        """ Moves all complete frames from `incoming` to `buffer`.
+
+        A framing message ends the splitting, because the following
+        frames may use a different framing.
+        """
+        incoming = self.incoming
+        start = 0
+        if self.recv_framing == FRAMING_LENGTH:
+            prefix_size = _length_prefix.size
+            while len(incoming) - start >= prefix_size:
+                length, = _length_prefix.unpack_from(incoming, start)
+                end = start + prefix_size + length
+                if end > len(incoming):
+                    # make sure that the rest of the frame is read at once
+                    self._read_size = max(self._read_size,
+                            min(end - len(incoming), self.max_read_size))
+                    if len(self._chunk) < self._read_size:
+                        self._chunk = bytearray(self._read_size)
+                    break
+                self.buffer.append(str(incoming[start + prefix_size:end]))
+                start = end
+            self._scanned = 0
+        else:
+            while True:
+                end = incoming.find(self.terminator, self._scanned)
+                if end < 0:
+                    self._scanned = len(incoming)
+                    break
+                frame = str(incoming[start:end])
+                self.buffer.append(frame)
+                start = self._scanned = end + 1
+                if frame.startswith(_FRAMING_PREFIX):
+                    break
+            self._scanned -= start
+        if start:
+            del incoming[:start]
 
     def close(self):
+        try:
+            # unlike close(), this wakes up a thread which waits in recv
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            # not connected (anymore)
+            pass
         self.socket.close()
 
     def __repr__(self):
@@ -175,6 +335,83 @@ def __repr__(self):
         return "JsonSocketConnection(%s)" % connection
 
 
+class BufferedJsonSocketConnection(JsonSocketConnection):
+    """ A `JsonSocketConnection` for non-blocking sockets.
+
+    Nothing in this class waits for the socket. Outgoing data is collected
+    in a write buffer, which `flush()` writes when the socket is writable,
+    and `receive()` returns only the messages which have already arrived.
+    This makes it possible to drive many connections from a single
+    `IOLoop`.
+    """
+    def __init__(self, socket, framing=FRAMING_EOT):
+        super(BufferedJsonSocketConnection, self).__init__(socket, framing)
+        self.socket.setblocking(0)
+        self.outgoing = bytearray()
+
+    def _send_raw(self, data):
+        # the data is written by `flush()`, when the socket is writable;
+        # until then, further messages are appended and sent together
+        self.outgoing += data
+
+    def flush(self):
+        """ Writes as much of the write buffer as the socket accepts.
+
+        Raises
+        ------
+        DeadConnection
+            if the connection has been closed
+        """
+        sent = 0
+        # slices of the view do not copy the buffer
+        view = memoryview(self.outgoing)
+        try:
+            while sent < len(view):
+                try:
+                    sent += self.socket.send(view[sent:])
+                except socket.error as e:
+                    if e.args[0] in _WOULD_BLOCK:
+                        return
+                    _logger.info("Connection is dead: %r", e)
+                    raise DeadConnection()
+        finally:
+            # the buffer cannot be resized while it is viewed
+            del view
+            del self.outgoing[:sent]
+
+    def receive(self):
+        """ Reads the available data and returns all complete messages.
+
+        Returns
+        -------
+        messages : list
+            the decoded messages; data which cannot be decoded is dropped
+
+        Raises
+        ------
+        DeadConnection
+            if the connection has been closed
+        """
+        try:
+            received = self.socket.recv_into(self._chunk, self._read_size)
+        except socket.error as e:
+            if e.args[0] not in _WOULD_BLOCK:
+                _logger.info("Connection is dead: %r", e)
+                raise DeadConnection()
+        else:
+            self._received(received)
+
+        messages = []
+        while self.buffer:
+            try:
+                message = self._pop_message()
+            except ValueError:
+                continue
+            if message is not _NO_MESSAGE:
+                messages.append(message)
+        return messages
+
+
 class MessageSocketConnection(JsonSocketConnection):
     """ Implements a socket for JSON-RPC communication with pre-defined messages.
 
@@ -46,6 +46,12 @@ def __init__(self, host, port):
         # self.socket.timeout = 3
 
     def run(self):
+        try:
+            self._accept_connections()
+        finally:
+            self.socket.close()
+
+    def _accept_connections(self):
         while self._running:
             try:
                 connection = self.socket.handle_accept()
@@ -53,6 +59,7 @@ def run(self):
                 # we waited so long, we need to see that we're still alive
                 # if it was a dummy connection, we will return now
                 if not self._running:
+                    connection.close()
                     return
 
                 # okay, we are alive (unless, of course, we died in between)
@@ -76,7 +83,11 @@ def stop(self):
         # To stop listening, we create a dummy connection
         # and close it immediately
         dummy = socket.socket()
-        dummy.connect((self.socket.host, self.socket.port))
+        try:
+            dummy.connect((self.socket.host, self.socket.port))
+        except socket.error as e:
+            # the socket has already been closed
+            _logger.debug("Could not wake up the listener: %r" % e)
         dummy.close()
 
 class TcpThreadedListeningServerQueuer(TcpThreadedListeningServer):
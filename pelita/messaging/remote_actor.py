@@ -11,13 +11,13 @@
 
 import logging
 _logger = logging.getLogger("pelita.mailbox")
-_logger.setLevel(logging.DEBUG)
 
 __docformat__ = "restructuredtext"
 
 
 from pelita.utils import SuspendableThread, CloseThread, Counter
 from pelita.messaging.remote import JsonSocketConnection, TcpThreadedListeningServer, TcpConnectingClient
+from pelita.messaging.remote import BufferedJsonSocketConnection, TcpListeningSocket, IOLoop
 from pelita.messaging.actor import StopProcessing, DeadConnection, actor_registry, BaseActorReference
 
 
@@ -79,35 +79,14 @@ def _run(self):
         try:
             recv = self.connection.read()
         except socket.timeout as e:
-            _logger.debug("socket.timeout: %r (%r)" % (e, self))
+            _logger.debug("socket.timeout: %r (%r)", e, self)
             return
         except DeadConnection:
             _logger.debug("Remote connection is dead, closing mailbox in %r.", self)
             self.mailbox.stop()
             raise CloseThread
 
-        _logger.info("Processing inbox %r", recv)
-
-        actor = recv.get("actor")
-        channel = self.mailbox.dispatcher(actor)
-
-        if not channel:
-            _logger.warning("No channel found for message %r. Dropping." % recv)
-            return
-
-        sender = recv.get("sender")
-        if sender:
-            proxy = self.mailbox.create_proxy(sender)
-            channel.put(recv.get("message"), channel=proxy, remote=self.mailbox)
-        else:
-            channel.put(recv.get("message"), remote=self.mailbox)
-
-# TODO Not in use now, we rely on timeout until we know better
-#    def stop(self):
-#        SuspendableThread.stop(self)
-#
-#        self.connection.connection.shutdown(socket.SHUT_RDWR)
-#        self.connection.close()
+        self.mailbox.dispatch(recv)
 
 class RemoteOutbox(SuspendableThread):
     """ This class checks its outgoing queue for new messages and
@@ -125,16 +104,30 @@ def _run(self):
         self.handle_outbox()
 
     def handle_outbox(self):
+        """ Waits for the next message and sends it together with
+        all other messages which are queued by then.
+        """
         try:
-            to_send = self._queue.get(True, 3)
+            to_send = [self._queue.get(True, 3)]
+        except Queue.Empty:
+            return
+
+        while to_send[-1] is not StopProcessing:
+            try:
+                to_send.append(self._queue.get_nowait())
+            except Queue.Empty:
+                break
 
+        stop = to_send[-1] is StopProcessing
+        if stop:
+            to_send.pop()
+
+        if to_send:
             _logger.info("Processing outbox %r", to_send)
-            if to_send is StopProcessing:
-                raise CloseThread
+            self.connection.send_many(to_send)
 
-            self.connection.send(to_send)
-        except Queue.Empty:
-            pass
+        if stop:
+            raise CloseThread
 
     def put(self, msg):
         self._queue.put(msg)
@@ -161,6 +154,28 @@ def create_proxy(self, sender):
         proxy = RemoteActorReference(remote_mailbox=self, remote_name=sender)
         return proxy
 
+    def is_alive(self):
+        """ True, if messages can still be sent with this mailbox. """
+        return self.outbox.thread.is_alive()
+
+    def dispatch(self, recv):
+        """ Delivers a message which has been received to its actor. """
+        _logger.info("Processing inbox %r", recv)
+
+        actor = recv.get("actor")
+        channel = self.dispatcher(actor)
+
+        if not channel:
+            _logger.warning("No channel found for message %r. Dropping." % recv)
+            return
+
+        sender = recv.get("sender")
+        if sender:
+            proxy = self.create_proxy(sender)
+            channel.put(recv.get("message"), channel=proxy, remote=self)
+        else:
+            channel.put(recv.get("message"), remote=self)
+
     def dispatcher(self, actor_ref_id):
         """ Tries to find the corresponding actor to the id. """
         # first, see if it is in the request_db
@@ -178,8 +193,10 @@ def dispatcher(self, actor_ref_id):
 
     def start(self):
         _logger.info("Starting mailbox %r", self)
-        self.inbox.start()
+        # the outbox must be running before the first incoming
+        # message can be answered
         self.outbox.start()
+        self.inbox.start()
 
     def stop(self):
         # TODO: this method may be called multiple times
@@ -233,7 +250,9 @@ def start_listener(self, host, port):
 
         def accepter(connection):
         # a new connection has been established
-            mailbox = RemoteMailbox(connection, self)
+            mailbox = self._create_mailbox(connection)
+            # switch to the length framing, if the client understands it
+            mailbox.connection.offer_framing()
             mailbox.start()
 
         self.listener.on_accept = accepter
@@ -248,7 +267,7 @@ def actor_for(self, name, host, port):
         except socket.error:
             raise DeadConnection
 
-        remote = RemoteMailbox(conn, self)
+        remote = self._create_mailbox(conn)
         remote.start()
 
         def actor_for(name, connection):
@@ -260,6 +279,10 @@ def actor_for(name, connection):
         remote_actor = actor_for(name, remote)
         return remote_actor
 
+    def _create_mailbox(self, connection):
+        """ Creates the mailbox for a new socket connection. """
+        return RemoteMailbox(connection, self)
+
     def register(self, name, actor_ref):
         self.exposed_actor_reg[name] = actor_ref.uuid
 
@@ -289,6 +312,169 @@ def on_shutdown(self):
         """
         pass
 
+class SelectorOutbox(object):
+    """ Outbox of a `SelectorMailbox`.
+
+    Messages are handed to the I/O thread, which encodes and buffers them
+    until the socket is writable.
+    """
+    def __init__(self, mailbox):
+        self.mailbox = mailbox
+
+    @property
+    def thread(self):
+        return self.mailbox.loop.thread
+
+    def put(self, msg):
+        self.mailbox.loop.call_soon(self.mailbox.send, msg)
+
+class SelectorMailbox(RemoteMailbox):
+    """ A mailbox whose connection is driven by the `IOLoop` of a
+    `SelectorRemoteConnection` instead of its own inbox and outbox threads.
+    """
+    def __init__(self, connection, remote, loop):
+        self.connection = BufferedJsonSocketConnection(connection)
+        self.remote = remote
+        self.loop = loop
+
+        self.request_db = RequestDB()
+        self.outbox = SelectorOutbox(self)
+        self._alive = False
+
+        remote.add_connection(self.connection, self)
+
+    def fileno(self):
+        return self.connection.socket.fileno()
+
+    def start(self):
+        _logger.info("Starting mailbox %r", self)
+        self._alive = True
+        self.loop.call_soon(self.loop.add_handler, self)
+
+    def is_alive(self):
+        return self._alive and self.loop.thread.is_alive()
+
+    def send(self, msg):
+        """ Sends a message. Must be called on the I/O thread. """
+        if not self._alive:
+            return
+        try:
+            self.connection.send(msg)
+        except DeadConnection:
+            self.stop()
+            return
+        self.loop.update_handler(self)
+
+    def wants_write(self):
+        return bool(self.connection.outgoing)
+
+    def handle_read(self):
+        try:
+            messages = self.connection.receive()
+        except DeadConnection:
+            _logger.debug("Remote connection is dead, closing mailbox in %r.", self)
+            self.stop()
+            return
+        for recv in messages:
+            self.dispatch(recv)
+
+    def handle_write(self):
+        try:
+            self.connection.flush()
+        except DeadConnection:
+            self.stop()
+
+    def handle_close(self):
+        self.connection.close()
+
+    def stop(self):
+        if not self._alive:
+            return
+        _logger.info("Stopping mailbox %r", self)
+        self._alive = False
+        self.loop.call_soon(self.loop.remove_handler, self)
+        try:
+            self.remote.remove_connection(self.connection)
+        except KeyError:
+            pass
+
+class SelectorListener(object):
+    """ Accepts new connections on the `IOLoop` of a `SelectorRemoteConnection`.
+    """
+    def __init__(self, remote, host, port):
+        self.remote = remote
+        self.socket = TcpListeningSocket(host, port)
+        self.socket.socket.setblocking(0)
+
+    def fileno(self):
+        return self.socket.socket.fileno()
+
+    def wants_write(self):
+        return False
+
+    def handle_read(self):
+        try:
+            connection = self.socket.handle_accept()
+        except socket.error as e:
+            _logger.debug("Could not accept a connection: %r" % e)
+            return
+        connection.setblocking(0)
+        mailbox = self.remote._create_mailbox(connection)
+        # switch to the length framing, if the client understands it
+        mailbox.connection.offer_framing()
+        mailbox.start()
+
+    def handle_write(self):
+        pass
+
+    def handle_close(self):
+        self.socket.close()
+
+    def stop(self):
+        self.remote.loop.call_soon(self.remote.loop.remove_handler, self)
+
+class SelectorRemoteConnection(RemoteConnection):
+    """ A `RemoteConnection` which runs the listener and all connections
+    with non-blocking sockets on a single I/O thread.
+
+    Compared to `RemoteConnection`, which starts two threads per connection,
+    this scales to many simultaneous connections. It is used in the same way
+    and the returned `RemoteActorReference` objects behave identically.
+
+    Parameters
+    ----------
+    loop : IOLoop, optional
+        a running loop to share with other connections or actors. It is
+        not stopped together with this connection. By default, the
+        connection starts and stops its own loop.
+    """
+    def __init__(self, loop=None):
+        super(SelectorRemoteConnection, self).__init__()
+        self._owns_loop = loop is None
+        if loop is None:
+            loop = IOLoop()
+            loop.start()
+        self.loop = loop
+
+    def start_listener(self, host, port):
+        self.listener = SelectorListener(self, host, port)
+        self.loop.call_soon(self.loop.add_handler, self.listener)
+        return self
+
+    def _create_mailbox(self, connection):
+        return SelectorMailbox(connection, self, self.loop)
+
+    def shutdown(self):
+        super(SelectorRemoteConnection, self).shutdown()
+        # without a listener, there will be no more connections
+        if self.listener is None and self._owns_loop:
+            self.loop.stop()
+
+    def stop(self):
+        super(SelectorRemoteConnection, self).stop()
+        if self._owns_loop:
+            self.loop.stop()
+
 class RemoteActorReference(BaseActorReference):
     def __init__(self, remote_mailbox, remote_name, **kwargs):
         self.remote_name = remote_name
@@ -297,7 +483,7 @@ def __init__(self, remote_mailbox, remote_name, **kwargs):
         super(RemoteActorReference, self).__init__(**kwargs)
 
     def put(self, message, channel=None, remote=None):
-        if not self._remote_mailbox.outbox.thread.is_alive():
+        if not self._remote_mailbox.is_alive():
             raise DeadConnection
 
         remote_name = self.remote_name
@@ -28,6 +28,8 @@ def __init__(self, *players):
     def _set_bot_ids(self, bot_ids):
         if len(bot_ids) > len(self._players):
             raise ValueError("Tried to set %d bot_ids with only %d Players." % (len(bot_ids), len(self._players)))
+        # the bot ids of a previous game are no longer valid
+        self._bot_players = {}
         for bot_id, player in zip(bot_ids, self._players):
             player._set_index(bot_id)
             self._bot_players[bot_id] = player
@@ -355,8 +357,11 @@ def path_to_border(self):
     @property
     def path_to_target(self):
         """ Path to the target we are currently tracking. """
-        return self.adjacency.a_star(self.current_pos,
-                self.tracking_target.current_pos)
+        try:
+            return self.adjacency.a_star(self.current_pos,
+                    self.tracking_target.current_pos)
+        except NoPathException:
+            return []
 
     @property
     def tracking_target(self):
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+""" Players which run in a process of their own.
+
+A `ProcessTeamPlayer` is registered with the GameMaster like any other
+team, but the team it wraps plays in a child process. This way, the teams
+of a game do not share the interpreter lock with the GameMaster and with
+each other.
+
+The child is connected with a `multiprocessing` pipe. The child is started
+at the start of the game and inherits the maze from the parent, so only
+the bots and teams are sent over the pipe. Afterwards, every move request
+pickles the `UniverseDelta` to the previous universe and sends it over the
+pipe; the full universe is only sent again if the child cannot apply it
+(see `RemoteTeamPlayer`). Nothing is shared between the processes after
+the start.
+
+Usage
+-----
+::
+
+    gm = GameMaster(layout, 4, 200)
+    teams = [ProcessTeamPlayer(SimpleTeam(BFSPlayer(), BFSPlayer())),
+             ProcessTeamPlayer(SimpleTeam(NQRandomPlayer(), NQRandomPlayer()))]
+    for team in teams:
+        gm.register_team(team)
+    gm.play()
+    for team in teams:
+        team.stop()
+
+The child process is started with `fork` (neither the team nor the maze
+is pickled), so this needs a Unix-like system. A child which is forked
+from a process with several threads may deadlock on a lock that another
+thread held at the time (e.g. in `logging` or in an actor's queue), so
+the child is only started if the game runs in the only thread of its
+process. In particular, a `ProcessTeamPlayer` cannot be used by the
+actor based servers.
+"""
+
+import Queue
+import itertools
+import multiprocessing
+import threading
+import logging
+
+from pelita.messaging import DeadConnection
+from pelita.actors import RemoteTeamPlayer, _TeamSession, TIMEOUT
+from pelita.datamodel import CTFUniverse
+
+__docformat__ = "restructuredtext"
+
+_logger = logging.getLogger("pelita.process_team")
+
+
+def _serve_team(team, connection, parent_connection, maze):
+    """ The main loop of the child process.
+
+    Receives `(request_id, method, params)` tuples and sends back
+    `(request_id, result)` until `None` is received or the
+    connection is closed. `maze` is the maze of the game, which has
+    been handed down from the parent by `fork`.
+    """
+    # otherwise, we would not notice when the parent closes its end
+    parent_connection.close()
+    session = _TeamSession(team)
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        request_id, method, params = request
+        if method == "set_initial":
+            bots, teams = params
+            universe = CTFUniverse(maze, teams, bots)
+            result = session.set_initial(universe)
+        elif method == "set_bot_ids":
+            result = session.set_bot_ids(params)
+        else:
+            result = getattr(session, method)(*params)
+        connection.send((request_id, result))
+
+class _PipeReply(object):
+    """ The future reply to a request over a pipe. """
+    def __init__(self, reference, request_id):
+        self.reference = reference
+        self.request_id = request_id
+
+    def get(self, timeout=None):
+        return self.reference._receive(self.request_id, timeout)
+
+class _PipeReference(object):
+    """ Sends queries to the child process in the same way as a
+    `RemoteTeamPlayer` sends them to an ActorReference.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self._request_ids = itertools.count()
+
+    def query(self, method, params=None):
+        request_id = next(self._request_ids)
+        try:
+            self.connection.send((request_id, method, params))
+        except (IOError, EOFError):
+            raise DeadConnection()
+        return _PipeReply(self, request_id)
+
+    def _receive(self, request_id, timeout):
+        """ Waits for the reply to request `request_id`.
+
+        Replies to earlier requests, which came in too late, are dropped.
+
+        Raises
+        ------
+        Queue.Empty
+            if there is no reply after `timeout` seconds
+        DeadConnection
+            if the child process has closed its end of the pipe
+        """
+        try:
+            while self.connection.poll(timeout):
+                reply_id, result = self.connection.recv()
+                if reply_id == request_id:
+                    return result
+                _logger.debug("Dropping late reply %i.", reply_id)
+        except (IOError, EOFError):
+            raise DeadConnection()
+        raise Queue.Empty()
+
+class ProcessTeamPlayer(RemoteTeamPlayer):
+    """ Plays `team` in a child process.
+
+    The child process is started when the game begins (`_set_initial`),
+    so that it inherits the maze. It ends with `stop()`.
+
+    Raises
+    ------
+    RuntimeError
+        from `_set_initial`, if other threads are running in this process
+
+    Parameters
+    ----------
+    team : PlayerTeam
+        the team which plays in the child process
+    timeout : float, optional
+        the number of seconds to wait for a reply. Default: TIMEOUT.
+    """
+    def __init__(self, team, timeout=TIMEOUT):
+        super(ProcessTeamPlayer, self).__init__(None, timeout)
+        self.team = team
+        self.process = None
+        self._bot_ids = None
+
+    def _set_bot_ids(self, bot_ids):
+        # the ids are sent together with the initial universe
+        self._bot_ids = bot_ids
+
+    def _set_initial(self, universe):
+        self.stop()
+        if threading.active_count() > 1:
+            raise RuntimeError("A ProcessTeamPlayer cannot fork its process "
+                               "while other threads are running.")
+        connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve_team,
+            args=(self.team, child_connection, connection, universe.maze))
+        self.process.daemon = True
+        self.process.start()
+        # the child has its own handles now
+        child_connection.close()
+        self.ref = _PipeReference(connection)
+
+        self._universe = universe.copy()
+        self.ref.query("set_bot_ids", self._bot_ids).get(self.timeout)
+        return self.ref.query("set_initial", [universe.bots, universe.teams]).get(self.timeout)
+
+    def stop(self):
+        """ Ends the child process. """
+        if self.process is None:
+            return
+        try:
+            self.ref.connection.send(None)
+        except (IOError, EOFError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ref.connection.close()
+        self.process = None
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+""" Recording and replaying of games.
+
+A `GameRecorder` is registered with the GameMaster as a viewer and writes
+the game to a file with one JSON object per line. The universe is written
+in full only at the start of the game and as a keyframe at the start of
+every `keyframe_interval`-th round. Every turn in between is written as
+the `UniverseDelta` to the previous turn together with its events.
+
+A `GameReader` replays such a file into any viewer without asking the
+players again. Starting at a later round only needs the turns since the
+last keyframe before it.
+
+Usage
+-----
+::
+
+    gm = GameMaster(layout, 4, 200)
+    ...
+    recorder = GameRecorder("game.jsonl")
+    gm.register_viewer(recorder)
+    gm.play()
+    recorder.close()
+
+    GameReader("game.jsonl").replay(AsciiViewer(), start_round=100)
+"""
+
+from pelita import datamodel
+from pelita.containers import TypeAwareList
+from pelita.datamodel import UniverseDelta
+from pelita.messaging.json_convert import json_converter
+from pelita.viewer import AbstractViewer
+
+__docformat__ = "restructuredtext"
+
+
+class GameRecorder(AbstractViewer):
+    """ Viewer which writes the observed game to a file.
+
+    Parameters
+    ----------
+    filename : str
+        the file to write to; it is overwritten
+    keyframe_interval : int, optional
+        the number of rounds between two keyframes. Default: 50.
+    """
+    def __init__(self, filename, keyframe_interval=50):
+        self.file = open(filename, "w")
+        self.keyframe_interval = keyframe_interval
+        # the last universe which has been written
+        self._universe = None
+
+    def _write_keyframe(self, round_, universe):
+        # keyframes start with '{"keyframe": ' so that the reader can
+        # find them without decoding all lines
+        self.file.write('{"keyframe": %i, "universe": %s}\n'
+                        % (round_, json_converter.dumps(universe)))
+
+    def set_initial(self, universe):
+        self._universe = universe.copy()
+        self._write_keyframe(0, universe)
+
+    def observe(self, round_, turn, universe, events):
+        if turn == 0 and round_ > 0 and round_ % self.keyframe_interval == 0:
+            self._write_keyframe(round_, self._universe)
+        delta = UniverseDelta.between(self._universe, universe)
+        self.file.write('{"round": %i, "turn": %i, "delta": %s, "events": %s}\n'
+                        % (round_, turn, json_converter.dumps(delta),
+                           json_converter.dumps(list(events))))
+        self._universe = universe.copy()
+
+    def close(self):
+        """ Closes the file. """
+        self.file.close()
+
+class GameReader(object):
+    """ Replays a game which has been written by a `GameRecorder`.
+
+    Parameters
+    ----------
+    filename : str
+        the recorded game
+
+    Attributes
+    ----------
+    keyframes : list of (int, int)
+        the round and file offset of every keyframe
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.keyframes = []
+        with open(filename) as file:
+            offset = 0
+            for line in iter(file.readline, ""):
+                if line.startswith('{"keyframe": '):
+                    round_ = int(line[len('{"keyframe": '):line.index(",")])
+                    self.keyframes.append((round_, offset))
+                offset += len(line)
+        if not self.keyframes:
+            raise ValueError("%s contains no game record." % filename)
+
+    def _keyframe_before(self, round_):
+        """ The offset of the last keyframe at or before `round_`. """
+        offsets = [offset for keyframe_round, offset in self.keyframes
+                   if keyframe_round <= round_]
+        return offsets[-1] if offsets else self.keyframes[0][1]
+
+    def _turns(self, round_):
+        """ Yields the universe at the start of `round_` and then all
+        following `(round, turn, universe, events)`.
+        """
+        with open(self.filename) as file:
+            file.seek(self._keyframe_before(round_))
+            universe = None
+            started = False
+            for line in iter(file.readline, ""):
+                if line.startswith('{"keyframe": '):
+                    # only the first keyframe is needed
+                    if universe is None:
+                        universe = json_converter.loads(line)["universe"]
+                    continue
+                item = json_converter.loads(line)
+                if not started and item["round"] >= round_:
+                    started = True
+                    yield universe
+                item["delta"].apply(universe)
+                if started:
+                    events = TypeAwareList(item["events"],
+                                           base_class=datamodel.UniverseEvent)
+                    yield item["round"], item["turn"], universe, events
+            if not started:
+                yield universe
+
+    def universe_at(self, round_):
+        """ The universe at the start of round `round_`.
+
+        If the game was over before, the universe at the end of the game.
+        """
+        return next(self._turns(round_))
+
+    def replay(self, viewer, start_round=0):
+        """ Replays the game from round `start_round` on into `viewer`.
+
+        Parameters
+        ----------
+        viewer : AbstractViewer
+            receives `set_initial` with the universe at the start of
+            `start_round` and `observe` for every following turn
+        start_round : int, optional
+            the round to start with. Default: 0.
+        """
+        turns = self._turns(start_round)
+        viewer.set_initial(next(turns).copy())
+        for round_, turn, universe, events in turns:
+            viewer.observe(round_, turn, universe.copy(), events)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+""" Helpers for players which search through the possible moves.
+
+Usage
+-----
+A `TranspositionTable` remembers the results of positions which have
+been evaluated before, keyed by `CTFUniverse.state_hash`::
+
+    table = TranspositionTable()
+
+    def evaluate(universe, depth):
+        value = table.lookup(universe.state_hash, depth)
+        if value is None:
+            value = ...  # search with move_bot() and undo()
+            table.store(universe.state_hash, value, depth)
+        return value
+
+The `state_hash` does not include which bot moves next, so a search which
+takes turns between several bots should keep one table per bot.
+"""
+
+__docformat__ = "restructuredtext"
+
+
+class TranspositionTable(object):
+    """ A table of a fixed size which maps state hashes to values.
+
+    Every hash has a single slot in the table. If the slot is taken by
+    another hash, the new entry replaces it, unless the old entry has
+    been searched deeper and stems from the current search (see
+    `new_search()`).
+
+    Parameters
+    ----------
+    size : int, optional
+        the number of slots. Default: 65536.
+
+    Attributes
+    ----------
+    hits : int
+        the number of successful lookups
+    misses : int
+        the number of failed lookups
+    replacements : int
+        the number of entries which have been replaced by another hash
+    rejections : int
+        the number of entries which have not been stored, because the
+        slot held a deeper entry
+    """
+    def __init__(self, size=65536):
+        if size < 1:
+            raise ValueError("A TranspositionTable needs at least one slot.")
+        self.size = size
+        # (hash, depth, value, generation) or None for every slot
+        self._slots = [None] * size
+        self._generation = 0
+        self.clear_counters()
+
+    def clear_counters(self):
+        """ Sets all counters to zero. """
+        self.hits = 0
+        self.misses = 0
+        self.replacements = 0
+        self.rejections = 0
+
+    @property
+    def hit_rate(self):
+        """ The share of successful lookups, or None without lookups. """
+        lookups = self.hits + self.misses
+        if not lookups:
+            return None
+        return float(self.hits) / lookups
+
+    def new_search(self):
+        """ Marks all entries as old, so that they are replaced first. """
+        self._generation += 1
+
+    def store(self, state_hash, value, depth=0):
+        """ Stores `value` for a state.
+
+        Parameters
+        ----------
+        state_hash : int
+            the hash of the state
+        value : object
+            the result for the state
+        depth : int, optional
+            the depth to which the state has been searched
+        """
+        index = state_hash % self.size
+        entry = self._slots[index]
+        if entry is not None and entry[0] != state_hash:
+            if entry[1] > depth and entry[3] == self._generation:
+                self.rejections += 1
+                return
+            self.replacements += 1
+        self._slots[index] = (state_hash, depth, value, self._generation)
+
+    def lookup(self, state_hash, depth=0):
+        """ The value for a state which has been searched at least
+        `depth` deep, or None.
+        """
+        entry = self._slots[state_hash % self.size]
+        if entry is not None and entry[0] == state_hash and entry[1] >= depth:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def __len__(self):
+        return self.size - self._slots.count(None)
+
+    def clear(self):
+        """ Removes all entries. """
+        self._slots = [None] * self.size
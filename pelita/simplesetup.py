@@ -9,11 +9,12 @@
 import threading
 import signal
 
-from pelita.messaging import actor_of, RemoteConnection
-from pelita.actors import ClientActor, ServerActor
+from pelita.messaging import actor_of, RemoteConnection, SelectorRemoteConnection
+from pelita.actors import ClientActor, ServerActor, LeagueServerActor
 from pelita.layout import get_random_layout
+from pelita.layout import bundled_layouts
 
-from pelita.viewer import AsciiViewer, DevNullViewer
+from pelita.viewer import AsciiViewer, DevNullViewer, ViewerPublisher
 from pelita.ui.tk_viewer import TkViewer
 from pelita.utils.signal_handlers import keyboard_interrupt_handler
 
@@ -124,12 +125,93 @@ def run_tk(self):
         def main():
             # Register a tk_viewer
             viewer = TkViewer()
-            self.server.notify("register_viewer", [viewer])
+            # the game does not wait for the animations
+            publisher = ViewerPublisher()
+            publisher.register_viewer(viewer)
+            self.server.notify("register_viewer", [publisher])
             # We wait until tk closes
             viewer.root.mainloop()
+            publisher.stop()
 
         self._run_save(main)
 
+class SimpleLeagueServer(object):
+    """ Sets up a server which plays games between all connecting clients.
+
+    Clients connect in the same way as with `SimpleServer`. Many games
+    are played at the same time and every client plays one game after
+    the other, until it disconnects.
+
+    Usage
+    -----
+        server = SimpleLeagueServer(rounds=300, max_games=8)
+        server.run()
+
+    Parameters
+    ----------
+    layouts : list of (name, layout) pairs, optional
+        The layouts to play on. Default: all bundled layouts.
+    players : int, optional
+        The number of Players/Bots used in the layout. Default: 4.
+    rounds : int, optional
+        The number of rounds played. Default: 300.
+    scheduler : Scheduler, optional
+        Pairs the waiting teams. Default: RoundRobinScheduler().
+    max_games : int, optional
+        The maximum number of simultaneous games. Default: 4.
+    result_sink : callable, optional
+        Is called with each `GameResult`. Default: prints the result.
+    host : string, optional
+        The hostname which the server runs on. Default: "".
+    port : int, optional
+        The port which the server runs on. Default: 50007.
+    """
+    def __init__(self, layouts=None, players=4, rounds=300, scheduler=None,
+            max_games=4, result_sink=None, host="", port=50007):
+        self.layouts = layouts or bundled_layouts()
+        self.players = players
+        self.rounds = rounds
+        self.scheduler = scheduler
+        self.max_games = max_games
+        self.result_sink = result_sink or self.print_result
+        self.host = host
+        self.port = port
+
+        self.server = None
+        self.remote = None
+
+    @staticmethod
+    def print_result(result):
+        print "Game %i on %s: %s %i:%i %s" % (result.index, result.layout_name,
+                result.team_names[0], result.scores[0], result.scores[1],
+                result.team_names[1])
+
+    def run(self):
+        """ Runs the league until CTRL+C is pressed. """
+        self.server = actor_of(LeagueServerActor, "pelita-main")
+
+        print "Starting remote connection on %s:%s" % (self.host, self.port)
+        # a single thread handles the connections of all clients
+        self.remote = SelectorRemoteConnection().start_listener(host=self.host, port=self.port)
+        self.remote.register("pelita-main", self.server)
+        self.remote.start_all()
+
+        self.server.notify("initialize_league", {
+            "layouts": self.layouts,
+            "number_bots": self.players,
+            "game_time": self.rounds,
+            "scheduler": self.scheduler,
+            "max_games": self.max_games,
+            "result_sink": self.result_sink})
+        try:
+            while self.server.is_alive:
+                self.server.join(1)
+        except KeyboardInterrupt:
+            print "Server received CTRL+C. Exiting."
+        finally:
+            self.server.stop()
+            self.remote.stop()
+
 class SimpleClient(object):
     """ Sets up a simple Client with most settings pre-configured.
 
@@ -146,16 +228,22 @@ class SimpleClient(object):
         The name of the team.
     team: PlayerTeam
         A PlayerTeam instance which defines the algorithms for each Bot.
+        If `games` is larger than 1, a callable which returns a new
+        PlayerTeam for each game.
     host : string, optional
         The hostname which the server runs on. Default: "".
     port : int, optional
         The port which the server runs on. Default: 50007.
     local : boolean, optional
         If True, we only connect to a local server. Default: False.
+    games : int, optional
+        The number of games to play at the same time over the
+        connection (needs a SimpleLeagueServer). Default: 1.
     """
-    def __init__(self, team_name, team, host="", port=50007, local=False):
+    def __init__(self, team_name, team, host="", port=50007, local=False, games=1):
         self.team_name = team_name
         self.team = team
+        self.games = games
         self.main_actor = "pelita-main"
 
         if local:
@@ -171,7 +259,10 @@ def autoplay(self):
         This method only returns when the ClientActor finishes.
         """
         client_actor = ClientActor(self.team_name)
-        client_actor.register_team(self.team)
+        if self.games > 1:
+            client_actor.register_team_factory(self.team, self.games)
+        else:
+            client_actor.register_team(self.team)
 
         if self.port is None:
             address = "%s" % self.main_actor
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+
+""" Headless round-robin tournaments on a process pool.
+
+Every game is played by an in-process `GameMaster` inside a worker of a
+`multiprocessing.Pool`; no actors, threads or sockets are involved. Results
+are yielded as soon as the respective game has finished.
+
+Teams are given as factories, i.e. callables which return a fresh
+`SimpleTeam` for every game. As they are sent to the worker processes,
+they must be picklable (for example module level functions or classes).
+
+Usage
+-----
+    def random_team():
+        return SimpleTeam(RandomPlayer(), RandomPlayer())
+
+    tournament = Tournament([("random", random_team), ("bfs", bfs_team)],
+                            bundled_layouts())
+    for result in tournament.run():
+        print result
+
+For a server to which teams connect at arbitrary times, a `Scheduler`
+decides which of the waiting teams play against each other next. See
+`pelita.actors.LeagueServerActor`.
+"""
+
+import collections
+import itertools
+import multiprocessing
+import random
+from collections import namedtuple
+
+from pelita import datamodel
+from pelita.game_master import GameMaster
+from pelita.layout import bundled_layouts
+from pelita.viewer import AbstractViewer
+
+__docformat__ = "restructuredtext"
+
+#: A single game of a tournament. `teams` holds two `(name, factory)` pairs.
+Match = namedtuple("Match", "index teams layout_name layout seed")
+
+#: The outcome of a `Match`. `winner` is the index of the winning team or
+#: None for a draw; `scores` and `timeouts` are given per team.
+GameResult = namedtuple("GameResult",
+        "index team_names layout_name scores winner rounds timeouts")
+
+
+class ResultViewer(AbstractViewer):
+    """ Viewer which only keeps track of the information needed for a
+    `GameResult`.
+    """
+    def __init__(self):
+        self.rounds = 0
+        self.winner = None
+        self.timeouts = None
+
+    def set_initial(self, universe):
+        self.timeouts = [0] * len(universe.teams)
+
+    def observe(self, round_, turn, universe, events):
+        self.rounds = round_ + 1
+        for timeout_event in events.filter_type(datamodel.TimeoutEvent):
+            self.timeouts[timeout_event.team_index] += 1
+        for team_wins_event in events.filter_type(datamodel.TeamWins):
+            self.winner = team_wins_event.winning_team_index
+
+    def result(self, index, team_names, layout_name, universe):
+        """ The `GameResult` of the observed game.
+
+        If no team has won before the game time was over, the team
+        with the higher score is the winner.
+
+        Parameters
+        ----------
+        index : int
+            the index of the match
+        team_names : list of str
+            the names of both teams
+        layout_name : str
+            the name of the layout
+        universe : CTFUniverse
+            the universe at the end of the game
+        """
+        scores = [team.score for team in universe.teams]
+        winner = self.winner
+        if winner is None and scores[0] != scores[1]:
+            winner = scores.index(max(scores))
+        return GameResult(index, list(team_names), layout_name, scores,
+                          winner, self.rounds, self.timeouts)
+
+
+def play_match(match, number_bots=4, game_time=300, noise=True,
+        distance_cache=None):
+    """ Plays a single match with an in-process `GameMaster`.
+
+    The `random` module is seeded with `match.seed`, so that the game
+    is reproducible.
+
+    Parameters
+    ----------
+    match : Match
+        the match to play
+    number_bots : int
+        the total number of bots
+    game_time : int
+        the maximum number of rounds
+    noise : boolean
+        should enemy positions be noisy
+    distance_cache : str, optional
+        directory in which the maze distances for the noiser are cached
+
+    Returns
+    -------
+    result : GameResult
+        the outcome of the game
+
+    """
+    random.seed(match.seed)
+    gm = GameMaster(match.layout, number_bots, game_time, noise=noise,
+                    distance_cache=distance_cache)
+    for team_name, factory in match.teams:
+        gm.register_team(factory(), team_name=team_name)
+    viewer = ResultViewer()
+    gm.register_viewer(viewer)
+    gm.play()
+
+    return viewer.result(match.index, [name for name, factory in match.teams],
+                         match.layout_name, gm.universe)
+
+
+class _MatchPlayer(object):
+    """ Picklable wrapper of `play_match` with fixed game settings. """
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def __call__(self, match):
+        return play_match(match, **self.kwargs)
+
+
+class Tournament(object):
+    """ A round-robin tournament which is played on a process pool.
+
+    Every pair of teams plays on every layout twice, so that each team
+    starts once on either side of the maze.
+
+    Parameters
+    ----------
+    teams : list of (name, factory) pairs
+        the participating teams; `factory()` must return a new `SimpleTeam`
+    layouts : list of (name, layout) pairs
+        the layouts to play on, see `pelita.layout.bundled_layouts()`
+    number_bots : int, optional
+        the total number of bots. Default: 4.
+    game_time : int, optional
+        the maximum number of rounds per game. Default: 300.
+    noise : boolean, optional
+        should enemy positions be noisy. Default: True.
+    processes : int, optional
+        the number of worker processes. Defaults to the number of CPUs.
+        With a single process, the games are played in this process.
+    seed : int, optional
+        seed from which the random seeds of all games are derived
+    distance_cache : str, optional
+        directory in which the maze distances for the noiser are cached,
+        so that every layout is analysed only once
+
+    """
+    def __init__(self, teams, layouts, number_bots=4, game_time=300,
+            noise=True, processes=None, seed=None, distance_cache=None):
+        if len(teams) < 2:
+            raise ValueError("A tournament needs at least two teams.")
+        self.teams = teams
+        self.layouts = layouts
+        self.processes = processes
+        self.seed = seed
+        self._match_player = _MatchPlayer(number_bots=number_bots,
+                                          game_time=game_time, noise=noise,
+                                          distance_cache=distance_cache)
+
+    def matches(self):
+        """ The round-robin schedule.
+
+        Returns
+        -------
+        matches : list of Match
+            all games of the tournament
+        """
+        rand = random.Random(self.seed)
+        matches = []
+        for team_a, team_b in itertools.combinations(self.teams, 2):
+            for layout_name, layout in self.layouts:
+                for teams in ((team_a, team_b), (team_b, team_a)):
+                    matches.append(Match(len(matches), teams, layout_name,
+                                         layout, rand.getrandbits(32)))
+        return matches
+
+    def run(self):
+        """ Plays all matches.
+
+        Results are yielded in the order in which the games finish, which
+        generally differs from the order of `matches()`.
+
+        Returns
+        -------
+        results : iterator of GameResult
+            the outcome of every game
+        """
+        matches = self.matches()
+        if self.processes == 1:
+            for match in matches:
+                yield self._match_player(match)
+            return
+
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            for result in pool.imap_unordered(self._match_player, matches):
+                yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def standings(self, results):
+        """ Sums up the results per team, see `standings()`. """
+        return standings(results, [name for name, factory in self.teams])
+
+
+def points(result, team_index):
+    """ The points of a team for a `GameResult`: 2 for a won game,
+    1 for a draw and 0 for a lost one.
+    """
+    if result.winner is None:
+        return 1
+    elif result.winner == team_index:
+        return 2
+    return 0
+
+
+def standings(results, team_names=()):
+    """ Sums up the results per team.
+
+    Parameters
+    ----------
+    results : iterable of GameResult
+        the results of all games
+    team_names : list of str, optional
+        teams which are listed even if they have not played yet
+
+    Returns
+    -------
+    standings : list of (name, points, wins, draws, losses)
+        sorted from best to worst team
+    """
+    table = dict((name, [0, 0, 0, 0]) for name in team_names)
+    for result in results:
+        for team_index, name in enumerate(result.team_names):
+            row = table.setdefault(name, [0, 0, 0, 0])
+            team_points = points(result, team_index)
+            row[0] += team_points
+            # wins, draws and losses are the columns 1, 2 and 3
+            row[3 - team_points] += 1
+    return sorted(((name,) + tuple(row) for name, row in table.items()),
+                  key=lambda row: (-row[1], row[0]))
+
+
+class Scheduler(object):
+    """ Decides which of the waiting teams play against each other.
+
+    The scheduler is used by a server to which teams connect at
+    arbitrary times. Whenever teams are waiting for a game, `pair()`
+    is asked for new pairings, and every finished game is reported
+    with `record()`.
+
+    Subclasses override `pair()`. The base class keeps track of the
+    points of every team and of how often two teams have played each
+    other.
+    """
+    def __init__(self):
+        self.points = collections.defaultdict(int)
+        self._played = collections.defaultdict(int)
+
+    def played(self, team_a, team_b):
+        """ The number of games between `team_a` and `team_b`. """
+        return self._played[frozenset((team_a, team_b))]
+
+    def record(self, result):
+        """ Takes a `GameResult` into account for the next pairings. """
+        for team_index, name in enumerate(result.team_names):
+            self.points[name] += points(result, team_index)
+        self._played[frozenset(result.team_names)] += 1
+
+    def pair(self, waiting):
+        """ Pairs the waiting teams.
+
+        Parameters
+        ----------
+        waiting : list of str
+            the names of all teams which wait for a game, in the order
+            in which they have become available
+
+        Returns
+        -------
+        pairings : list of (str, str)
+            the games to start; a team may only be in one of them
+        """
+        raise NotImplementedError
+
+    def _pair_greedily(self, waiting, cost):
+        """ Pairs the first waiting team with the team of lowest
+        `cost(first, other)`, then the next unpaired team, and so on.
+        """
+        waiting = list(waiting)
+        pairings = []
+        while len(waiting) >= 2:
+            first = waiting.pop(0)
+            other = min(waiting, key=lambda team: cost(first, team))
+            waiting.remove(other)
+            pairings.append((first, other))
+        return pairings
+
+
+class RoundRobinScheduler(Scheduler):
+    """ Pairs every team with the team it has played least often,
+    so that in the long run all pairings occur equally often.
+    """
+    def pair(self, waiting):
+        return self._pair_greedily(waiting, self.played)
+
+
+class SwissScheduler(Scheduler):
+    """ Pairs teams with a similar number of points, avoiding rematches.
+    """
+    def pair(self, waiting):
+        # the first team is the strongest one and looks for the closest
+        # opponent among those it has played least often
+        waiting = sorted(waiting, key=lambda team: -self.points[team])
+        return self._pair_greedily(waiting, lambda first, team:
+            (self.played(first, team),
+             abs(self.points[first] - self.points[team])))
+
+
+class RandomScheduler(Scheduler):
+    """ Pairs the waiting teams at random. """
+    def __init__(self, seed=None):
+        super(RandomScheduler, self).__init__()
+        self.random = random.Random(seed)
+
+    def pair(self, waiting):
+        waiting = list(waiting)
+        self.random.shuffle(waiting)
+        return zip(waiting[::2], waiting[1::2])
+
+
+def _stopping_team():
+    from pelita.player import SimpleTeam, StoppingPlayer
+    return SimpleTeam(StoppingPlayer(), StoppingPlayer())
+
+def _random_team():
+    from pelita.player import SimpleTeam, NQRandomPlayer
+    return SimpleTeam(NQRandomPlayer(), NQRandomPlayer())
+
+def _bfs_team():
+    from pelita.player import SimpleTeam, BFSPlayer, BasicDefensePlayer
+    return SimpleTeam(BFSPlayer(), BasicDefensePlayer())
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    tournament = Tournament([("stopping", _stopping_team),
+                             ("random", _random_team),
+                             ("bfs", _bfs_team)],
+                            bundled_layouts()[:4], processes=processes,
+                            seed=1)
+    start = time.time()
+    results = []
+    for result in tournament.run():
+        results.append(result)
+        print "%-10s vs %-10s on %-22s %3i:%-3i after %3i rounds" % (
+                result.team_names[0], result.team_names[1],
+                result.layout_name, result.scores[0], result.scores[1],
+                result.rounds)
+    print "%i games in %.2fs" % (len(results), time.time() - start)
+    for row in tournament.standings(results):
+        print "%-10s %3i points (%i/%i/%i)" % row
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
 import Queue
-import copy
 import Tkinter
 
 import logging
@@ -86,17 +85,20 @@ def _put(self, obj):
             _logger.info("Queue is filled. Skipping.")
             pass
 
+    # The universes and events are not copied: they have been copied by
+    # the GameMaster and the Tk application does not modify them.
+
     def set_initial(self, universe):
-        self._put(copy.deepcopy({
+        self._put({
             "universe": universe,
-        }))
+        })
 
     def observe(self, round_, turn, universe, events):
 #        print "observed", events
 
-        self._put(copy.deepcopy({
+        self._put({
             "round": round_,
             "turn": turn,
             "universe": universe,
-            "events": events}))
+            "events": events})
 
@@ -33,6 +33,8 @@ def run(self):
         """
         while self._running:
             self._unsuspended.wait()
+            if not self._running:
+                break
             try:
                 self._run()
             except CloseThread:
@@ -65,6 +67,8 @@ def paused(self, value):
     def stop(self):
         _logger.debug("Stopping thread %r", self)
         self._running = False
+        # a suspended thread must wake up to notice
+        self._unsuspended.set()
 
     def start(self):
         _logger.debug("Starting thread %r", self)
@@ -2,10 +2,22 @@
 
 """ The observers. """
 
+import collections
+import threading
+import logging
+
 from pelita import datamodel
+from pelita.containers import TypeAwareList
+from pelita.utils import SuspendableThread, CloseThread
 
 __docformat__ = "restructuredtext"
 
+_logger = logging.getLogger("pelita.viewer")
+
+#: The state of the game after a single turn, as it is shared between
+#: all viewers of a `ViewerPublisher`.
+Frame = collections.namedtuple("Frame", "round turn universe events")
+
 
 class AbstractViewer(object):
     def set_initial(self, universe):
@@ -36,3 +48,133 @@ def observe(self, round_, turn, universe, events):
             team_wins_event = events.filter_type(datamodel.TeamWins)[0]
             print ("Game Over: Team: '%s' wins!" %
             universe.teams[team_wins_event.winning_team_index].name)
+
+class _ViewerChannel(SuspendableThread):
+    """ Thread which hands the frames of a `ViewerPublisher` to a
+    single viewer.
+
+    Only the newest `queue_size` frames are kept; older frames are
+    dropped, if the viewer is too slow. The initial universe is never
+    dropped.
+    """
+    def __init__(self, viewer, queue_size):
+        super(_ViewerChannel, self).__init__()
+        # a hanging viewer must not keep the program alive
+        self._thread.daemon = True
+        self.viewer = viewer
+        self.dropped = 0
+        self._initial = None
+        self._frames = collections.deque(maxlen=queue_size)
+        self._closing = False
+        self._condition = threading.Condition()
+
+    def put_initial(self, universe):
+        with self._condition:
+            self._initial = universe
+            self._frames.clear()
+            self._condition.notify()
+
+    def put(self, frame):
+        with self._condition:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(frame)
+            self._condition.notify()
+
+    def close(self):
+        """ Ends the thread when all frames have been handed over. """
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            super(_ViewerChannel, self).stop()
+            self._condition.notify()
+
+    def _run(self):
+        with self._condition:
+            while self._initial is None and not self._frames:
+                if self._closing or not self._running:
+                    raise CloseThread
+                self._condition.wait()
+            initial, self._initial = self._initial, None
+            frame = None if initial is not None else self._frames.popleft()
+
+        if initial is not None:
+            self.viewer.set_initial(initial)
+        else:
+            # every viewer gets its own list of the shared events
+            events = TypeAwareList(frame.events, base_class=datamodel.UniverseEvent)
+            self.viewer.observe(frame.round, frame.turn, frame.universe, events)
+
+class ViewerPublisher(AbstractViewer):
+    """ Viewer which passes everything on to other viewers, each on a
+    thread of its own.
+
+    The GameMaster hands a turn to the publisher without waiting for the
+    viewers. A single `Frame` is created for every turn and shared by
+    all viewers, so viewers must not modify the universe they receive.
+    If a viewer is slower than the game, only the newest frames are
+    kept for it and the others are dropped.
+
+    Usage
+    -----
+    ::
+
+        publisher = ViewerPublisher()
+        publisher.register_viewer(TkViewer())
+        gm.register_viewer(publisher)
+        gm.play()
+        publisher.close()
+
+    Parameters
+    ----------
+    queue_size : int, optional
+        the number of frames kept for a viewer. Default: 1.
+    """
+    def __init__(self, queue_size=1):
+        self.queue_size = queue_size
+        self._channels = []
+        self._initial = None
+
+    def register_viewer(self, viewer):
+        """ Adds a viewer. It receives the initial universe, if the
+        game has already been set up.
+        """
+        channel = _ViewerChannel(viewer, self.queue_size)
+        channel.start()
+        if self._initial is not None:
+            channel.put_initial(self._initial)
+        self._channels.append(channel)
+
+    @property
+    def dropped_frames(self):
+        """ The number of dropped frames of each viewer, in the order
+        of registration.
+        """
+        return [channel.dropped for channel in self._channels]
+
+    def set_initial(self, universe):
+        self._initial = universe
+        for channel in self._channels:
+            channel.put_initial(universe)
+
+    def observe(self, round_, turn, universe, events):
+        frame = Frame(round_, turn, universe, tuple(events))
+        for channel in self._channels:
+            channel.put(frame)
+
+    def close(self, timeout=None):
+        """ Waits until all viewers have received their last frame. """
+        for channel in self._channels:
+            channel.close()
+        for channel in self._channels:
+            channel.thread.join(timeout)
+            if channel.thread.is_alive():
+                _logger.warning("Viewer %r has not finished.", channel.viewer)
+
+    def stop(self):
+        """ Stops passing frames to the viewers. """
+        for channel in self._channels:
+            channel.stop()
@@ -1,8 +1,14 @@
 import unittest
 import time
+import threading
 import Queue
 
-from pelita.messaging import DispatchingActor, expose, Actor, actor_of, RemoteConnection, Exit, Request, ActorNotRunning
+from pelita.messaging import DispatchingActor, expose, Actor, actor_of, actor_registry, RemoteConnection, SelectorRemoteConnection, IOLoop, Exit, Request, ActorNotRunning, StopProcessing
+from pelita.messaging.remote_actor import RemoteOutbox
+from pelita.actors import _ClientActor, ClientActor, RemoteTeamPlayer, GameReference, LeagueServerActor
+from pelita.tournament import SwissScheduler
+from pelita.datamodel import create_CTFUniverse, east, west, stop
+from pelita.player import SimpleTeam, TestPlayer, StoppingPlayer
 
 class Dispatcher(DispatchingActor):
     def __init__(self):
@@ -224,21 +230,150 @@ def test_simply_reply(self):
         actor_ref.stop()
         #assert False
 
+class ForwardingActor(DispatchingActor):
+    @expose
+    def forward(self, target_uuid, *params):
+        channel = self.ref.channel
+        target = actor_registry.get_by_uuid(target_uuid)
+        # never block the loop; reply, as soon as the result is there
+        target.query("mult", params).on_result(
+            lambda res: channel.put(res + 1, self.ref))
+
+class TestLoopActor(unittest.TestCase):
+    def setUp(self):
+        self.loop = IOLoop()
+        self.loop.start()
+
+    def tearDown(self):
+        self.loop.stop()
+        self.loop.thread.join(3)
+
+    def test_many_actors(self):
+        threads = set(threading.enumerate())
+        actors = [actor_of(Dispatcher, loop=self.loop) for i in range(500)]
+        for actor in actors:
+            actor.start()
+        # no new threads have been started
+        self.assertEqual(set(threading.enumerate()) - threads, set())
+
+        for i, actor in enumerate(actors):
+            actor.notify("set_param1", [i])
+        requests = [actor.query("get_param1") for actor in actors]
+        self.assertEqual([req.get(3) for req in requests], range(500))
+
+        for actor in actors:
+            self.assertTrue(actor.is_alive)
+            actor.stop()
+        for actor in actors:
+            actor.join(3)
+            self.assertFalse(actor.is_alive)
+            self.assertFalse(actor.is_running)
+
+    def test_on_result(self):
+        forwarder = actor_of(ForwardingActor, loop=self.loop)
+        multiplier = actor_of(MultiplyingActor, loop=self.loop)
+        forwarder.start()
+        multiplier.start()
+
+        res = forwarder.query("forward", [multiplier.uuid, 2, 3])
+        self.assertEqual(res.get(3), 7)
+
+        results = []
+        res.on_result(results.append)
+        self.assertEqual(results, [7])
+
+        forwarder.stop()
+        multiplier.stop()
+
+    def test_raise(self):
+        collecting = actor_of(CollectingActor)
+        collecting.trap_exit = True
+        collecting.start()
+
+        raising = actor_of(RaisingActor, loop=self.loop)
+        raising.link(collecting)
+        raising.start()
+        raising.notify("Msg")
+
+        raising.join(3)
+        self.assertFalse(raising.is_alive)
+        # the loop survives the exception
+        self.assertTrue(self.loop.thread.is_alive())
+
+        collecting.stop()
+        collecting.join(3)
+        self.assertTrue(isinstance(collecting._actor.received_exit, Exit))
+
+    def test_remote(self):
+        remote = SelectorRemoteConnection(self.loop).start_listener("localhost", 0)
+        remote.register("main-actor", actor_of(MultiplyingActor, loop=self.loop))
+        remote.start_all()
+        port = remote.listener.socket.port
+
+        client = RemoteConnection()
+        actor = client.actor_for("main-actor", "localhost", port)
+        self.assertEqual(actor.query("mult", [3, 4]).get(3), 12)
+
+        remote.stop()
+        client.stop()
+        # the shared loop is not stopped by the connection
+        time.sleep(0.1)
+        self.assertTrue(self.loop.thread.is_alive())
+
 class TestRemoteActor(unittest.TestCase):
     def test_remote(self):
-        remote = RemoteConnection().start_listener("localhost", 0)
+        self._test_remote(RemoteConnection, RemoteConnection)
+
+    def test_remote_selector(self):
+        self._test_remote(SelectorRemoteConnection, SelectorRemoteConnection)
+
+    def test_remote_mixed(self):
+        self._test_remote(SelectorRemoteConnection, RemoteConnection)
+        self._test_remote(RemoteConnection, SelectorRemoteConnection)
+
+    def test_selector_threads(self):
+        remote = SelectorRemoteConnection().start_listener("localhost", 0)
+        remote.register("main-actor", actor_of(MultiplyingActor))
+        remote.start_all()
+        port = remote.listener.socket.port
+        threads = set(threading.enumerate())
+
+        clients = [SelectorRemoteConnection() for i in range(5)]
+        try:
+            actors = [client.actor_for("main-actor", "localhost", port)
+                      for client in clients]
+            # one I/O thread per client, none for the server
+            new_threads = set(threading.enumerate()) - threads
+            self.assertEqual(new_threads,
+                             set(client.loop.thread for client in clients))
+            for i, actor in enumerate(actors):
+                self.assertEqual(actor.query("mult", [i, 2]).get(timeout=3), 2 * i)
+        finally:
+            remote.stop()
+            for client in clients:
+                client.stop()
+        remote.loop.thread.join(3)
+        self.assertFalse(remote.loop.thread.is_alive())
+
+    def _test_remote(self, server_class, client_class):
+        remote = server_class().start_listener("localhost", 0)
         remote.register("main-actor", actor_of(MultiplyingActor))
         remote.start_all()
 
         # port is dynamic
         port = remote.listener.socket.port
 
-        client1 = RemoteConnection().actor_for("main-actor", "localhost", port)
+        clients = [client_class() for i in range(3)]
+
+        client1 = clients[0].actor_for("main-actor", "localhost", port)
         res = client1.query("mult", [1, 2, 3, 4])
         self.assertEqual(res.get(timeout=3), 24)
+        # the server has offered the length framing before replying
+        self.assertEqual(client1._remote_mailbox.connection.send_framing,
+                         "length")
 
         # check, that I can use another client
-        client2 = RemoteConnection().actor_for("main-actor", "localhost", port)
+        client2 = clients[1].actor_for("main-actor", "localhost", port)
         res = client2.query("mult", [4, 4, 4])
         self.assertEqual(res.get(timeout=3), 64)
 
@@ -249,12 +384,295 @@ def test_remote(self):
         # check a remote identifier which does not work
         # sorry, no error propagation at the moment,
         # need to use a timeout
-        client2 = RemoteConnection().actor_for("unknown-actor", "localhost", port)
+        client2 = clients[2].actor_for("unknown-actor", "localhost", port)
         res = client2.query("mult", [1, 4, 4])
         self.assertRaises(Queue.Empty, res.get, timeout=1)
 
         remote.stop()
+        for client in clients:
+            client.stop()
+
+class RecordingConnection(object):
+    def __init__(self):
+        self.sent = []
+
+    def send_many(self, objs):
+        self.sent.append(objs)
+
+class FakeMailbox(object):
+    def __init__(self):
+        self.connection = RecordingConnection()
+        self.request_db = None
+
+class TestRemoteOutbox(unittest.TestCase):
+    def test_coalescing(self):
+        mailbox = FakeMailbox()
+        outbox = RemoteOutbox(mailbox)
+        for i in range(3):
+            outbox.put({"message": i})
+        outbox.put(StopProcessing)
+        outbox.put({"message": "after stop"})
+        outbox.start()
+        outbox.thread.join(3)
+        self.assertFalse(outbox.thread.is_alive())
+        # everything up to StopProcessing is sent at once
+        self.assertEqual(mailbox.connection.sent,
+                         [[{"message": i} for i in range(3)]])
+
+class TestShutdownLatency(unittest.TestCase):
+    """ Stopping must not wait for the timeouts of queues and sockets. """
+    max_latency = 0.5
+
+    def assertStopsQuickly(self, threads, start):
+        for thread in threads:
+            thread.join(3)
+            self.assertFalse(thread.is_alive(), thread)
+        latency = time.time() - start
+        self.assertTrue(latency < self.max_latency,
+                        "Shutdown took %.2f seconds." % latency)
+
+    def test_actor(self):
+        actor = actor_of(Dispatcher)
+        actor.start()
+        start = time.time()
+        # stopping the actor itself instead of sending it StopProcessing
+        actor._actor.stop()
+        self.assertStopsQuickly([actor._actor.thread], start)
+
+    def _test_remote(self, server_class, client_class):
+        remote = server_class().start_listener("localhost", 0)
+        remote.register("main-actor", actor_of(MultiplyingActor))
+        remote.start_all()
+        port = remote.listener.socket.port
+
+        client = client_class()
+        actor = client.actor_for("main-actor", "localhost", port)
+        self.assertEqual(actor.query("mult", [2, 3]).get(3), 6)
+
+        threads = [remote.get_actor("main-actor")._actor.thread]
+        for connection in (remote, client):
+            if isinstance(connection, SelectorRemoteConnection):
+                threads.append(connection.loop.thread)
+            else:
+                for mailbox in connection.connections.values():
+                    threads += [mailbox.inbox.thread, mailbox.outbox.thread]
+        if not isinstance(remote, SelectorRemoteConnection):
+            threads.append(remote.listener.thread)
+
+        start = time.time()
+        remote.stop()
+        client.stop()
+        self.assertStopsQuickly(threads, start)
+
+    def test_remote(self):
+        self._test_remote(RemoteConnection, RemoteConnection)
+
+    def test_remote_selector(self):
+        self._test_remote(SelectorRemoteConnection, SelectorRemoteConnection)
+
+    def test_remote_mixed(self):
+        self._test_remote(RemoteConnection, SelectorRemoteConnection)
+
+class PlayNowClient(DispatchingActor):
+    """ A client which does not know about play_delta. """
+    def __init__(self, moves):
+        super(PlayNowClient, self).__init__()
+        self.moves = moves
+        self.unhandled = []
+
+    @expose
+    def set_bot_ids(self, *bot_ids):
+        self.ref.reply("ok")
+
+    @expose
+    def set_initial(self, universe):
+        self.ref.reply("ok")
+
+    @expose
+    def play_now(self, bot_index, universe):
+        self.ref.reply(self.moves.pop(0))
+
+    def on_unhandled(self, message):
+        self.unhandled.append(message.get("method"))
+        super(PlayNowClient, self).on_unhandled(message)
+
+class TestRemoteTeamPlayer(unittest.TestCase):
+    def test_play_now_client(self):
+        layout = (
+        """ ########
+            #0 .  1#
+            ######## """)
+        universe = create_CTFUniverse(layout, 2)
+        client = actor_of(PlayNowClient([east, east, stop]))
+        client.start()
+        try:
+            remote_player = RemoteTeamPlayer(client)
+            remote_player._set_bot_ids([0])
+            remote_player._set_initial(universe.copy())
+            self.assertEqual(remote_player._get_move(0, universe.copy()), east)
+            universe.move_bot(0, east)
+            self.assertEqual(remote_player._get_move(0, universe.copy()), east)
+            universe.move_bot(0, east)
+            self.assertEqual(remote_player._get_move(0, universe.copy()), stop)
+            # play_delta has only been tried once
+            self.assertEqual(client._actor.unhandled, ["play_delta"])
+        finally:
+            client.stop()
+
+    def test_delta_updates(self):
+        layout = (
+        """ ########
+            #0 .  1#
+            ######## """)
+        universe = create_CTFUniverse(layout, 2)
+        client = actor_of(_ClientActor)
+        client.start()
+        try:
+            player = TestPlayer([stop, east, east])
+            client.notify("register_team", [SimpleTeam(player)])
+            remote_player = RemoteTeamPlayer(client)
+            remote_player._set_bot_ids([0])
+            remote_player._set_initial(universe.copy())
+
+            self.assertEqual(remote_player._get_move(0, universe.copy()), east)
+            universe.move_bot(0, east)
+            universe.move_bot(1, west)
+            self.assertEqual(remote_player._get_move(0, universe.copy()), east)
+            self.assertEqual(player.current_uni, universe)
+
+            # the client's universe has diverged and is replaced
+            player.current_uni.teams[0].score = 5
+            client._actor.universe.teams[0].score = 5
+            universe.move_bot(0, east)
+            self.assertEqual(remote_player._get_move(0, universe.copy()), stop)
+            self.assertEqual(player.current_uni, universe)
+        finally:
+            client.stop()
+
+    def test_multiplexed_games(self):
+        layout = (
+        """ ########
+            #0 .  1#
+            ######## """)
+        universe = create_CTFUniverse(layout, 2)
+        remote = RemoteConnection().start_listener("localhost", 0)
+        client = actor_of(_ClientActor)
+        remote.register("client", client)
+        remote.start_all()
+        port = remote.listener.socket.port
 
+        connection = RemoteConnection()
+        try:
+            players = []
+            def team_factory():
+                players.append(TestPlayer([west, east]))
+                return SimpleTeam(players[-1])
+            client.notify("register_team_factory", [team_factory, 2])
+
+            # both games share a single connection
+            client_ref = connection.actor_for("client", "localhost", port)
+            games = [RemoteTeamPlayer(GameReference(client_ref, game_id))
+                     for game_id in [1, 2]]
+            for game in games:
+                game._set_bot_ids([0])
+                game._set_initial(universe.copy())
+
+            self.assertEqual(games[0]._get_move(0, universe.copy()), east)
+            self.assertEqual(games[1]._get_move(0, universe.copy()), east)
+            moved = universe.copy()
+            moved.move_bot(0, east)
+            self.assertEqual(games[1]._get_move(0, moved.copy()), west)
+            self.assertEqual(games[0]._get_move(0, universe.copy()), west)
+
+            # every game is played by a team of its own
+            self.assertEqual(len(players), 2)
+            self.assertEqual(players[0].current_uni, universe)
+            self.assertEqual(players[1].current_uni, moved)
+            self.assertEqual(sorted(client._actor.sessions), [1, 2])
+
+            for game in games:
+                game.ref.end_game()
+            for _ in range(30):
+                if not client._actor.sessions:
+                    break
+                time.sleep(0.1)
+            self.assertEqual(client._actor.sessions, {})
+        finally:
+            connection.stop()
+            remote.stop()
+
+class TestLeagueServerActor(unittest.TestCase):
+    layout = (
+        """ ########
+            #0 .  1#
+            ######## """)
+
+    def test_league(self):
+        results = Queue.Queue()
+        server = actor_of(LeagueServerActor, "test-league")
+        server.start()
+        clients = []
+        try:
+            # teams may connect before and after the initialisation
+            for name in ["a", "b"]:
+                clients.append(ClientActor(name))
+            server.notify("initialize_league", {
+                "layouts": [("small", self.layout)],
+                "number_bots": 2, "game_time": 3,
+                "scheduler": SwissScheduler(), "max_games": 2,
+                "result_sink": results.put})
+            for name in ["c", "a"]:
+                clients.append(ClientActor(name))
+            for client in clients:
+                client.register_team(SimpleTeam(StoppingPlayer()))
+                self.assertTrue(client.connect_local("test-league"))
+
+            played = set()
+            for index in range(8):
+                result = results.get(timeout=5)
+                self.assertEqual(result.rounds, 3)
+                played.update(result.team_names)
+            # every client has played, some of them several times
+            self.assertEqual(played, set(["a", "b", "c", "a (2)"]))
+
+            table = server.query("standings").get(3)
+            self.assertEqual(sorted(row[0] for row in table),
+                             ["a", "a (2)", "b", "c"])
+            # all games are draws
+            self.assertTrue(sum(row[2] + row[4] for row in table) == 0)
+        finally:
+            server.stop()
+            for client in clients:
+                client.actor_ref.stop()
+
+    def test_multiplexed_client(self):
+        results = Queue.Queue()
+        server = actor_of(LeagueServerActor, "test-league-multiplexed")
+        server.start()
+        clients = [ClientActor("single"), ClientActor("many")]
+        try:
+            server.notify("initialize_league", {
+                "layouts": [("small", self.layout)],
+                "number_bots": 2, "game_time": 3,
+                "max_games": 2, "result_sink": results.put})
+            clients[0].register_team(SimpleTeam(StoppingPlayer()))
+            clients[1].register_team_factory(lambda: SimpleTeam(StoppingPlayer()), 3)
+            for client in clients:
+                self.assertTrue(client.connect_local("test-league-multiplexed"))
+
+            played = set()
+            for index in range(6):
+                result = results.get(timeout=5)
+                self.assertEqual(result.rounds, 3)
+                played.update(result.team_names)
+            self.assertEqual(played, set(["single", "many", "many (2)", "many (3)"]))
+
+            # at most three games are played by the multiplexed client
+            self.assertTrue(len(clients[1].actor_ref._actor.sessions) <= 3)
+        finally:
+            server.stop()
+            for client in clients:
+                client.actor_ref.stop()
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import random
+from pelita.datamodel import create_CTFUniverse, moves, stop, east, west,\
+        north, IllegalMoveException
+
+try:
+    import numpy
+    from pelita.batch import BatchUniverse
+except ImportError:
+    numpy = None
+
+test_layout = (
+""" ##################
+    #0#.  .  # .     #
+    # #####    ##### #
+    #     . #  .  .#1#
+    ################## """)
+
+@unittest.skipIf(numpy is None, "NumPy is not available")
+class TestBatchUniverse(unittest.TestCase):
+
+    def test_legal_moves(self):
+        batch = BatchUniverse.from_layout(test_layout, 2, 3)
+        universe = create_CTFUniverse(test_layout, 2)
+        legal = batch.legal_moves(0)
+        self.assertEqual(legal.shape, (3, len(moves)))
+        for game in range(3):
+            self.assertEqual(set(universe.get_legal_moves((1, 1)).keys()),
+                set(move for move, ok in zip(moves, legal[game]) if ok))
+
+    def test_illegal_move(self):
+        batch = BatchUniverse.from_layout(test_layout, 2, 3)
+        move_west = moves.index(west)
+        move_stop = moves.index(stop)
+        self.assertRaises(IllegalMoveException, batch.move_bot, 0,
+                          [move_stop, move_west, move_stop])
+        self.assertRaises(IllegalMoveException, batch.move_bot, 0,
+                          [move_stop, len(moves), move_stop])
+        # nothing has been changed
+        self.assertEqual(batch.universe(1),
+                         create_CTFUniverse(test_layout, 2))
+
+    def test_eat_food(self):
+        layout = (
+        """ ######
+            #0 .1#
+            ###### """)
+        batch = BatchUniverse.from_layout(layout, 2, 2)
+        universe = create_CTFUniverse(layout, 2)
+        move_east = moves.index(east)
+        move_stop = moves.index(stop)
+        batch.move_bot(0, [move_east, move_stop])
+        events = batch.move_bot(0, [move_east, move_stop])
+        self.assertEqual(list(batch.winners), [0, -1])
+        self.assertEqual(list(batch.scores[:, 0]), [1, 0])
+        universe.move_bot(0, east)
+        self.assertEqual(events.for_game(0), universe.move_bot(0, east))
+        self.assertEqual(batch.universe(0), universe)
+        self.assertEqual(batch.universe(1), create_CTFUniverse(layout, 2))
+
+    def test_game_over(self):
+        layout = (
+        """ ########
+            #0 .. 1#
+            ######## """)
+        batch = BatchUniverse.from_layout(layout, 2, 2)
+        move_east = moves.index(east)
+        move_west = moves.index(west)
+        move_stop = moves.index(stop)
+        # team 0 wins the first game
+        for i in range(3):
+            batch.move_bot(0, [move_east, move_stop])
+        self.assertEqual(list(batch.winners), [0, -1])
+        # team 1 would win both games, but the first one is over
+        for i in range(3):
+            events = batch.move_bot(1, [move_west, move_west])
+            self.assertEqual(list(events.for_game(0)), [])
+        self.assertEqual(list(batch.winners), [0, 1])
+        self.assertEqual(batch.scores.tolist(), [[1, 0], [0, 1]])
+        self.assertEqual(batch.universe(0).bot_positions, [(4, 1), (6, 1)])
+        # moves in a finished game are not checked
+        batch.move_bot(1, [moves.index(north), move_west])
+
+    def test_matches_ctfuniverse(self):
+        number_games = 10
+        layout = (
+        """ ##########
+            #0 ..  .3#
+            #.#.##. .#
+            #2. .  .1#
+            ########## """)
+        batch = BatchUniverse.from_layout(layout, 4, number_games)
+        universes = [create_CTFUniverse(layout, 4)
+                     for game in range(number_games)]
+        rand = random.Random(1)
+        for round_ in range(60):
+            for bot_index in range(4):
+                move_indices = []
+                scalar_events = []
+                for universe in universes:
+                    pos = universe.bots[bot_index].current_pos
+                    move = rand.choice(universe.get_legal_moves(pos).keys())
+                    move_indices.append(moves.index(move))
+                    # a finished game does not change any more
+                    if universe.is_terminal:
+                        scalar_events.append([])
+                    else:
+                        scalar_events.append(universe.move_bot(bot_index, move))
+                events = batch.move_bot(bot_index, move_indices)
+                for game, universe in enumerate(universes):
+                    self.assertEqual(list(events.for_game(game)),
+                                     list(scalar_events[game]))
+        for game, universe in enumerate(universes):
+            self.assertEqual(batch.universe(game), universe)
+            self.assertEqual(batch.universe(game).state_hash,
+                             universe.state_hash)
+            self.assertEqual(batch.winners[game] >= 0, universe.is_terminal)
+
+if __name__ == '__main__':
+    unittest.main()
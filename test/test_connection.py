@@ -1,7 +1,13 @@
 import unittest
 import Queue
+import json
+import socket
+import threading
 
+from pelita.messaging import DeadConnection
 from pelita.messaging.remote import TcpThreadedListeningServer, TcpConnectingClient
+from pelita.messaging.remote.jsonconnection import JsonSocketConnection,\
+        BufferedJsonSocketConnection, FRAMING_EOT, FRAMING_LENGTH
 
 class TestConnection(unittest.TestCase):
     def test_accept(self):
@@ -37,5 +43,131 @@ def acceptor(connection):
         listener.stop()
         listener.thread.join()
 
+class TestJsonSocketConnection(unittest.TestCase):
+    def setUp(self):
+        self.sock_a, self.sock_b = socket.socketpair()
+
+    def tearDown(self):
+        self.sock_a.close()
+        self.sock_b.close()
+
+    def test_close_wakes_reader(self):
+        conn = JsonSocketConnection(self.sock_b)
+        errors = Queue.Queue()
+        def reader():
+            try:
+                conn.read()
+            except DeadConnection as e:
+                errors.put(e)
+        thread = threading.Thread(target=reader)
+        thread.start()
+        conn.close()
+        # must not wait for the socket timeout
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(isinstance(errors.get(False), DeadConnection))
+
+    def test_eot_split_data(self):
+        conn = JsonSocketConnection(self.sock_b)
+        data = '{"a": 1}\x04[1, 2]\x04"x"\x04{"b"'
+        for char in data:
+            self.sock_a.send(char)
+        self.assertEqual(conn.read(), {"a": 1})
+        self.assertEqual(conn.read(), [1, 2])
+        self.assertEqual(conn.read(), "x")
+        self.sock_a.send(': 2}\x04')
+        self.assertEqual(conn.read(), {"b": 2})
+        self.assertEqual(len(conn.incoming), 0)
+
+    def test_length_framing(self):
+        conn_a = JsonSocketConnection(self.sock_a, framing=FRAMING_LENGTH)
+        conn_b = JsonSocketConnection(self.sock_b, framing=FRAMING_LENGTH)
+        # larger than a single read and than the socket buffer
+        large = ["\x04" * 10] * 10000
+        def send():
+            conn_a.send(large)
+            conn_a.send({"a": 1})
+        sender = threading.Thread(target=send)
+        sender.start()
+        self.assertEqual(conn_b.read(), large)
+        self.assertEqual(conn_b.read(), {"a": 1})
+        sender.join()
+        self.assertTrue(conn_b._read_size > conn_b.min_read_size)
+        self.assertRaises(ValueError, JsonSocketConnection, self.sock_a,
+                          framing="unknown")
+
+    def test_send_many(self):
+        for framing in (FRAMING_EOT, FRAMING_LENGTH):
+            conn_a = JsonSocketConnection(self.sock_a, framing=framing)
+            conn_b = JsonSocketConnection(self.sock_b, framing=framing)
+            conn_a.send_many([1, {"a": 2}, u"\xe4"])
+            self.assertEqual(conn_b.read(), 1)
+            self.assertEqual(conn_b.read(), {"a": 2})
+            self.assertEqual(conn_b.read(), u"\xe4")
+
+    def test_buffered_coalescing(self):
+        conn_a = BufferedJsonSocketConnection(self.sock_a)
+        conn_b = JsonSocketConnection(self.sock_b)
+        # large enough for partial sends
+        large = ["x" * 100] * 20000
+        for i in range(3):
+            conn_a.send([i, large])
+        # nothing is written before the flush
+        self.assertEqual(len(conn_a.outgoing), 3 * len(json.dumps([0, large])) + 3)
+
+        received = Queue.Queue()
+        def read():
+            for i in range(3):
+                received.put(conn_b.read())
+        reader = threading.Thread(target=read)
+        reader.start()
+        while conn_a.outgoing:
+            conn_a.flush()
+        reader.join(3)
+        self.assertEqual([received.get(False) for i in range(3)],
+                         [[i, large] for i in range(3)])
+
+    def test_negotiation(self):
+        conn_a = JsonSocketConnection(self.sock_a)
+        conn_b = JsonSocketConnection(self.sock_b)
+        conn_a.offer_framing()
+        conn_a.send("a1")
+        conn_b.send("b1")
+
+        # b accepts the offer and sends length framed from now on
+        self.assertEqual(conn_b.read(), "a1")
+        self.assertEqual(conn_b.send_framing, FRAMING_LENGTH)
+        self.assertEqual(conn_b.recv_framing, FRAMING_EOT)
+        conn_b.send("b2")
+
+        self.assertEqual(conn_a.read(), "b1")
+        self.assertEqual(conn_a.recv_framing, FRAMING_EOT)
+        self.assertEqual(conn_a.read(), "b2")
+        self.assertEqual(conn_a.send_framing, FRAMING_LENGTH)
+        self.assertEqual(conn_a.recv_framing, FRAMING_LENGTH)
+        conn_a.send("a2")
+
+        self.assertEqual(conn_b.read(), "a2")
+        self.assertEqual(conn_b.recv_framing, FRAMING_LENGTH)
+
+    def test_negotiation_with_old_peer(self):
+        conn_a = JsonSocketConnection(self.sock_a)
+        conn_a.offer_framing()
+        conn_a.send("a1")
+
+        # an old peer only sees two JSON strings
+        self.sock_b.settimeout(3)
+        data = ""
+        while data.count("\x04") < 2:
+            data += self.sock_b.recv(4096)
+        offer, a1, rest = data.split("\x04")
+        self.assertTrue(isinstance(json.loads(offer), dict))
+        self.assertEqual(json.loads(a1), "a1")
+
+        self.sock_b.send('"b1"\x04')
+        self.assertEqual(conn_a.read(), "b1")
+        self.assertEqual(conn_a.send_framing, FRAMING_EOT)
+        self.assertEqual(conn_a.recv_framing, FRAMING_EOT)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,10 @@
 import unittest
 import json
+import copy
+import random
 from pelita.layout import Layout
 from pelita.containers import Mesh
+from pelita import layouts
 from pelita.datamodel import *
 from pelita.messaging.json_convert import json_converter
 
@@ -337,6 +340,81 @@ def test_json(self):
         maze_json = json_converter.dumps(maze)
         self.assertEqual(json_converter.loads(maze_json), maze)
 
+    def test_json_format(self):
+        data = ["#", " .", "", " ", "#.", " ", ".", "#", " "]
+        maze = Maze(3, 3, data=data)
+        encoded = maze._to_json_dict()
+        self.assertEqual(encoded["version"], 1)
+        self.assertEqual(encoded["layers"],
+                         {"#": "iQA=", " ": "VIA=", ".": "SgA="})
+        self.assertEqual(Maze._from_json_dict(encoded), maze)
+        # the original format is still understood
+        self.assertEqual(Maze._from_json_dict(
+            {"width": 3, "height": 3, "data": data}), maze)
+
+        wrong_version = dict(encoded, version=2)
+        self.assertRaises(ValueError, Maze._from_json_dict, wrong_version)
+        wrong_length = dict(encoded, layers=dict(encoded["layers"], **{"#": "iAAA"}))
+        self.assertRaises(ValueError, Maze._from_json_dict, wrong_length)
+        wrong_base64 = dict(encoded, layers=dict(encoded["layers"], **{"#": "i"}))
+        self.assertRaises(ValueError, Maze._from_json_dict, wrong_base64)
+
+        empty = Maze(0, 0)
+        self.assertEqual(Maze._from_json_dict(empty._to_json_dict()), empty)
+
+    def test_json_size(self):
+        layout = layouts.layout_01_demo.decode('base64').decode('zlib')
+        maze = create_CTFUniverse(layout, 4).maze
+        compact = json_converter.dumps(maze)
+        original = json.dumps({"width": maze.width, "height": maze.height,
+                               "data": maze._data})
+        self.assertTrue(5 * len(compact) < len(original))
+
+    def test_pos_of(self):
+        maze = Maze(3, 2, data=["#", " .", " ", " ", "#", " ."])
+        self.assertEqual(maze.pos_of(Wall), [(0, 0), (1, 1)])
+        self.assertEqual(maze.pos_of(Food), [(1, 0), (2, 1)])
+        self.assertEqual(maze.pos_of(Free), [(1, 0), (2, 0), (0, 1), (2, 1)])
+        maze.remove_at(Food, (1, 0))
+        self.assertEqual(maze.pos_of(Food), [(2, 1)])
+
+    def test_setitem_repr_copy(self):
+        maze = Maze(2, 1, data=["#", " ."])
+        maze[0, 0] = [Free, Food]
+        self.assertEqual(maze[0, 0], [Free, Food])
+        self.assertTrue(maze.has_at(Food, (0, 0)))
+        self.assertFalse(maze.has_at(Wall, (0, 0)))
+        self.assertEqual(maze, eval(repr(maze)))
+
+        maze_copy = maze.copy()
+        self.assertEqual(maze, maze_copy)
+        maze_copy.remove_at(Food, (0, 0))
+        self.assertTrue(maze.has_at(Food, (0, 0)))
+        self.assertNotEqual(maze, maze_copy)
+
+        self.assertRaises(ValueError, Maze, 1, 1, data=["x"])
+
+    def test_copy_on_write(self):
+        maze = Maze(2, 1, data=["#", " ."])
+        maze_copy = maze.copy()
+        # nothing has been copied yet
+        for C in [Wall, Free, Food]:
+            self.assertTrue(maze._layers[C] is maze_copy._layers[C])
+        maze.remove_at(Food, (1, 0))
+        self.assertFalse(maze._layers[Food] is maze_copy._layers[Food])
+        self.assertTrue(maze._layers[Wall] is maze_copy._layers[Wall])
+        self.assertEqual(maze_copy[1, 0], [Free, Food])
+        self.assertEqual(maze[1, 0], [Free])
+
+        maze_copy[0, 0] = [Free]
+        self.assertEqual(maze[0, 0], [Wall])
+        self.assertEqual(maze_copy[0, 0], [Free])
+
+        deep_copy = copy.deepcopy(maze)
+        self.assertEqual(maze, deep_copy)
+        deep_copy.remove_at(Wall, (0, 0))
+        self.assertEqual(maze[0, 0], [Wall])
+
 class TestUniverseEvent(unittest.TestCase):
 
     def test_eq_repr(self):
@@ -472,6 +550,22 @@ def test_copy(self):
         self.assertNotEqual(universe, uni_copy)
         self.assertEqual(universe, universe.copy())
 
+        uni_copy.bots[0].current_pos = (1, 2)
+        uni_copy.teams[0]._score_point()
+        uni_copy.teams[0].bots.append(4)
+        self.assertEqual(universe.bots[0].current_pos, (1, 1))
+        self.assertEqual(universe.teams[0].score, 0)
+        self.assertEqual(universe.teams[0].bots, [0, 2])
+        self.assertTrue(universe.maze._layers[Wall] is
+                        uni_copy.maze._layers[Wall])
+
+        universe = create_CTFUniverse(test_layout3, 4)
+        uni_copy = universe.copy()
+        uni_copy._remove_food((6, 3))
+        self.assertEqual(universe.team_food(0), [(3, 1), (6, 1), (6, 3)])
+        self.assertEqual(uni_copy.team_food(0), [(3, 1), (6, 1)])
+        self.assertTrue(universe.maze.has_at(Food, (6, 3)))
+
     def test_str_compact_str(self):
         test_layout3 = (
         """ ##################
@@ -801,6 +895,194 @@ def test_no_eat_own_food(self):
         self.assertEqual(universe.food_list, [(3, 1), (1, 2)])
         self.assertTALEqualList(events, [BotMoves(1, (4, 1), (3, 1))])
 
+    def test_food_index(self):
+        test_start = (
+            """ ########
+                #0 .  .#
+                #..   1#
+                ######## """)
+        universe = create_CTFUniverse(test_start, 2)
+        self.assertEqual(universe.team_food(0), [(3, 1), (1, 2), (2, 2)])
+        self.assertEqual(universe.enemy_food(0), [(6, 1)])
+        self.assertTrue(universe.has_enemy_food(0))
+        self.assertTrue(universe.has_enemy_food(1))
+        universe.move_bot(1, west)
+        universe.move_bot(1, west)
+        universe.move_bot(1, north)
+        events = universe.move_bot(1, west)
+        self.assertTrue(FoodEaten in events)
+        self.assertEqual(universe.food_list, [(6, 1), (1, 2), (2, 2)])
+        self.assertEqual(universe.team_food(0), [(1, 2), (2, 2)])
+        self.assertEqual(universe.enemy_food(1), [(1, 2), (2, 2)])
+        self.assertTrue(universe.has_enemy_food(1))
+        self.assertFalse(TeamWins in events)
+        # the index is rebuilt when the maze has been changed directly
+        universe.maze.remove_at(Food, (1, 2))
+        universe.maze.remove_at(Food, (2, 2))
+        universe._init_food_index()
+        self.assertFalse(universe.has_enemy_food(1))
+        self.assertEqual(universe.enemy_food(1), [])
+
+    def test_legal_moves(self):
+        test_legal = (
+            """ ######
+                #0 # #
+                #   ##
+                #   1#
+                ###### """)
+        universe = create_CTFUniverse(test_legal, 2)
+        self.assertEqual(universe.legal_moves(0), [south, east, stop])
+        self.assertEqual(universe.legal_moves(1), [west, stop])
+        for bot in universe.bots:
+            self.assertEqual(sorted(universe.legal_moves(bot.index)),
+                             sorted(universe.get_legal_moves(bot.current_pos)))
+
+    def test_undo(self):
+        test_start = (
+            """ ########
+                #0 .. 3#
+                #2.  .1#
+                ######## """)
+        universe = create_CTFUniverse(test_start, 4)
+        self.assertRaises(UniverseException, universe.undo)
+
+        rng = random.Random(3)
+        states = []
+        seen = set()
+        while not universe.is_terminal:
+            states.append(universe.copy())
+            bot_id = len(states) % 4
+            events = universe.move_bot(bot_id, rng.choice(universe.legal_moves(bot_id)))
+            seen.update(type(event) for event in events)
+        # the random walk has tested all kinds of moves
+        self.assertTrue(BotDestroyed in seen)
+        self.assertTrue(TeamWins in seen)
+
+        # all moves are taken back in reverse order
+        while states:
+            universe.undo()
+            state = states.pop()
+            self.assertEqual(universe, state)
+            self.assertEqual(universe.team_food(0), state.team_food(0))
+            self.assertEqual(universe.team_food(1), state.team_food(1))
+            self.assertEqual(universe.maze, state.maze)
+        self.assertFalse(universe.is_terminal)
+        self.assertRaises(UniverseException, universe.undo)
+
+        # copies start without any moves to take back
+        universe.move_bot(0, east)
+        self.assertRaises(UniverseException, universe.copy().undo)
+
+        # bots which have been moved directly
+        state_hash = universe.state_hash
+        universe.bots[0].current_pos = (1, 1)
+        universe.reset_history()
+        self.assertRaises(UniverseException, universe.undo)
+        self.assertNotEqual(universe.state_hash, state_hash)
+        universe.move_bot(0, east)
+        self.assertEqual(universe.state_hash, state_hash)
+
+    def test_state_hash(self):
+        test_start = (
+            """ ########
+                #0 .. 3#
+                #2.  .1#
+                ######## """)
+        universe = create_CTFUniverse(test_start, 4)
+        initial_hash = universe.state_hash
+        self.assertEqual(initial_hash, create_CTFUniverse(test_start, 4).state_hash)
+        self.assertTrue(0 <= initial_hash < 2 ** 64)
+
+        # the same state after different moves (bot 0 goes to (2, 2))
+        first = universe.copy()
+        for move in [east, south]:
+            for bot_id in range(4):
+                first.move_bot(bot_id, move if bot_id == 0 else stop)
+        second = universe.copy()
+        for move in [south, east]:
+            for bot_id in range(4):
+                second.move_bot(bot_id, move if bot_id == 0 else stop)
+        self.assertNotEqual(first.state_hash, initial_hash)
+        self.assertEqual(first.bot_positions, second.bot_positions)
+        self.assertEqual(first.state_hash, second.state_hash)
+        # equal universes have equal hashes, even if another bot moves next
+        first.move_bot(0, stop)
+        self.assertEqual(first, second)
+        self.assertEqual(first.state_hash, second.state_hash)
+        first.move_bot(1, west)
+        self.assertNotEqual(first, second)
+        self.assertNotEqual(first.state_hash, second.state_hash)
+
+        # the hash survives the way to a remote player
+        remote = json_converter.loads(json_converter.dumps(first))
+        self.assertEqual(remote, first)
+        self.assertEqual(remote.state_hash, first.state_hash)
+
+        # the incremental hash matches a fresh computation
+        rng = random.Random(3)
+        hashes = []
+        while not universe.is_terminal:
+            hashes.append(universe.state_hash)
+            bot_id = len(hashes) % 4
+            universe.move_bot(bot_id, rng.choice(universe.legal_moves(bot_id)))
+            state_hash = universe.state_hash
+            universe._init_hash()
+            self.assertEqual(universe.state_hash, state_hash)
+            self.assertEqual(universe.copy().state_hash, state_hash)
+        while hashes:
+            universe.undo()
+            self.assertEqual(universe.state_hash, hashes.pop())
+        self.assertEqual(universe.state_hash, initial_hash)
+
+
+class TestUniverseDelta(unittest.TestCase):
+
+    test_start = (
+        """ ########
+            #0 .  .#
+            #..   1#
+            ######## """)
+
+    def test_delta(self):
+        universe = create_CTFUniverse(self.test_start, 2)
+        old = universe.copy()
+        self.assertEqual(UniverseDelta.between(old, universe),
+                         UniverseDelta([], [], [], universe.checksum))
+        universe.move_bot(1, west)
+        universe.move_bot(1, west)
+        universe.move_bot(1, north)
+        universe.move_bot(1, west)
+        universe.bots[0].noisy = True
+        delta = UniverseDelta.between(old, universe)
+        self.assertEqual(delta.bots, [(0, (1, 1), True), (1, (3, 1), False)])
+        self.assertEqual(delta.food_eaten, [(3, 1)])
+        self.assertEqual(delta.scores, [(1, 1)])
+        self.assertNotEqual(delta.checksum, old.checksum)
+
+        delta = json_converter.loads(json_converter.dumps(delta))
+        self.assertEqual(delta, UniverseDelta.between(old, universe))
+        old.move_bot(0, east)
+        old.undo()
+        old.move_bot(0, east)
+        delta.apply(old)
+        self.assertEqual(old, universe)
+        self.assertEqual(old.state_hash, universe.state_hash)
+        # the move before the delta cannot be taken back
+        self.assertRaises(UniverseException, old.undo)
+
+    def test_divergence(self):
+        universe = create_CTFUniverse(self.test_start, 2)
+        old = universe.copy()
+        universe.move_bot(0, east)
+        delta = UniverseDelta.between(old, universe)
+        diverged = old.copy()
+        diverged.teams[0].score = 3
+        self.assertRaises(ValueError, delta.apply, diverged)
+        # food which has already been eaten
+        delta = UniverseDelta([], [(3, 1)], [], universe.checksum)
+        universe.move_bot(0, east)
+        self.assertRaises(ValueError, delta.apply, universe)
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
 import unittest
+import time
 from pelita.datamodel import north, south, east, west, stop,\
         Wall, Free, Food,\
-        TeamWins, BotMoves, create_CTFUniverse
-from pelita.game_master import GameMaster, UniverseNoiser
+        TeamWins, BotMoves, TimeoutEvent, create_CTFUniverse
+from pelita.game_master import GameMaster, UniverseNoiser, MoveTimings
 from pelita.player import AbstractPlayer, SimpleTeam, TestPlayer
 from pelita.viewer import AbstractViewer, DevNullViewer
 from pelita.graph import AdjacencyList
@@ -64,6 +65,79 @@ def test_team_names(self):
         self.assertEqual(team_2._players[1].current_uni.teams[1].name, "team2")
 
 
+class SlowPlayer(AbstractPlayer):
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+
+    def get_move(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return stop
+
+class EventCollector(AbstractViewer):
+    def __init__(self):
+        self.events = []
+
+    def observe(self, round_, turn, universe, events):
+        self.events.append(events)
+
+class TestTimeBudget(unittest.TestCase):
+    # the random moves after a timeout cannot end the game
+    layout = (
+        """ ########
+            #0#.  .#
+            # #  1 #
+            ######## """)
+
+    def test_move_budget(self):
+        gm = GameMaster(self.layout, 2, 3, noise=False, move_budget=0.02)
+        slow = SlowPlayer(0.05)
+        gm.register_team(SimpleTeam(slow))
+        gm.register_team(SimpleTeam(TestPlayer([stop, stop, stop])))
+        viewer = EventCollector()
+        gm.register_viewer(viewer)
+        gm.play()
+
+        # the slow bot is asked every time but times out
+        self.assertEqual(slow.calls, 3)
+        for turn, events in enumerate(viewer.events):
+            self.assertEqual(TimeoutEvent(0) in events, turn % 2 == 0)
+            self.assertFalse(TimeoutEvent(1) in events)
+        self.assertEqual(len(gm.timings.wall_times[0]), 3)
+        self.assertTrue(min(gm.timings.wall_times[0]) >= 0.05)
+
+    def test_team_budget(self):
+        gm = GameMaster(self.layout, 2, 5, noise=False, team_budget=0.15)
+        slow = SlowPlayer(0.1)
+        gm.register_team(SimpleTeam(slow))
+        gm.register_team(SimpleTeam(TestPlayer([stop] * 5)))
+        viewer = EventCollector()
+        gm.register_viewer(viewer)
+        gm.play()
+
+        # the second move exceeds the budget; afterwards the team is not asked
+        self.assertEqual(slow.calls, 2)
+        timeouts = [TimeoutEvent(0) in events for events in viewer.events]
+        self.assertEqual(timeouts, [False, False, True, False, True, False,
+                                    True, False, True, False])
+
+    def test_percentiles(self):
+        universe = create_CTFUniverse(self.layout, 2)
+        timings = MoveTimings(universe)
+        self.assertEqual(timings.percentiles(0), [None, None, None])
+        for i in range(1, 101):
+            timings.record(0, i / 1000.0, 0.0)
+        timings.record(1, 0.5, 0.25)
+        self.assertEqual(timings.percentiles(0, (1, 50, 90, 100)),
+                         [0.001, 0.05, 0.09, 0.1])
+        self.assertEqual(timings.percentiles(1), [0.5, 0.5, 0.5])
+        self.assertEqual(timings.team_wall_time[1], 0.5)
+        report = timings.report(["a", "b"]).splitlines()
+        self.assertEqual(len(report), 3)
+        self.assertTrue(report[2].startswith("b"))
+        self.assertTrue(report[2].endswith("250.00"))
+
 class TestUniverseNoiser(unittest.TestCase):
 
 
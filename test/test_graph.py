@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 
 import unittest
+import os
+import shutil
+import tempfile
 from pelita.datamodel import create_CTFUniverse, Free
-from pelita.graph import AdjacencyList, NoPathException, NoPositionException
+from pelita.graph import AdjacencyList, NoPathException, NoPositionException, \
+        DistanceMatrix, MazeGraph, layout_hash
 
 class TestAdjacencyList(unittest.TestCase):
 
@@ -29,6 +33,31 @@ def test_pos_within(self):
         for pos in free.difference(target):
             self.assertTrue(len(al.a_star((1, 1), pos)) >= 5)
 
+    def test_changes(self):
+        test_layout = (
+        """ ########
+            #      #
+            # #### #
+            #      #
+            ######## """)
+        universe = create_CTFUniverse(test_layout, 0)
+        al = AdjacencyList(universe)
+        self.assertEqual(len(al.a_star((1, 1), (3, 1))), 2)
+        # block the upper way
+        del al[(2, 1)]
+        self.assertEqual(len(al.a_star((1, 1), (3, 1))), 12)
+        self.assertRaises(NoPositionException, al.bfs, (2, 1), [(1, 1)])
+        # and open a shortcut
+        al[(1, 1)] = [(1, 2), (3, 1)]
+        al[(3, 1)] = [(1, 1), (4, 1)]
+        self.assertEqual(al.a_star((1, 1), (3, 1)), [(3, 1)])
+        self.assertEqual(al.pos_within((1, 1), 2),
+                         set([(1, 1), (1, 2), (3, 1)]))
+        al.pop((3, 1))
+        self.assertEqual(len(al.bfs((1, 1), [(4, 1)])), 11)
+        al.update({(1, 1): []})
+        self.assertRaises(NoPathException, al.bfs, (1, 1), [(4, 1)])
+
     def test_basic_adjacency_list(self):
         test_layout = (
         """ ######
@@ -97,6 +126,22 @@ def test_bfs_to_self(self):
         al = AdjacencyList(universe)
         self.assertEqual([], al.bfs((1,1), [(1, 1), (2, 1)]))
 
+    def test_bfs_path(self):
+        test_layout = (
+        """ ##################
+            #0#.  .  # .     #
+            #2#####    #####1#
+            #     . #  .  .#3#
+            ################## """)
+        universe = create_CTFUniverse(test_layout, 4)
+        al = AdjacencyList(universe)
+        path = al.bfs((1, 1), [(3, 1), (16, 3)])
+        # closest target first, without the initial position
+        self.assertEqual((3, 1), path[0])
+        self.assertEqual(14, len(path))
+        for pos, next_pos in zip(path, path[1:] + [(1, 1)]):
+            self.assertTrue(pos in al[next_pos])
+
     def test_a_star(self):
         test_layout = (
         """ ##################
@@ -109,6 +154,40 @@ def test_a_star(self):
         # just a simple smoke test
         self.assertEqual(14, len(al.a_star((1, 1), (3, 1))))
 
+    def test_a_star_shortest(self):
+        test_layout = (
+        """ ##################
+            #0#.  .  # .     #
+            # #####    ##### #
+            #     . #  .  .#1#
+            ################## """)
+        universe = create_CTFUniverse(test_layout, 2)
+        al = AdjacencyList(universe)
+        for pos1 in al:
+            for pos2 in al:
+                path = al.a_star(pos1, pos2)
+                self.assertEqual(len(al.bfs(pos1, [pos2])), len(path))
+                if path:
+                    self.assertEqual(pos2, path[0])
+                for pos, next_pos in zip(path, path[1:] + [pos1]):
+                    self.assertTrue(pos in al[next_pos])
+
+        # in a corridor, only the nodes on the path are expanded
+        self.assertEqual(4, len(al.a_star((3, 3), (7, 3))))
+        self.assertEqual(4, al.expanded)
+
+    def test_a_star_exceptions(self):
+        test_layout = (
+        """ ############
+            #0.     #.1#
+            ############ """)
+        universe = create_CTFUniverse(test_layout, 2)
+        al = AdjacencyList(universe)
+        self.assertEqual([], al.a_star((1, 1), (1, 1)))
+        self.assertRaises(NoPathException, al.a_star, (1, 1), (10, 1))
+        self.assertRaises(NoPositionException, al.a_star, (0, 1), (10, 1))
+        self.assertRaises(NoPositionException, al.a_star, (1, 1), (11, 1))
+
     def test_bfs_exceptions(self):
         test_layout = (
         """ ############
@@ -121,3 +200,110 @@ def test_bfs_exceptions(self):
         self.assertRaises(NoPositionException, al.bfs, (0, 1), [(10, 1)])
         self.assertRaises(NoPositionException, al.bfs, (1, 1), [(11, 1)])
 
+
+class TestMazeGraph(unittest.TestCase):
+
+    def test_ids(self):
+        test_layout = (
+        """ ######
+            #    #
+            ###### """)
+        universe = create_CTFUniverse(test_layout, 0)
+        graph = AdjacencyList(universe).graph
+        self.assertEqual(4, len(graph))
+        self.assertEqual([(1, 1), (2, 1), (3, 1), (4, 1)], graph.positions)
+        for node, pos in enumerate(graph.positions):
+            self.assertEqual(node, graph.id_of(pos))
+        self.assertRaises(NoPositionException, graph.id_of, (0, 1))
+        self.assertEqual([1], list(graph.neighbours_of(0)))
+        self.assertEqual([2, 0], list(graph.neighbours_of(1)))
+        self.assertEqual([0, 1, 3, 5, 6], list(graph.offsets))
+
+    def test_searches(self):
+        test_layout = (
+        """ ##################
+            #0#.  .  # .     #
+            #2#####    #####1#
+            #     . #  .  .#3#
+            ################## """)
+        universe = create_CTFUniverse(test_layout, 4)
+        al = AdjacencyList(universe)
+        graph = MazeGraph(al)
+        start = graph.id_of((1, 1))
+        target = graph.id_of((3, 1))
+        path = graph.bfs(start, [target])
+        self.assertEqual(al.bfs((1, 1), [(3, 1)]),
+                         [graph.positions[node] for node in path])
+        self.assertEqual(len(path), len(graph.a_star(start, target)))
+        self.assertEqual(len(path), graph.distances_from(start)[target])
+        self.assertEqual(set(graph.id_of(pos) for pos in al.pos_within((1, 1), 5)),
+                         graph.pos_within(start, 5))
+
+class TestDistanceMatrix(unittest.TestCase):
+
+    test_layout = (
+        """ ##################
+            #0#.  .  # .     #
+            #2#####    #####1#
+            #     . #  .  .#3#
+            ################## """)
+
+    def test_distance(self):
+        universe = create_CTFUniverse(self.test_layout, 4)
+        al = AdjacencyList(universe)
+        dm = DistanceMatrix(al)
+        self.assertEqual(0, dm.distance((1, 1), (1, 1)))
+        self.assertEqual(1, dm.distance((1, 1), (1, 2)))
+        self.assertEqual(14, dm.distance((1, 1), (3, 1)))
+        self.assertEqual(14, dm.distance((3, 1), (1, 1)))
+        for pos1 in al:
+            for pos2 in al:
+                self.assertEqual(len(al.bfs(pos1, [pos2])),
+                                 dm.distance(pos1, pos2))
+        self.assertRaises(NoPositionException, dm.distance, (0, 0), (1, 1))
+        self.assertRaises(NoPositionException, dm.distance, (1, 1), (0, 0))
+
+    def test_unreachable(self):
+        test_layout = (
+        """ ############
+            #0.     #.1#
+            ############ """)
+        universe = create_CTFUniverse(test_layout, 2)
+        dm = DistanceMatrix(AdjacencyList(universe))
+        self.assertEqual(6, dm.distance((1, 1), (7, 1)))
+        self.assertRaises(NoPathException, dm.distance, (1, 1), (10, 1))
+
+    def test_cache(self):
+        universe = create_CTFUniverse(self.test_layout, 4)
+        cache_dir = tempfile.mkdtemp()
+        try:
+            dm = DistanceMatrix.from_universe(universe, cache_dir=cache_dir)
+            filename = os.path.join(cache_dir,
+                                    "%s.dist" % layout_hash(universe.maze))
+            self.assertTrue(os.path.isfile(filename))
+            dm_cached = DistanceMatrix.from_universe(universe,
+                                                     cache_dir=cache_dir)
+            self.assertEqual(dm._distances, dm_cached._distances)
+
+            # a corrupt file is recomputed
+            with open(filename, "wb") as file:
+                file.write("corrupt")
+            dm_cached = DistanceMatrix.from_universe(universe,
+                                                     cache_dir=cache_dir)
+            self.assertEqual(dm._distances, dm_cached._distances)
+            # the temporary file has been renamed to the cache file
+            self.assertEqual(os.listdir(cache_dir), [os.path.basename(filename)])
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_layout_hash(self):
+        universe = create_CTFUniverse(self.test_layout, 4)
+        # food and bots do not change the hash
+        other_layout = self.test_layout.replace(".", " ")
+        other_universe = create_CTFUniverse(other_layout, 4)
+        self.assertEqual(layout_hash(universe.maze),
+                         layout_hash(other_universe.maze))
+        other_layout = self.test_layout.replace("#.", "##")
+        other_universe = create_CTFUniverse(other_layout, 4)
+        self.assertNotEqual(layout_hash(universe.maze),
+                            layout_hash(other_universe.maze))
@@ -3,6 +3,16 @@
 from pelita.datamodel import Wall, Free, Food
 from pelita.layout import *
 
+class TestBundledLayouts(unittest.TestCase):
+
+    def test_bundled_layouts(self):
+        layouts = bundled_layouts()
+        self.assertTrue(len(layouts) > 0)
+        for name, layout in layouts:
+            self.assertTrue(isinstance(name, str))
+            self.assertTrue('0' in layout)
+        self.assertTrue(get_random_layout() in dict(layouts).values())
+
 class TestLayoutChecks(unittest.TestCase):
 
     layout_chars = [Wall.char, Free.char, Food.char]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import threading
+
+from pelita.datamodel import create_CTFUniverse, east
+from pelita.game_master import GameMaster, PlayerDisconnected
+from pelita.player import AbstractPlayer, SimpleTeam, BFSPlayer, StoppingPlayer, TestPlayer
+from pelita.process_team import ProcessTeamPlayer
+
+
+class RaisingPlayer(AbstractPlayer):
+    def get_move(self):
+        raise ValueError
+
+class TestProcessTeamPlayer(unittest.TestCase):
+    layout = (
+        """ ##################
+            #0#.  .  # .     #
+            #2#####    #####1#
+            #     . #  .  .#3#
+            ################## """)
+
+    def test_game(self):
+        def play(wrap):
+            gm = GameMaster(self.layout, 4, 100, noise=False)
+            teams = [wrap(SimpleTeam(BFSPlayer(), BFSPlayer())),
+                     wrap(SimpleTeam(StoppingPlayer(), BFSPlayer()))]
+            for team in teams:
+                gm.register_team(team)
+            gm.play()
+            return gm.universe, teams
+
+        process_universe, teams = play(ProcessTeamPlayer)
+        try:
+            for team in teams:
+                self.assertNotEqual(team.process.pid, os.getpid())
+                self.assertTrue(team.process.is_alive())
+        finally:
+            for team in teams:
+                team.stop()
+        self.assertEqual(teams[0].process, None)
+
+        # the game is the same as with teams in our own process
+        universe, _ = play(lambda team: team)
+        self.assertEqual(process_universe.checksum, universe.checksum)
+        self.assertTrue(universe.teams[0].score > 0)
+
+    def test_disconnect(self):
+        universe = create_CTFUniverse(self.layout, 4)
+        team = ProcessTeamPlayer(SimpleTeam(TestPlayer([east]), RaisingPlayer()))
+        try:
+            team._set_bot_ids([0, 2])
+            team._set_initial(universe.copy())
+            self.assertEqual(team._get_move(0, universe.copy()), east)
+            self.assertRaises(PlayerDisconnected, team._get_move, 2, universe.copy())
+        finally:
+            team.stop()
+
+    def test_threaded_host(self):
+        universe = create_CTFUniverse(self.layout, 4)
+        team = ProcessTeamPlayer(SimpleTeam(StoppingPlayer(), StoppingPlayer()))
+        release = threading.Event()
+        thread = threading.Thread(target=release.wait)
+        thread.start()
+        try:
+            team._set_bot_ids([0, 2])
+            self.assertRaises(RuntimeError, team._set_initial, universe)
+            self.assertEqual(team.process, None)
+        finally:
+            release.set()
+            thread.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
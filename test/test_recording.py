@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import random
+import shutil
+import tempfile
+
+from pelita.game_master import GameMaster
+from pelita.player import SimpleTeam, NQRandomPlayer, BFSPlayer
+from pelita.viewer import AbstractViewer
+from pelita.recording import GameRecorder, GameReader
+
+
+class CollectingViewer(AbstractViewer):
+    def __init__(self):
+        self.initial = None
+        self.turns = []
+
+    def set_initial(self, universe):
+        self.initial = universe
+
+    def observe(self, round_, turn, universe, events):
+        self.turns.append((round_, turn, universe, list(events)))
+
+class TestRecording(unittest.TestCase):
+    layout = (
+        """ ##################
+            #0#.  .  # .     #
+            #2#####    #####1#
+            #     . #  .  .#3#
+            ################## """)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "game.jsonl")
+
+        random.seed(1)
+        gm = GameMaster(self.layout, 4, 30)
+        gm.register_team(SimpleTeam(BFSPlayer(), NQRandomPlayer()))
+        gm.register_team(SimpleTeam(NQRandomPlayer(), BFSPlayer()))
+        self.viewer = CollectingViewer()
+        gm.register_viewer(self.viewer)
+        recorder = GameRecorder(self.filename, keyframe_interval=10)
+        gm.register_viewer(recorder)
+        gm.play()
+        recorder.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_replay(self):
+        reader = GameReader(self.filename)
+        self.assertEqual([round_ for round_, offset in reader.keyframes],
+                         [0, 10, 20])
+
+        replayed = CollectingViewer()
+        reader.replay(replayed)
+        self.assertEqual(replayed.initial, self.viewer.initial)
+        self.assertEqual(replayed.turns, self.viewer.turns)
+
+    def test_seek(self):
+        reader = GameReader(self.filename)
+        for round_ in [0, 5, 10, 19, 20, 29]:
+            replayed = CollectingViewer()
+            reader.replay(replayed, start_round=round_)
+            index = round_ * 4
+            self.assertEqual(replayed.turns, self.viewer.turns[index:])
+            self.assertEqual(replayed.initial, self.viewer.turns[index - 1][2]
+                             if index else self.viewer.initial)
+            self.assertEqual(reader.universe_at(round_), replayed.initial)
+
+        # after the end of the game
+        self.assertEqual(reader.universe_at(100), self.viewer.turns[-1][2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from pelita.search import TranspositionTable
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def test_lookup(self):
+        table = TranspositionTable(8)
+        self.assertEqual(table.hit_rate, None)
+        self.assertEqual(table.lookup(3), None)
+        table.store(3, "three", depth=2)
+        self.assertEqual(table.lookup(3), "three")
+        self.assertEqual(table.lookup(3, depth=2), "three")
+        # not searched deep enough
+        self.assertEqual(table.lookup(3, depth=3), None)
+        # a different hash in the same slot
+        self.assertEqual(table.lookup(11), None)
+        self.assertEqual((table.hits, table.misses), (2, 3))
+        self.assertEqual(table.hit_rate, 0.4)
+        self.assertEqual(len(table), 1)
+
+        table.clear_counters()
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.hit_rate, None)
+
+    def test_replacement(self):
+        table = TranspositionTable(8)
+        table.store(3, "deep", depth=5)
+        # a shallower entry does not replace a deeper one
+        table.store(11, "shallow", depth=1)
+        self.assertEqual(table.lookup(3), "deep")
+        self.assertEqual(table.rejections, 1)
+        # a deeper one does
+        table.store(19, "deeper", depth=6)
+        self.assertEqual(table.lookup(3), None)
+        self.assertEqual(table.lookup(19), "deeper")
+        self.assertEqual(table.replacements, 1)
+        # entries from an earlier search are always replaced
+        table.new_search()
+        table.store(3, "new", depth=0)
+        self.assertEqual(table.lookup(3), "new")
+        self.assertEqual(table.replacements, 2)
+        # the same hash is always updated
+        table.store(3, "newer", depth=0)
+        self.assertEqual(table.lookup(3), "newer")
+        self.assertEqual(table.replacements, 2)
+
+    def test_size(self):
+        self.assertRaises(ValueError, TranspositionTable, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
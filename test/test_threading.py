@@ -51,6 +51,15 @@ def test_suspendable_thread(self):
         self.assertEqual(thread.number, 10)
         self.assertEqual(thread._running, False)
 
+    def test_stop_suspended_thread(self):
+        thread = SimpleThread()
+        thread.paused = True
+        thread.start()
+        thread.stop()
+        thread.thread.join(1)
+        self.assertFalse(thread.thread.is_alive())
+        self.assertEqual(thread.number, 0)
+
     def test_thread_raise(self):
         thread = CloseableThread()
         thread.start()
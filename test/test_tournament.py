@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from pelita.player import SimpleTeam, StoppingPlayer, NQRandomPlayer
+from pelita.tournament import Tournament, Match, GameResult, play_match,\
+        standings, RoundRobinScheduler, SwissScheduler,\
+        RandomScheduler
+
+layout = (
+""" ##########
+    #0 ..  .3#
+    #.#.##. .#
+    #2. .  .1#
+    ########## """)
+
+def stopping_team():
+    return SimpleTeam(StoppingPlayer(), StoppingPlayer())
+
+def random_team():
+    return SimpleTeam(NQRandomPlayer(), NQRandomPlayer())
+
+class TestTournament(unittest.TestCase):
+
+    def test_play_match(self):
+        teams = (("random", random_team), ("stopping", stopping_team))
+        result = play_match(Match(3, teams, "small", layout, 1), game_time=5)
+        self.assertEqual(result.index, 3)
+        self.assertEqual(result.team_names, ["random", "stopping"])
+        self.assertEqual(result.layout_name, "small")
+        self.assertEqual(result.scores[1], 0)
+        self.assertEqual(result.timeouts, [0, 0])
+        self.assertTrue(1 <= result.rounds <= 5)
+        if result.scores[0]:
+            self.assertEqual(result.winner, 0)
+        else:
+            self.assertEqual(result.winner, None)
+        # the game is reproducible
+        self.assertEqual(result,
+            play_match(Match(3, teams, "small", layout, 1), game_time=5))
+
+    def test_round_robin(self):
+        teams = [("a", stopping_team), ("b", stopping_team),
+                 ("c", random_team)]
+        tournament = Tournament(teams, [("small", layout), ("other", layout)],
+                                game_time=3, processes=1, seed=2)
+        matches = tournament.matches()
+        self.assertEqual(len(matches), 3 * 2 * 2)
+        self.assertEqual([match.index for match in matches], range(12))
+        pairings = [tuple(name for name, factory in match.teams)
+                    for match in matches]
+        for pairing in [("a", "b"), ("b", "a"), ("a", "c"), ("c", "a")]:
+            self.assertEqual(pairings.count(pairing), 2)
+
+        results = list(tournament.run())
+        self.assertEqual(sorted(result.index for result in results),
+                         range(12))
+        standings = tournament.standings(results)
+        self.assertEqual(sorted(row[0] for row in standings), ["a", "b", "c"])
+        for name, points, wins, draws, losses in standings:
+            self.assertEqual(wins + draws + losses, 8)
+            self.assertEqual(points, 2 * wins + draws)
+
+    def test_process_pool(self):
+        teams = [("stopping", stopping_team), ("random", random_team)]
+        results = {}
+        for processes in [1, 2]:
+            tournament = Tournament(teams, [("small", layout)], game_time=5,
+                                    processes=processes, seed=3)
+            results[processes] = sorted(tournament.run())
+        self.assertEqual(len(results[2]), 2)
+        self.assertEqual(results[1], results[2])
+
+    def test_standings(self):
+        results = [GameResult(0, ["a", "b"], "x", [5, 2], 0, 10, [0, 0]),
+                   GameResult(1, ["b", "c"], "x", [1, 1], None, 10, [0, 0])]
+        self.assertEqual(standings(results, ["a", "b", "c", "d"]),
+                         [("a", 2, 1, 0, 0), ("b", 1, 0, 1, 1),
+                          ("c", 1, 0, 1, 0), ("d", 0, 0, 0, 0)])
+
+    def test_too_few_teams(self):
+        self.assertRaises(ValueError, Tournament,
+                          [("a", stopping_team)], [("small", layout)])
+
+def result(index, team_a, team_b, winner):
+    return GameResult(index, [team_a, team_b], "x", [0, 0], winner, 1, [0, 0])
+
+class TestScheduler(unittest.TestCase):
+    def test_round_robin(self):
+        scheduler = RoundRobinScheduler()
+        teams = ["a", "b", "c", "d"]
+        played = set()
+        for index in range(3):
+            pairings = scheduler.pair(teams)
+            self.assertEqual(len(pairings), 2)
+            self.assertEqual(sorted(sum(pairings, ())), teams)
+            for team_a, team_b in pairings:
+                played.add(frozenset((team_a, team_b)))
+                scheduler.record(result(index, team_a, team_b, 0))
+        # after three rounds, every team has played every other team
+        self.assertEqual(len(played), 6)
+        # an odd team keeps waiting
+        self.assertEqual(len(scheduler.pair(["a", "b", "c"])), 1)
+        self.assertEqual(scheduler.pair(["a"]), [])
+
+    def test_swiss(self):
+        scheduler = SwissScheduler()
+        scheduler.record(result(0, "a", "b", 0))
+        scheduler.record(result(1, "c", "d", 0))
+        self.assertEqual(scheduler.points["a"], 2)
+        # the winners play each other, and so do the losers
+        self.assertEqual(scheduler.pair(["b", "a", "d", "c"]),
+                         [("a", "c"), ("b", "d")])
+        # but rematches are avoided
+        self.assertEqual(scheduler.pair(["a", "b"]), [("a", "b")])
+        self.assertEqual(sorted(scheduler.pair(["a", "b", "d"])[0]), ["a", "d"])
+
+    def test_random(self):
+        teams = list("abcdefg")
+        pairings = RandomScheduler(seed=1).pair(teams)
+        self.assertEqual(len(pairings), 3)
+        self.assertEqual(len(set(sum(pairings, ()))), 6)
+        self.assertEqual(pairings, RandomScheduler(seed=1).pair(teams))
+
+
+if __name__ == '__main__':
+    unittest.main()
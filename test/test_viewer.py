@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+
+from pelita.game_master import GameMaster
+from pelita.player import SimpleTeam, NQRandomPlayer
+from pelita.viewer import AbstractViewer, ViewerPublisher
+
+
+class CollectingViewer(AbstractViewer):
+    def __init__(self):
+        self.initial = None
+        self.turns = []
+
+    def set_initial(self, universe):
+        self.initial = universe
+
+    def observe(self, round_, turn, universe, events):
+        self.turns.append((round_, turn, universe, events))
+
+class BlockingViewer(CollectingViewer):
+    def __init__(self):
+        super(BlockingViewer, self).__init__()
+        self.release = threading.Event()
+
+    def observe(self, round_, turn, universe, events):
+        self.release.wait()
+        super(BlockingViewer, self).observe(round_, turn, universe, events)
+
+class TestViewerPublisher(unittest.TestCase):
+    layout = (
+        """ ##################
+            #0#.  .  # .     #
+            #2#####    #####1#
+            #     . #  .  .#3#
+            ################## """)
+
+    def play(self, publisher, rounds=20):
+        gm = GameMaster(self.layout, 4, rounds)
+        gm.register_team(SimpleTeam(NQRandomPlayer(), NQRandomPlayer()))
+        gm.register_team(SimpleTeam(NQRandomPlayer(), NQRandomPlayer()))
+        gm.register_viewer(publisher)
+        gm.play()
+        return gm
+
+    def test_shared_frames(self):
+        viewers = [CollectingViewer(), CollectingViewer()]
+        publisher = ViewerPublisher(queue_size=1000)
+        for viewer in viewers:
+            publisher.register_viewer(viewer)
+        gm = self.play(publisher)
+        publisher.close(3)
+
+        self.assertEqual(publisher.dropped_frames, [0, 0])
+        self.assertTrue(viewers[0].initial is viewers[1].initial)
+        self.assertEqual(len(viewers[0].turns), len(viewers[1].turns))
+        for turn_0, turn_1 in zip(viewers[0].turns, viewers[1].turns):
+            self.assertEqual(turn_0[:2], turn_1[:2])
+            # the universe is shared, the list of events is not
+            self.assertTrue(turn_0[2] is turn_1[2])
+            self.assertFalse(turn_0[3] is turn_1[3])
+            self.assertEqual(list(turn_0[3]), list(turn_1[3]))
+        self.assertEqual(viewers[0].turns[-1][2], gm.universe)
+
+    def test_slow_viewer(self):
+        slow = BlockingViewer()
+        fast = CollectingViewer()
+        publisher = ViewerPublisher()
+        publisher.register_viewer(slow)
+        publisher.register_viewer(fast)
+        try:
+            # the game does not wait for the slow viewer
+            gm = self.play(publisher, rounds=50)
+        finally:
+            slow.release.set()
+        publisher.close(3)
+
+        dropped = publisher.dropped_frames
+        self.assertTrue(dropped[0] > 0)
+        # the slow viewer has received the last frame
+        self.assertEqual(len(slow.turns) + dropped[0], len(fast.turns) + dropped[1])
+        self.assertEqual(slow.turns[-1][2], gm.universe)
+        self.assertFalse(publisher._channels[0].thread.is_alive())
+
+    def test_late_viewer(self):
+        publisher = ViewerPublisher()
+        gm = GameMaster(self.layout, 4, 1)
+        gm.register_viewer(publisher)
+        viewer = CollectingViewer()
+        publisher.register_viewer(viewer)
+        publisher.close(3)
+        self.assertEqual(viewer.initial, gm.universe)
+
+
+if __name__ == '__main__':
+    unittest.main()